@@ -0,0 +1,72 @@
+"""
+Пропускная способность асинхронных репозиториев при 100 одновременных
+задачах: запросы в секунду для чтения по id и для смешанной нагрузки
+(9 чтений на 1 запись).
+
+Запуск: python -m benchmarks.bench_async_repository [--rows 100000]
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.async_repository import (
+    AsyncAbstractRepository, AsyncMemoryRepository, AsyncSQLiteRepository
+)
+
+
+async def worker(repo: AsyncAbstractRepository[Expense], rows: int,
+                 requests: int, write_every: int) -> None:
+    """ Одна задача: последовательность запросов к репозиторию """
+    for i in range(requests):
+        if write_every and i % write_every == 0:
+            await repo.add(Expense(1, 1))
+        else:
+            await repo.get(random.randint(1, rows))
+
+
+async def throughput(repo: AsyncAbstractRepository[Expense], rows: int, tasks: int,
+                     requests: int, write_every: int) -> float:
+    """ Запросов в секунду для tasks одновременных задач """
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(repo, rows, requests, write_every)
+                           for _ in range(tasks)))
+    return tasks * requests / (time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """ Заполнить репозитории и измерить пропускную способность """
+    with tempfile.TemporaryDirectory() as tmp:
+        repos: dict[str, AsyncAbstractRepository[Expense]] = {
+            'memory': AsyncMemoryRepository(),
+            'sqlite': AsyncSQLiteRepository(str(Path(tmp) / 'bench.db'), Expense,
+                                            readers=args.readers),
+        }
+        for name, repo in repos.items():
+            await repo.add_many(Expense(i % 1000, i % 50) for i in range(args.rows))
+            report(f'{name}, {args.tasks} tasks, {args.rows} rows', {
+                'reads': await throughput(repo, args.rows, args.tasks,
+                                          args.requests, 0),
+                '90% reads, 10% writes': await throughput(repo, args.rows, args.tasks,
+                                                          args.requests, 10),
+            }, unit='req/s')
+            if isinstance(repo, AsyncSQLiteRepository):
+                await repo.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--readers', type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Нагрузочный тест ConcurrentMemoryRepository: пропускная способность
+чтения в зависимости от количества потоков-читателей при одновременной
+записи одним потоком. Читатели выполняют get по случайному id
+и get_all по категории (с хэш-индексом).
+
+Из-за GIL потоки CPython не выполняют код Python параллельно, поэтому
+суммарная пропускная способность растет с числом читателей заметно
+медленнее, чем линейно; тест показывает, что читатели не блокируют друг
+друга, а запись продолжается и при большом количестве читателей.
+
+Запуск: python -m benchmarks.bench_concurrent_repository [--rows 100000]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.concurrent_repository import ConcurrentMemoryRepository
+
+CATEGORIES = 1000
+
+
+def run(repo: ConcurrentMemoryRepository[Expense], readers: int,
+        duration: float, rows: int) -> tuple[float, float]:
+    """ Чтений в секунду (всего) и записей в секунду за duration секунд """
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def read(n: int) -> None:
+        rnd = random.Random(n)
+        while not stop.is_set():
+            repo.get(rnd.randint(1, rows))
+            repo.get_all({'category': rnd.randrange(CATEGORIES)})
+            reads[n] += 2
+
+    def write() -> None:
+        while not stop.is_set():
+            obj = Expense(amount=1, category=writes[0] % CATEGORIES)
+            repo.add(obj)
+            repo.delete(obj.pk)
+            writes[0] += 2
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / duration, writes[0] / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    repo = ConcurrentMemoryRepository[Expense](indexed_fields=('category',))
+    repo.add_many(Expense(amount=i, category=i % CATEGORIES) for i in range(args.rows))
+    read_rate: dict[str, float] = {}
+    write_rate: dict[str, float] = {}
+    for readers in args.threads:
+        name = f'{readers} reader(s)'
+        read_rate[name], write_rate[name] = run(repo, readers, args.duration,
+                                                args.rows)
+    report('Reads under concurrent writes', read_rate, 'ops/s')
+    report('Writes', write_rate, 'ops/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Память и время агрегации: MemoryRepository против колоночного ExpenseStore.
+Расходы распределены по 50 категориям и трем годам; запрос - сумма расходов
+за месяц по категориям.
+
+Запуск: python -m benchmarks.bench_expense_store [--rows 1000000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from benchmarks.common import report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.expense_store import ExpenseStore
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+
+START = datetime(2021, 1, 1)
+MONTH = Query([('expense_date', '>=', datetime(2022, 3, 1)),
+               ('expense_date', '<', datetime(2022, 4, 1))])
+
+
+def fill(repo: AbstractRepository[Expense], rows: int) -> int:
+    """ Заполнить репозиторий, вернуть объем выделенной памяти в байтах """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    step = timedelta(days=3 * 365) / rows
+    repo.add_many(Expense(amount=i % 1000, category=i % 50,
+                          expense_date=START + step * i, added_date=START,
+                          comment=f'comment {i % 100}')
+                  for i in range(rows))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def best_of(func: Callable[[], Any], repeat: int = 5) -> float:
+    """ Лучшее время вызова в миллисекундах """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    memory: dict[str, float] = {}
+    timing: dict[str, float] = {}
+    repos: list[tuple[str, AbstractRepository[Expense]]] = [
+        ('MemoryRepository', MemoryRepository()), ('ExpenseStore', ExpenseStore())]
+    for name, repo in repos:
+        memory[name] = fill(repo, args.rows) / args.rows
+        timing[name] = best_of(lambda r=repo: r.aggregate(  # type: ignore[misc]
+            ['category'], {'total': ('sum', 'amount')}, MONTH))
+    report(f'Memory, {args.rows} expenses', memory, 'bytes/row')
+    report('Month total by category', timing, 'ms')
+
+
+if __name__ == '__main__':
+    main()
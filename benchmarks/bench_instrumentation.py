@@ -0,0 +1,45 @@
+"""
+Накладные расходы InstrumentedRepository: get по id без обертки
+и с оберткой для MemoryRepository и SQLiteRepository.
+
+Запуск: python -m benchmarks.bench_instrumentation [--count 100000]
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import per_op, report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.instrumentation import InstrumentedRepository, Metrics
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / 'expenses.db')
+        backends: list[tuple[str, AbstractRepository[Expense]]] = [
+            ('memory', MemoryRepository[Expense]()),
+            ('sqlite', SQLiteRepository[Expense](db_file, Expense,
+                                                 ConnectionManager(db_file))),
+        ]
+        for name, repo in backends:
+            repo.add_many(Expense(amount=i, category=1) for i in range(1000))
+            wrapped = InstrumentedRepository(repo, Metrics())
+            for label, target in ((name, repo), (f'{name}, instrumented', wrapped)):
+                results[label] = per_op(
+                    lambda i, r=target: r.get(i % 1000 + 1),  # type: ignore[misc]
+                    args.count)
+    report('get(pk)', results)
+
+
+if __name__ == '__main__':
+    main()
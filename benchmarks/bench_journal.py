@@ -0,0 +1,56 @@
+"""
+MemoryRepository с журналом: стоимость записи (add с групповой фиксацией)
+и время холодного запуска - загрузки снимка и применения журнала.
+
+Запуск: python -m benchmarks.bench_journal [--rows 5000000] [--tail 100000]
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import per_op, report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.journal import Journal
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+START = datetime(2021, 1, 1)
+
+
+def expense(i: int) -> Expense:
+    """ Расход номер i """
+    return Expense(amount=i % 1000, category=i % 50,
+                   expense_date=START + timedelta(minutes=i), added_date=START,
+                   comment=f'comment {i % 100}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--tail', type=int, default=100_000)
+    args = parser.parse_args()
+
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'expenses')
+        with Journal(path, snapshot_every=args.rows * 2) as journal:
+            repo = MemoryRepository[Expense](journal=journal)
+            repo.add_many(expense(i) for i in range(args.rows))
+            start = time.perf_counter()
+            repo.snapshot()
+            results['snapshot, s'] = time.perf_counter() - start
+            results['add, us'] = per_op(lambda i: repo.add(expense(i)), args.tail)
+        del repo
+
+        start = time.perf_counter()
+        with Journal(path) as journal:
+            repo = MemoryRepository[Expense](journal=journal)
+            results['cold start, s'] = time.perf_counter() - start
+            assert len(repo.get_all()) == args.rows + args.tail
+    report(f'{args.rows} expenses in snapshot, {args.tail} in log', results, '')
+
+
+if __name__ == '__main__':
+    main()
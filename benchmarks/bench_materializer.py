@@ -0,0 +1,70 @@
+"""
+Скорость построения объектов Expense из строк таблицы: конструктор
+с именованными аргументами (как было раньше) против сгенерированной
+функции материализации.
+
+Запуск: python -m benchmarks.bench_materializer [--rows 1000000]
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from inspect import get_annotations
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from benchmarks.common import report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.materializer import make_materializer
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+def legacy_make(fields: dict[str, Any]) -> Callable[[Sequence[Any]], Expense]:
+    """ Построение объекта, как в прежней реализации get_all """
+    def make(row: Sequence[Any]) -> Expense:
+        kwargs = dict(zip(fields, row[1:]))
+        obj = Expense(**kwargs)
+        obj.pk = row[0]
+        return obj
+    return make
+
+
+def rows_per_second(make: Callable[[Sequence[Any]], Any],
+                    rows: list[tuple[Any, ...]]) -> float:
+    """ Количество строк, материализуемых за секунду """
+    start = time.perf_counter()
+    for row in rows:
+        make(row)
+    return len(rows) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    fields = get_annotations(Expense, eval_str=True)
+    fields.pop('pk')
+    moment = datetime(2023, 1, 1, 12, 0)
+    rows = [(i, i % 1000, i % 50, moment, moment, '') for i in range(1, args.rows + 1)]
+    report(f'materialize from tuples, {args.rows} rows', {
+        'Expense(**kwargs)': rows_per_second(legacy_make(fields), rows),
+        'compiled materializer': rows_per_second(
+            make_materializer(Expense, fields), rows),
+    }, unit='rows/s')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = SQLiteRepository[Expense](str(Path(tmp) / 'bench.db'), Expense)
+        repo.add_many(Expense(i % 1000, i % 50, moment, moment)
+                      for i in range(args.rows))
+        start = time.perf_counter()
+        count = sum(1 for _ in repo.iter_all(batch_size=10_000))
+        report(f'SQLiteRepository.iter_all, {args.rows} rows', {
+            'compiled materializer': count / (time.perf_counter() - start),
+        }, unit='rows/s')
+        repo.manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Скорость отбора в MemoryRepository без индексов и с индексами:
+- равенство по category (1000 категорий) с хэш-индексом;
+- расходы за последние 7 дней и последние 10 расходов
+  с упорядоченным индексом по expense_date (записи распределены на 3 года).
+
+Запуск: python -m benchmarks.bench_memory_index [--rows 1000000]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import per_op, report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+
+CATEGORIES = 1000
+START = datetime(2021, 1, 1)
+END = START + timedelta(days=3 * 365)
+
+
+def build(rows: int, **indexes: tuple[str, ...]) -> MemoryRepository[Expense]:
+    """ Репозиторий с rows расходами и заданными индексами """
+    repo = MemoryRepository[Expense](**indexes)
+    step = (END - START) / rows
+    repo.add_many(Expense(amount=i, category=i % CATEGORIES,
+                          expense_date=START + step * i)
+                  for i in range(rows))
+    return repo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=20)
+    args = parser.parse_args()
+
+    equality: dict[str, float] = {}
+    week: dict[str, float] = {}
+    latest: dict[str, float] = {}
+    week_query = Query([('expense_date', '>=', END - timedelta(days=7))])
+    latest_query = Query(order_by=['-expense_date'], limit=10)
+    for name, indexes in (('scan', {}),
+                          ('index', {'indexed_fields': ('category',),
+                                     'range_indexed_fields': ('expense_date',)})):
+        repo = build(args.rows, **indexes)
+        equality[name] = per_op(lambda i, r=repo: r.get_all(  # type: ignore[misc]
+            {'category': i % CATEGORIES}), args.lookups)
+        week[name] = per_op(lambda i, r=repo: r.aggregate(  # type: ignore[misc]
+            [], {'total': ('sum', 'amount')}, week_query), args.lookups)
+        latest[name] = per_op(lambda i, r=repo: r.find(  # type: ignore[misc]
+            latest_query), args.lookups)
+    report(f'get_all({{"category": ...}}), {args.rows} expenses', equality)
+    report('Sum of expenses for the last 7 days', week)
+    report('10 latest expenses', latest)
+
+
+if __name__ == '__main__':
+    main()
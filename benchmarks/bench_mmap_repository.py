@@ -0,0 +1,64 @@
+"""
+Чтение архива расходов: SQLiteRepository против MappedExpenseRepository
+(файл записей фиксированной длины, отображенный в память).
+
+Запуск: python -m benchmarks.bench_mmap_repository [--rows 1000000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import per_op, report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.mmap_repository import MappedExpenseRepository, convert_sqlite
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+START = datetime(2021, 1, 1)
+
+
+def scan_ms(repo: AbstractRepository[Expense], query: Query) -> float:
+    """ Время перебора записей, подходящих под запрос, в миллисекундах """
+    start = time.perf_counter()
+    for _ in repo.iter_all(query):
+        pass
+    return (time.perf_counter() - start) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / 'expenses.db')
+        sqlite = SQLiteRepository[Expense](db_file, Expense)
+        step = timedelta(days=3 * 365) / args.rows
+        sqlite.add_many(Expense(amount=i % 1000, category=i % 50,
+                                expense_date=START + step * i, comment=f'c{i % 100}')
+                        for i in range(args.rows))
+        path = str(Path(tmp) / 'expenses.bin')
+        start = time.perf_counter()
+        convert_sqlite(db_file, path)
+        print(f'convert: {time.perf_counter() - start:.2f} s')
+
+        pks = [random.randint(1, args.rows) for _ in range(100_000)]
+        query = Query([('category', '=', 7), ('amount', '>', 500)])
+        get: dict[str, float] = {}
+        scan: dict[str, float] = {}
+        with MappedExpenseRepository(path) as mapped:
+            for name, repo in (('SQLite', sqlite), ('mmap', mapped)):
+                get[name] = per_op(lambda i, r=repo: r.get(pks[i]),  # type: ignore[misc]
+                                   len(pks))
+                scan[name] = scan_ms(repo, query)
+    report('get(pk)', get)
+    report('iter_all, category = 7 and amount > 500', scan, 'ms')
+
+
+if __name__ == '__main__':
+    main()
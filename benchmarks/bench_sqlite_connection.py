@@ -0,0 +1,75 @@
+"""
+Задержка операций SQLiteRepository: открытие соединения на каждый вызов
+(как было раньше) против общего менеджера соединений.
+
+Запуск: python -m benchmarks.bench_sqlite_connection [--rows 100000]
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.common import per_op, report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_codecs import encode_datetime
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+FIELDS = 'amount, category, expense_date, added_date, comment'
+DATE = datetime(2023, 1, 1)
+# дата в том виде, в котором ее хранит репозиторий
+STORED_DATE = encode_datetime(DATE)
+
+
+def fill(db_file: str, rows: int) -> None:
+    """ Заполнить таблицу expense одной транзакцией """
+    repo = SQLiteRepository[Expense](db_file, Expense)
+    repo.add_many(Expense(i % 1000, i % 50, DATE, DATE) for i in range(rows))
+
+
+def legacy_get(db_file: str, pk: int) -> None:
+    """ Чтение с открытием соединения, как в прежней реализации """
+    with sqlite3.connect(db_file) as con:
+        con.execute('SELECT * FROM expense WHERE pk = ?', (pk,)).fetchall()
+    con.close()
+
+
+def legacy_add(db_file: str) -> None:
+    """ Вставка с открытием соединения, как в прежней реализации """
+    with sqlite3.connect(db_file) as con:
+        con.execute('PRAGMA foreign_keys = ON')
+        con.execute(f'INSERT INTO expense ({FIELDS}) VALUES (?, ?, ?, ?, ?)',
+                    (1, 1, STORED_DATE, STORED_DATE, ''))
+    con.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--ops', type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = str(Path(tmp) / 'before.db')
+        after_db = str(Path(tmp) / 'after.db')
+        fill(before_db, args.rows)
+        fill(after_db, args.rows)
+        repo = SQLiteRepository[Expense](after_db, Expense)
+        pks = [random.randint(1, args.rows) for _ in range(args.ops)]
+
+        report(f'get, {args.rows} rows', {
+            'connect per call': per_op(lambda i: legacy_get(before_db, pks[i]), args.ops),
+            'connection manager': per_op(lambda i: repo.get(pks[i]), args.ops),
+        })
+        report(f'add, {args.rows} rows', {
+            'connect per call': per_op(lambda i: legacy_add(before_db), args.ops),
+            'connection manager': per_op(
+                lambda i: repo.add(Expense(1, 1, DATE, DATE)), args.ops),
+        })
+        repo.manager.close()
+
+
+if __name__ == '__main__':
+    main()
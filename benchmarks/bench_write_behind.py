@@ -0,0 +1,42 @@
+"""
+Поток добавления расходов по одному: SQLiteRepository (транзакция
+на каждую запись) против WriteBehindSQLiteRepository (пакетная запись).
+
+Запуск: python -m benchmarks.bench_write_behind [--rows 20000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import report
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.sqlite_write_behind import WriteBehindSQLiteRepository
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = SQLiteRepository[Expense](str(Path(tmp) / 'sync.db'), Expense)
+        start = time.perf_counter()
+        for i in range(args.rows):
+            repo.add(Expense(amount=i, category=1))
+        results['SQLiteRepository'] = args.rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with WriteBehindSQLiteRepository[Expense](
+                str(Path(tmp) / 'buffered.db'), Expense) as buffered:
+            for i in range(args.rows):
+                buffered.add(Expense(amount=i, category=1))
+        results['WriteBehindSQLiteRepository'] = args.rows / (time.perf_counter() - start)
+    report(f'add() one by one, {args.rows} expenses', results, 'rows/s')
+
+
+if __name__ == '__main__':
+    main()
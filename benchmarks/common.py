@@ -0,0 +1,25 @@
+"""
+Вспомогательные функции для бенчмарков
+"""
+
+import time
+from typing import Any, Callable
+
+
+def per_op(func: Callable[[int], Any], count: int) -> float:
+    """
+    Вызвать func(i) для i от 0 до count - 1,
+    вернуть среднее время одного вызова в микросекундах
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def report(title: str, results: dict[str, float], unit: str = 'us/op') -> None:
+    """ Напечатать результаты в виде таблицы """
+    print(title)
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f'  {name:<{width}}  {value:12.2f} {unit}')
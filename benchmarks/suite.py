@@ -0,0 +1,434 @@
+"""
+Набор бенчмарков для отслеживания регрессий производительности.
+
+Сценарии (CASES) выполняются для каждого масштаба (количества записей):
+CRUD и get_all(where) для MemoryRepository и SQLiteRepository,
+get_subcategories и get_all_parents на глубоком и широком деревьях
+категорий, итоги по дереву категорий (rollup), read_tree и импорт дерева
+(Category.import_tree) на большом тексте и обновление таблиц Presenter
+с фиктивным окном. Каждое измерение - лучшее из repeat повторений
+в миллисекундах. Результаты записываются в JSON и сравниваются
+с сохраненными ранее (baseline): замедление больше чем на threshold
+считается регрессией, и код возврата равен 1.
+
+Запуск:
+    python -m benchmarks.suite [--scale 10k 100k 1M] [--case memory_crud ...]
+        [--repeat 3] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--threshold 0.25]
+
+Новый baseline - это просто файл результатов (--output).
+Тот же набор запускается через pytest (см. benchmarks/test_suite.py).
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from bookkeeper.generator import category_tree_lines, generate_expenses, write_batches
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_rollup import rollup
+from bookkeeper.models.category_tree import CategoryTree
+from bookkeeper.models.expense import Expense
+from bookkeeper.presenter.presenter import Presenter
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import iter_tree, read_tree
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+SAMPLE = 10_000
+CATEGORIES = 20
+# количество пар "добавление категории + проверка is_descendant"
+MIXED = 1000
+# длина цепочек в глубоком дереве; число цепочек растет с масштабом
+CHAIN_DEPTH = 500
+# измерения короче этого времени (мс) слишком зашумлены для сравнения
+MIN_COMPARED_MS = 1.0
+
+Results = dict[str, float]
+Case = Callable[[int, int], Results]
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    """ Зарегистрировать сценарий с именем name """
+    def register(func: Case) -> Case:
+        CASES[name] = func
+        return func
+    return register
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """ Лучшее из repeat измерений времени вызова func, в миллисекундах """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def parse_scale(text: str) -> int:
+    """ Масштаб из строки вида 10k, 1M или 5000 """
+    if text in SCALES:
+        return SCALES[text]
+    suffixes = {'k': 1_000, 'K': 1_000, 'm': 1_000_000, 'M': 1_000_000}
+    if text[-1:] in suffixes:
+        return int(text[:-1]) * suffixes[text[-1]]
+    return int(text)
+
+
+def scale_label(scale: int) -> str:
+    """ Короткая запись масштаба: 10000 -> 10k """
+    for label, value in SCALES.items():
+        if value == scale:
+            return label
+    return str(scale)
+
+
+def _expenses(count: int, seed: int = 0) -> Iterator[Expense]:
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    for _ in range(count):
+        yield Expense(amount=rng.randrange(1, 10_000),
+                      category=rng.randrange(1, CATEGORIES + 1),
+                      expense_date=start + timedelta(minutes=rng.randrange(525_600)),
+                      comment=rng.choice(('', 'обед', 'такси', 'продукты')))
+
+
+def _crud(repo: AbstractRepository[Expense], scale: int, repeat: int) -> Results:
+    """ Общие измерения CRUD для пустого репозитория расходов """
+    results: Results = {}
+    start = time.perf_counter()
+    pks = repo.add_many(_expenses(scale))
+    results['add_many'] = (time.perf_counter() - start) * 1000
+    sample = random.Random(1).sample(pks, min(SAMPLE, len(pks)))
+    results['get'] = best_of(lambda: [repo.get(pk) for pk in sample], repeat)
+    results['get_all'] = best_of(repo.get_all, repeat)
+    results['get_all_where'] = best_of(lambda: repo.get_all({'category': 1}), repeat)
+    objs = [repo.get(pk) for pk in sample]
+    for obj in objs:
+        obj.amount += 1  # type: ignore[union-attr]
+
+    def update() -> None:
+        for obj in objs:
+            repo.update(obj)  # type: ignore[arg-type]
+
+    results['update'] = best_of(update, repeat)
+    start = time.perf_counter()
+    for pk in sample:
+        repo.delete(pk)
+    results['delete'] = (time.perf_counter() - start) * 1000
+    return results
+
+
+@case('memory_crud')
+def memory_crud(scale: int, repeat: int) -> Results:
+    """ CRUD и get_all(where) для MemoryRepository """
+    return _crud(MemoryRepository[Expense](), scale, repeat)
+
+
+@case('sqlite_crud')
+def sqlite_crud(scale: int, repeat: int) -> Results:
+    """ CRUD и get_all(where) для SQLiteRepository во временном файле """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / 'bench.db')
+        manager = ConnectionManager(db_file)
+        try:
+            return _crud(SQLiteRepository[Expense](db_file, Expense, manager),
+                         scale, repeat)
+        finally:
+            manager.close()
+
+
+def _chains(repo: AbstractRepository[Category], count: int) -> list[Category]:
+    """ Цепочки длины CHAIN_DEPTH из count категорий; возвращает их корни """
+    roots = []
+    parent: int | None = None
+    for i in range(count):
+        if i % CHAIN_DEPTH == 0:
+            parent = None
+        cat = Category(f'c{i}', parent)
+        repo.add(cat)
+        if parent is None:
+            roots.append(cat)
+        parent = cat.pk
+    return roots
+
+
+@case('category_deep')
+def category_deep(scale: int, repeat: int) -> Results:
+    """ Предки листа и потомки корня цепочки категорий глубины CHAIN_DEPTH """
+    repo = MemoryRepository[Category]()
+    roots = _chains(repo, scale)
+    leaf = repo.get(roots[0].pk + min(scale, CHAIN_DEPTH) - 1)
+    assert leaf is not None
+    results = {
+        'get_all_parents': best_of(lambda: list(leaf.get_all_parents(repo)), repeat),
+        'get_subcategories': best_of(
+            lambda: list(roots[0].get_subcategories(repo)), repeat),
+    }
+    return results | _tree_results(repo, roots[0], leaf, repeat)
+
+
+@case('category_wide')
+def category_wide(scale: int, repeat: int) -> Results:
+    """ Потомки корня, у которого scale - 1 непосредственных подкатегорий """
+    repo = MemoryRepository[Category]()
+    root = Category('root')
+    repo.add(root)
+    repo.add_many(Category(f'c{i}', root.pk) for i in range(scale - 1))
+    leaf = repo.get(scale)
+    assert leaf is not None
+    results = {
+        'get_subcategories': best_of(lambda: list(root.get_subcategories(repo)),
+                                     repeat),
+        'get_all_parents': best_of(lambda: list(leaf.get_all_parents(repo)), repeat),
+    }
+    return results | _tree_results(repo, root, leaf, repeat)
+
+
+def _tree_results(repo: AbstractRepository[Category], root: Category,
+                  leaf: Category, repeat: int) -> Results:
+    """
+    Те же запросы через CategoryTree, проверка is_descendant и проверки
+    вперемешку с добавлением категорий под лист и под корень
+    """
+    start = time.perf_counter()
+    tree = CategoryTree.from_repo(repo)
+    built = (time.perf_counter() - start) * 1000
+    tree.is_descendant(leaf.pk, root.pk)
+    new_pks = count(len(tree) + 1)
+
+    def add_and_check() -> None:
+        for i in range(MIXED):
+            cat = Category('new', (leaf.pk, root.pk)[i % 2], next(new_pks))
+            tree.add(cat)
+            tree.is_descendant(cat.pk, root.pk)
+
+    return {
+        'tree_build': built,
+        'tree_get_all_parents': best_of(
+            lambda: list(leaf.get_all_parents(repo, tree)), repeat),
+        'tree_get_subcategories': best_of(
+            lambda: list(root.get_subcategories(repo, tree)), repeat),
+        'tree_is_descendant': best_of(
+            lambda: [tree.is_descendant(leaf.pk, root.pk) for _ in range(SAMPLE)],
+            repeat),
+        'tree_add_and_check': best_of(add_and_check, repeat),
+    }
+
+
+@case('category_rollup')
+def category_rollup(scale: int, repeat: int) -> Results:
+    """ Итоги по дереву из 4680 категорий при scale расходах """
+    tree = read_tree(category_tree_lines(depth=4, fanout=8))
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / 'bench.db')
+        manager = ConnectionManager(db_file)
+        try:
+            backends: list[tuple[str, AbstractRepository[Category],
+                                 AbstractRepository[Expense]]] = [
+                ('memory', MemoryRepository[Category](), MemoryRepository[Expense]()),
+                ('sqlite', SQLiteRepository[Category](db_file, Category, manager),
+                 SQLiteRepository[Expense](db_file, Expense, manager)),
+            ]
+            for name, cat_repo, exp_repo in backends:
+                cats = Category.create_from_tree(tree, cat_repo)
+                write_batches(exp_repo, generate_expenses(
+                    scale, [cat.pk for cat in cats]))
+                results[name] = best_of(lambda c=cat_repo, e=exp_repo: rollup(c, e),
+                                        repeat)
+                results[f'{name}_month'] = best_of(
+                    lambda c=cat_repo, e=exp_repo: rollup(  # type: ignore[misc]
+                        c, e, datetime(2023, 1, 1), datetime(2023, 2, 1)), repeat)
+        finally:
+            manager.close()
+    return results
+
+
+def _tree_lines(count: int, fanout: int = 10, depth: int = 4) -> list[str]:
+    """ Текст дерева из count строк: у каждого узла до fanout потомков """
+    lines: list[str] = []
+
+    def walk(level: int) -> None:
+        for _ in range(fanout if level else count):
+            if len(lines) >= count:
+                return
+            lines.append('    ' * level + f'c{len(lines)}\n')
+            if level + 1 < depth:
+                walk(level + 1)
+
+    walk(0)
+    return lines
+
+
+@case('read_tree')
+def read_tree_case(scale: int, repeat: int) -> Results:
+    """ Разбор текста дерева категорий из scale строк """
+    lines = _tree_lines(scale)
+    return {
+        'read_tree': best_of(lambda: read_tree(lines), repeat),
+        'iter_tree': best_of(lambda: deque(iter_tree(lines), maxlen=0), repeat),
+        'import_tree': best_of(
+            lambda: Category.import_tree(lines, MemoryRepository[Category]()), repeat),
+    }
+
+
+class FakeView:
+    """ Окно без графического интерфейса: принимает обработчики и данные """
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        if name.startswith(('on_', 'set_')) or name == 'show':
+            return _ignore
+        raise AttributeError(name)
+
+
+def _ignore(*_: Any) -> None:
+    pass
+
+
+@case('presenter_refresh')
+def presenter_refresh(scale: int, repeat: int) -> Results:
+    """ Обновление таблиц Presenter при scale расходах в SQLite """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / 'bench.db')
+        manager = ConnectionManager(db_file)
+        try:
+            cat_repo = MemoryRepository[Category]()
+            cat_repo.add_many(Category(f'c{i}') for i in range(CATEGORIES))
+            budget_repo = MemoryRepository[Budget]()
+            budget_repo.add_many(Budget(period, 0, 1000)
+                                 for period in ('День', 'Неделя', 'Месяц'))
+            exp_repo = SQLiteRepository[Expense](db_file, Expense, manager)
+            exp_repo.add_many(_expenses(scale))
+            presenter = Presenter(FakeView(), FakeView(), cat_repo, exp_repo,
+                                  budget_repo)
+            return {
+                'update_expense_data': best_of(presenter.update_expense_data, repeat),
+                'update_budget_data': best_of(presenter.update_budget_data, repeat),
+                'update_category_data': best_of(presenter.update_category_data,
+                                                repeat),
+            }
+        finally:
+            manager.close()
+
+
+def run(scales: list[int], cases: list[str] | None = None, repeat: int = 3,
+        log: Callable[[str], Any] = _ignore) -> dict[str, Any]:
+    """
+    Выполнить сценарии cases (по умолчанию все) для каждого масштаба.
+    Возвращает {'meta': {...}, 'results': {масштаб: {сценарий: {метрика: мс}}}}
+    """
+    results: dict[str, dict[str, Results]] = {}
+    for scale in scales:
+        label = scale_label(scale)
+        for name in cases or CASES:
+            log(f'{label} {name}')
+            results.setdefault(label, {})[name] = CASES[name](scale, repeat)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def _flatten(results: dict[str, Any]) -> dict[str, float]:
+    return {f'{label}/{name}/{metric}': value
+            for label, cases in results['results'].items()
+            for name, metrics in cases.items()
+            for metric, value in metrics.items()}
+
+
+@dataclass
+class Regression:
+    """ Замедление метрики key относительно baseline """
+    key: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        """ Во сколько раз выросло время """
+        return self.current / self.baseline
+
+    def __str__(self) -> str:
+        return (f'{self.key}: {self.baseline:.2f} -> {self.current:.2f} ms '
+                f'(x{self.ratio:.2f})')
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any],
+            threshold: float = 0.25) -> list[Regression]:
+    """
+    Метрики results, время которых выросло относительно baseline больше
+    чем на долю threshold. Метрики, которых нет в baseline, и слишком
+    короткие измерения (меньше MIN_COMPARED_MS) не сравниваются.
+    """
+    old = _flatten(baseline)
+    regressions = []
+    for key, value in _flatten(results).items():
+        before = old.get(key)
+        if before is None or max(before, value) < MIN_COMPARED_MS:
+            continue
+        if value > before * (1 + threshold):
+            regressions.append(Regression(key, before, value))
+    return regressions
+
+
+def print_results(results: dict[str, Any]) -> None:
+    """ Напечатать результаты в виде таблицы """
+    for label, cases in results['results'].items():
+        for name, metrics in cases.items():
+            print(f'{label} {name}')
+            width = max(len(metric) for metric in metrics)
+            for metric, value in metrics.items():
+                print(f'  {metric:<{width}}  {value:12.2f} ms')
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', nargs='+', default=list(SCALES))
+    parser.add_argument('--case', nargs='+', choices=sorted(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run([parse_scale(s) for s in args.scale], args.case, args.repeat,
+                  log=lambda msg: print(msg, file=sys.stderr))
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
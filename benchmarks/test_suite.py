@@ -0,0 +1,51 @@
+"""
+Запуск набора бенчмарков через pytest.
+
+По умолчанию сценарии выполняются на малом масштабе и только проверяют,
+что они работают. Масштаб и сравнение с baseline задаются переменными
+окружения:
+    BOOKKEEPER_BENCH_SCALE=100k BOOKKEEPER_BENCH_BASELINE=benchmarks/baseline.json \
+        pytest benchmarks
+"""
+
+import json
+import os
+
+import pytest
+
+from benchmarks.suite import CASES, compare, parse_scale, run, scale_label
+
+SCALE = parse_scale(os.environ.get('BOOKKEEPER_BENCH_SCALE', '1000'))
+BASELINE = os.environ.get('BOOKKEEPER_BENCH_BASELINE')
+THRESHOLD = float(os.environ.get('BOOKKEEPER_BENCH_THRESHOLD', '0.25'))
+REPEAT = int(os.environ.get('BOOKKEEPER_BENCH_REPEAT', '1'))
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_case(name):
+    results = run([SCALE], [name], REPEAT)
+    metrics = results['results'][scale_label(SCALE)][name]
+    assert metrics and all(value >= 0 for value in metrics.values())
+    if BASELINE:
+        with open(BASELINE, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), THRESHOLD)
+        assert not regressions, '\n'.join(map(str, regressions))
+
+
+def test_parse_scale():
+    assert parse_scale('10k') == 10_000
+    assert parse_scale('1M') == 1_000_000
+    assert parse_scale('250k') == 250_000
+    assert parse_scale('5000') == 5000
+    assert scale_label(100_000) == '100k'
+    assert scale_label(5000) == '5000'
+
+
+def test_compare_flags_slowdown():
+    baseline = {'results': {'10k': {'case': {'slow': 10.0, 'fast': 10.0,
+                                             'tiny': 0.1}}}}
+    results = {'results': {'10k': {'case': {'slow': 20.0, 'fast': 11.0,
+                                            'tiny': 0.5, 'new': 5.0}}}}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert [r.key for r in regressions] == ['10k/case/slow']
+    assert regressions[0].ratio == 2.0
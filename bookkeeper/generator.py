@@ -0,0 +1,163 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования
+
+category_tree_lines выдает дерево категорий заданной глубины и ширины
+в формате read_tree, generate_expenses - поток расходов с правдоподобным
+распределением: даты идут по возрастанию с экспоненциальными интервалами
+(пуассоновский поток), суммы распределены логнормально (много мелких трат,
+мало крупных), популярность категорий убывает по закону Ципфа. Результат
+полностью определяется параметром seed.
+
+Генераторы ничего не накапливают в памяти, поэтому годятся для десятков
+миллионов записей; write_batches записывает поток в любой репозиторий
+пакетами через add_many.
+
+Запуск:
+    python -m bookkeeper.generator --db ledger.db --depth 3 --fanout 5 \\
+        --expenses 1000000 [--seed 0] [--start 2020-01-01] [--end 2024-01-01]
+    python -m bookkeeper.generator --depth 3 --fanout 5 --tree-only > tree.txt
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Sequence, TypeVar
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import read_tree
+
+T = TypeVar('T')
+
+MEDIAN_AMOUNT = 500
+AMOUNT_SIGMA = 1.0
+MAX_ADD_DELAY = 3 * 24 * 3600
+COMMENTS = ('', '', '', '', 'карта', 'наличные', 'по акции', 'в подарок')
+
+
+def category_tree_lines(depth: int, fanout: int, indent: str = '    ',
+                        prefix: str = 'категория') -> Iterator[str]:
+    """
+    Строки дерева категорий в формате read_tree: fanout категорий верхнего
+    уровня, у каждой категории выше уровня depth - fanout подкатегорий.
+    Имена уникальны и содержат путь от корня: "категория 2.1.3".
+    """
+    def walk(path: str, level: int) -> Iterator[str]:
+        for i in range(1, fanout + 1):
+            name = f'{path}.{i}' if path else str(i)
+            yield f'{indent * level}{prefix} {name}'
+            if level + 1 < depth:
+                yield from walk(name, level + 1)
+
+    return walk('', 0)
+
+
+def generate_expenses(count: int, categories: Sequence[int], seed: int = 0,
+                      start: datetime = datetime(2020, 1, 1),
+                      end: datetime = datetime(2024, 1, 1)) -> Iterator[Expense]:
+    """
+    Выдать count расходов по категориям с id из categories в порядке
+    возрастания даты расхода, примерно равномерно заполняя интервал
+    от start до end. Дата добавления отстает от даты расхода
+    не больше чем на MAX_ADD_DELAY секунд.
+    """
+    if not categories:
+        raise ValueError('at least one category is required')
+    rng = random.Random(seed)
+    popular = list(categories)
+    rng.shuffle(popular)
+    cum_weights = list(itertools.accumulate(1 / rank
+                                            for rank in range(1, len(popular) + 1)))
+    total_weight = cum_weights[-1]
+    rate = count / max((end - start).total_seconds(), 1)
+    mu = math.log(MEDIAN_AMOUNT)
+    seconds = 0.0
+    for _ in range(count):
+        seconds += rng.expovariate(rate)
+        moment = start + timedelta(seconds=int(seconds))
+        category = popular[bisect.bisect(cum_weights, rng.random() * total_weight)]
+        yield Expense(
+            amount=max(1, round(rng.lognormvariate(mu, AMOUNT_SIGMA))),
+            category=category,
+            expense_date=moment,
+            added_date=moment + timedelta(seconds=rng.randrange(MAX_ADD_DELAY)),
+            comment=rng.choice(COMMENTS),
+        )
+
+
+def batches(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """ Разбить поток на списки не длиннее size """
+    it = iter(items)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def write_batches(repo: AbstractRepository[T], items: Iterable[T],
+                  batch_size: int = 10_000) -> int:
+    """
+    Записать поток объектов в репозиторий пакетами по batch_size
+    через add_many. Возвращает количество записанных объектов.
+    """
+    written = 0
+    for batch in batches(items, batch_size):
+        repo.add_many(batch)
+        written += len(batch)
+    return written
+
+
+def populate(cat_repo: AbstractRepository[Category],
+             exp_repo: AbstractRepository[Expense],
+             depth: int, fanout: int, expenses: int, seed: int = 0,
+             start: datetime = datetime(2020, 1, 1),
+             end: datetime = datetime(2024, 1, 1),
+             batch_size: int = 10_000) -> list[Category]:
+    """
+    Создать дерево категорий и expenses расходов по всем его категориям.
+    Возвращает список созданных категорий.
+    """
+    cats = Category.create_from_tree(
+        read_tree(category_tree_lines(depth, fanout)), cat_repo)
+    write_batches(exp_repo, generate_expenses(
+        expenses, [cat.pk for cat in cats], seed, start, end), batch_size)
+    return cats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='файл базы данных SQLite')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--expenses', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=datetime.fromisoformat,
+                        default=datetime(2020, 1, 1))
+    parser.add_argument('--end', type=datetime.fromisoformat,
+                        default=datetime(2024, 1, 1))
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--tree-only', action='store_true',
+                        help='только напечатать дерево категорий')
+    args = parser.parse_args(argv)
+
+    if args.tree_only:
+        for line in category_tree_lines(args.depth, args.fanout):
+            print(line)
+        return
+    if args.db is None:
+        parser.error('--db is required unless --tree-only is given')
+    cat_repo = SQLiteRepository[Category](args.db, Category)
+    exp_repo = SQLiteRepository[Expense](args.db, Expense, cat_repo.manager)
+    cats = populate(cat_repo, exp_repo, args.depth, args.fanout, args.expenses,
+                    args.seed, args.start, args.end, args.batch_size)
+    print(f'{len(cats)} categories, {args.expenses} expenses -> {args.db}',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
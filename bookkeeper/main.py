@@ -12,6 +12,7 @@ from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
 from bookkeeper.models.budget import Budget
 from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.sqlite_connection import ConnectionManager
 from bookkeeper.utils import read_tree
 
 
@@ -24,9 +25,10 @@ if __name__ == '__main__':
     view = MainWindow()
     cat_view = CategoryView()
 
-    category_repo = SQLiteRepository[Category](DB_NAME, Category)
-    expense_repo = SQLiteRepository[Expense](DB_NAME, Expense)
-    budget_repo = SQLiteRepository[Budget](DB_NAME, Budget)
+    manager = ConnectionManager.for_file(DB_NAME)
+    category_repo = SQLiteRepository[Category](DB_NAME, Category, manager)
+    expense_repo = SQLiteRepository[Expense](DB_NAME, Expense, manager)
+    budget_repo = SQLiteRepository[Budget](DB_NAME, Budget, manager)
 
     if not category_repo.get_all():
         cats = '''
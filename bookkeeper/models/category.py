@@ -3,9 +3,14 @@
 """
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterator
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator
 
-from ..repository.abstract_repository import AbstractRepository
+from ..repository.abstract_repository import AbstractRepository, HierarchicalRepository
+from ..utils import iter_tree
+
+if TYPE_CHECKING:
+    from .category_tree import CategoryTree
 
 
 @dataclass
@@ -38,7 +43,8 @@ class Category:
         return repo.get(self.parent)
 
     def get_all_parents(self,
-                        repo: AbstractRepository['Category']
+                        repo: AbstractRepository['Category'],
+                        tree: 'CategoryTree | None' = None
                         ) -> Iterator['Category']:
         """
         Получить все категории верхнего уровня в иерархии.
@@ -46,19 +52,26 @@ class Category:
         Parameters
         ----------
         repo - репозиторий для получения объектов
+        tree - индекс дерева категорий; если указан, репозиторий не используется
 
         Yields
         -------
         Объекты Category от родителя и выше до категории верхнего уровня
         """
-        parent = self.get_parent(repo)
-        if parent is None:
+        if tree is not None:
+            yield from tree.ancestors(self.pk)
             return
-        yield parent
-        yield from parent.get_all_parents(repo)
+        if isinstance(repo, HierarchicalRepository):
+            yield from repo.get_ancestors(self.pk)
+            return
+        parent = self.get_parent(repo)
+        while parent is not None:
+            yield parent
+            parent = parent.get_parent(repo)
 
     def get_subcategories(self,
-                          repo: AbstractRepository['Category']
+                          repo: AbstractRepository['Category'],
+                          tree: 'CategoryTree | None' = None
                           ) -> Iterator['Category']:
         """
         Получить все подкатегории из иерархии, т.е. непосредственные
@@ -67,18 +80,25 @@ class Category:
         Parameters
         ----------
         repo - репозиторий для получения объектов
+        tree - индекс дерева категорий; если указан, репозиторий не используется
 
         Yields
         -------
         Объекты Category, являющиеся подкатегориями разного уровня ниже данной.
         """
+        if tree is not None:
+            return tree.descendants(self.pk)
+        if isinstance(repo, HierarchicalRepository):
+            return (cat for cat in repo.get_descendants(self.pk))
 
         def get_children(graph: dict[int | None, list['Category']],
                          root: int) -> Iterator['Category']:
             """ dfs in graph from root """
-            for x in graph[root]:
+            stack = list(reversed(graph[root]))
+            while stack:
+                x = stack.pop()
                 yield x
-                yield from get_children(graph, x.pk)
+                stack.extend(reversed(graph[x.pk]))
 
         subcats = defaultdict(list)
         for cat in repo.get_all():
@@ -111,8 +131,60 @@ class Category:
         Список созданных объектов Category
         """
         created: dict[str, Category] = {}
+        batch: list[Category] = []
         for child, parent in tree:
+            if parent is not None and created[parent].pk == 0:
+                repo.add_many(batch)
+                batch = []
             cat = cls(child, created[parent].pk if parent is not None else None)
-            repo.add(cat)
+            batch.append(cat)
             created[child] = cat
+        repo.add_many(batch)
         return list(created.values())
+
+    @classmethod
+    def import_tree(cls, lines: Iterable[str],
+                    repo: AbstractRepository['Category'],
+                    batch_size: int = 10_000) -> int:
+        """
+        Создать дерево категорий из текста с отступами (формат read_tree),
+        читая его лениво. Родитель определяется по пути от корня, а не
+        по имени, поэтому одинаковые имена у разных родителей допустимы.
+        Категории добавляются через add_many, каждые batch_size строк -
+        в отдельной транзакции; при ошибке отступов уже зафиксированные
+        пакеты остаются в репозитории. В памяти хранятся только текущий
+        путь и еще не записанные категории.
+
+        Parameters
+        ----------
+        lines - Итерируемый объект, содержащий строки текста (файл или список строк)
+        repo - репозиторий для сохранения объектов
+        batch_size - количество строк в одной транзакции
+
+        Returns
+        -------
+        Количество созданных категорий
+        """
+        if batch_size < 1:
+            raise ValueError('batch size must be positive')
+        tree = iter_tree(lines)
+        path: list[Category] = []
+        count = 0
+        while True:
+            chunk = 0
+            with repo.transaction():
+                batch: list[Category] = []
+                for level, name in islice(tree, batch_size):
+                    del path[level:]
+                    parent = path[-1] if path else None
+                    if parent is not None and parent.pk == 0:
+                        repo.add_many(batch)
+                        batch = []
+                    cat = cls(name, parent.pk if parent is not None else None)
+                    batch.append(cat)
+                    path.append(cat)
+                    chunk += 1
+                repo.add_many(batch)
+            count += chunk
+            if chunk < batch_size:
+                return count
@@ -0,0 +1,115 @@
+"""
+Итоги расходов по дереву категорий
+
+rollup возвращает дерево итогов: для каждой категории - сумму расходов
+непосредственно в ней (own) и вместе со всеми подкатегориями (total)
+за интервал дат. Для категорий и расходов в одной базе SQLite итоги
+считаются одним запросом по таблице замыкания (см.
+SQLiteRepository.subtree_totals), для остальных репозиториев - суммы
+по категориям через aggregate и один проход по дереву снизу вверх.
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterator
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_tree import CategoryTree
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.instrumentation import (
+    InstrumentedHierarchicalRepository, unwrap
+)
+from bookkeeper.repository.query import Condition, Query
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+@dataclass
+class CategoryTotal:
+    """
+    Итог расходов по категории.
+    own - сумма расходов, отнесенных непосредственно к категории
+    total - сумма вместе с расходами всех подкатегорий
+    children - итоги непосредственных подкатегорий
+    """
+    category: Category
+    own: int = 0
+    total: int = 0
+    children: list['CategoryTotal'] = field(default_factory=list)
+
+    def walk(self) -> Iterator['CategoryTotal']:
+        """ Итог категории и всех подкатегорий в порядке обхода в глубину """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def _date_query(start: datetime | None, end: datetime | None) -> Query:
+    conditions = []
+    if start is not None:
+        conditions.append(Condition('expense_date', '>=', start))
+    if end is not None:
+        conditions.append(Condition('expense_date', '<', end))
+    return Query(conditions)
+
+
+def _same_database(cat_repo: AbstractRepository[Any],
+                   exp_repo: AbstractRepository[Any]) -> bool:
+    cat_repo, exp_repo = unwrap(cat_repo), unwrap(exp_repo)
+    return (isinstance(cat_repo, SQLiteRepository)
+            and isinstance(exp_repo, SQLiteRepository)
+            and cat_repo.closure_parent is not None
+            and os.path.abspath(cat_repo.db_file) == os.path.abspath(exp_repo.db_file))
+
+
+def _bottom_up(tree: CategoryTree, own: dict[int, int]) -> dict[int, tuple[int, int]]:
+    """ Суммы по поддеревьям: потомки обрабатываются раньше предков """
+    totals = {pk: own.get(pk, 0) for pk in own if pk in tree}
+    order = [cat.pk for root in tree.roots()
+             for cat in (root, *tree.descendants(root.pk))]
+    for pk in reversed(order):
+        parent = tree.parent(pk)
+        if parent is not None and pk in totals:
+            totals[parent.pk] = totals.get(parent.pk, 0) + totals[pk]
+    return {pk: (own.get(pk, 0), total) for pk, total in totals.items()}
+
+
+def rollup(cat_repo: AbstractRepository[Category],
+           exp_repo: AbstractRepository[Expense],
+           start: datetime | None = None,
+           end: datetime | None = None) -> list[CategoryTotal]:
+    """
+    Дерево итогов расходов по категориям за интервал дат
+    start <= дата расхода < end (без ограничения, если граница не задана).
+    Возвращает итоги категорий верхнего уровня; расходы по категориям,
+    которых нет в репозитории, не учитываются.
+    """
+    where = _date_query(start, end)
+    tree = CategoryTree.from_repo(cat_repo)
+    if _same_database(cat_repo, exp_repo):
+        assert isinstance(cat_repo, (SQLiteRepository,
+                                     InstrumentedHierarchicalRepository))
+        facts = unwrap(exp_repo)
+        assert isinstance(facts, SQLiteRepository)
+        totals = cat_repo.subtree_totals(facts, 'category', 'amount', where)
+    else:
+        own = {row['category']: row['total'] for row in exp_repo.aggregate(
+            ['category'], {'total': ('sum', 'amount')}, where)}
+        totals = _bottom_up(tree, own)
+
+    def build(cat: Category) -> CategoryTotal:
+        own, total = totals.get(cat.pk, (0, 0))
+        return CategoryTotal(cat, own, total)
+
+    nodes = {cat.pk: build(cat) for cat in tree.roots()}
+    result = list(nodes.values())
+    for root in result:
+        for cat in tree.descendants(root.category.pk):
+            node = nodes[cat.pk] = build(cat)
+            parent = tree.parent(cat.pk)
+            assert parent is not None
+            nodes[parent.pk].children.append(node)
+    return result
@@ -0,0 +1,218 @@
+"""
+Индекс дерева категорий в памяти
+
+CategoryTree строится один раз по репозиторию категорий и хранит для
+каждой категории родителя, список непосредственных подкатегорий и глубину,
+поэтому получение потомков и предков не обращается к репозиторию.
+Проверка "X - потомок Y" выполняется за O(1) по интервалам (nested sets):
+интервал каждой категории содержит интервалы всех ее подкатегорий, так что
+потомки Y - ровно те категории, номер входа которых лежит между номерами
+входа и выхода Y.
+
+Изменения категорий в репозитории нужно повторять в индексе методами
+add, update и delete; индекс, в том числе интервалы, обновляется сразу.
+Интервалы нумеруются с запасом: после подкатегорий в интервале категории
+остается свободное место, пропорциональное размеру ее поддерева.
+Добавленная или перенесенная категория нумеруется вместе с поддеревом
+в свободном месте в конце интервала родителя; если места не хватает,
+так же перенумеровывается поддерево родителя, и так далее до верхнего
+уровня, где место не ограничено. Поэтому перенумеровывается только
+затронутое поддерево, а в среднем - небольшое.
+
+Категории, родителя которых нет в индексе (например, он был удален),
+считаются категориями верхнего уровня.
+"""
+
+from typing import Iterable, Iterator
+
+from bookkeeper.models.category import Category
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+
+class CategoryTree:
+    """
+    Индекс дерева категорий.
+    categories - категории в любом порядке
+    """
+
+    def __init__(self, categories: Iterable[Category] = ()) -> None:
+        self._nodes: dict[int, Category] = {}
+        # подкатегории в порядке добавления (словарь как упорядоченное
+        # множество), None - категории верхнего уровня
+        self._children: dict[int | None, dict[int, None]] = {None: {}}
+        # родитель в индексе; отдельно от cat.parent, так как объект категории
+        # могут изменить до вызова update
+        self._parent: dict[int, int | None] = {}
+        self._depth: dict[int, int] = {}
+        # интервал категории: номера входа и выхода и последний занятый номер
+        self._enter: dict[int, int] = {}
+        self._exit: dict[int, int] = {}
+        self._used: dict[int | None, int] = {None: 0}
+        for cat in categories:
+            self._nodes[cat.pk] = cat
+            self._children.setdefault(cat.pk, {})
+        for cat in self._nodes.values():
+            parent = self._parent[cat.pk] = self._parent_key(cat)
+            self._children[parent][cat.pk] = None
+        for root in self._children[None]:
+            self._place(root)
+
+    @classmethod
+    def from_repo(cls, repo: AbstractRepository[Category]) -> 'CategoryTree':
+        """ Построить индекс по всем категориям репозитория """
+        return cls(repo.get_all())
+
+    def _parent_key(self, cat: Category) -> int | None:
+        return cat.parent if cat.parent in self._nodes else None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, pk: object) -> bool:
+        return pk in self._nodes
+
+    def get(self, pk: int) -> Category | None:
+        """ Категория с данным id или None """
+        return self._nodes.get(pk)
+
+    def roots(self) -> list[Category]:
+        """ Категории верхнего уровня """
+        return [self._nodes[pk] for pk in self._children[None]]
+
+    def children(self, pk: int) -> list[Category]:
+        """ Непосредственные подкатегории категории pk """
+        return [self._nodes[child] for child in self._children[pk]]
+
+    def parent(self, pk: int) -> Category | None:
+        """ Родительская категория или None для категорий верхнего уровня """
+        parent = self._parent[pk]
+        return self._nodes[parent] if parent is not None else None
+
+    def depth(self, pk: int) -> int:
+        """ Глубина категории (0 - категория верхнего уровня) """
+        return self._depth[pk]
+
+    def ancestors(self, pk: int) -> Iterator[Category]:
+        """ Категории от родителя категории pk до категории верхнего уровня """
+        parent = self.parent(pk)
+        while parent is not None:
+            yield parent
+            parent = self.parent(parent.pk)
+
+    def descendants(self, pk: int) -> Iterator[Category]:
+        """ Все подкатегории категории pk в порядке обхода в глубину """
+        stack = list(reversed(self._children[pk]))
+        while stack:
+            child = stack.pop()
+            yield self._nodes[child]
+            stack.extend(reversed(self._children[child]))
+
+    def _measure(self, pk: int, size: dict[int, int], span: dict[int, int]) -> None:
+        """
+        Размеры поддеревьев и длины их интервалов при нумерации с запасом.
+        Поддеревья, уже измеренные при переносе вложенной категории,
+        повторно не обходятся.
+        """
+        order = []
+        stack = [pk]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for child in self._children[node] if child not in size)
+        for node in reversed(order):
+            children = self._children[node]
+            total = 1
+            spans = len(children)
+            for child in children:
+                total += size[child]
+                spans += span[child]
+            size[node] = total
+            span[node] = 2 * total + 2 + spans
+
+    def _number(self, pk: int, start: int, size: dict[int, int]) -> None:
+        """
+        Пронумеровать поддерево pk начиная с номера start
+        и пересчитать глубины его категорий
+        """
+        parent = self._parent[pk]
+        counter = start - 1
+        # глубина -1 отмечает выход из категории
+        stack = [(pk, 0 if parent is None else self._depth[parent] + 1)]
+        while stack:
+            node, depth = stack.pop()
+            if depth < 0:
+                self._used[node] = counter
+                counter += 2 * size[node] + 2
+                self._exit[node] = counter
+                continue
+            counter += 1
+            self._enter[node] = counter
+            self._depth[node] = depth
+            stack.append((node, -1))
+            depth += 1
+            stack.extend([(child, depth) for child in reversed(self._children[node])])
+
+    def _place(self, pk: int) -> None:
+        """
+        Пронумеровать поддерево pk в свободном месте в конце интервала
+        родителя, при нехватке места - поддерево ближайшего предка, у родителя
+        которого место есть
+        """
+        size: dict[int, int] = {}
+        span: dict[int, int] = {}
+        while True:
+            self._measure(pk, size, span)
+            parent = self._parent[pk]
+            start = self._used[parent] + 1
+            if parent is None or start + span[pk] < self._exit[parent]:
+                break
+            pk = parent
+        self._number(pk, start, size)
+        self._used[parent] = self._exit[pk]
+
+    def is_descendant(self, pk: int, ancestor: int) -> bool:
+        """ Является ли категория pk подкатегорией (любого уровня) ancestor """
+        return self._enter[ancestor] < self._enter[pk] < self._exit[ancestor]
+
+    def add(self, cat: Category) -> None:
+        """ Добавить в индекс категорию, уже сохраненную в репозитории """
+        if cat.pk in self._nodes:
+            raise ValueError(f'category {cat.pk} is already in the tree')
+        self._nodes[cat.pk] = cat
+        self._children[cat.pk] = {}
+        parent = self._parent[cat.pk] = self._parent_key(cat)
+        self._children[parent][cat.pk] = None
+        self._place(cat.pk)
+
+    def update(self, cat: Category) -> None:
+        """
+        Заменить категорию с тем же id. При смене родителя поддерево
+        переносится; перенос категории внутрь ее собственного поддерева
+        вызывает ValueError.
+        """
+        old_parent = self._parent[cat.pk]
+        new_parent = self._parent_key(cat)
+        if new_parent is not None and (new_parent == cat.pk or self.is_descendant(
+                new_parent, cat.pk)):
+            raise ValueError(f'category {cat.pk} cannot be moved into its subtree')
+        self._nodes[cat.pk] = cat
+        if new_parent != old_parent:
+            del self._children[old_parent][cat.pk]
+            self._children[new_parent][cat.pk] = None
+            self._parent[cat.pk] = new_parent
+            self._place(cat.pk)
+
+    def delete(self, pk: int) -> None:
+        """
+        Удалить категорию из индекса. Ее подкатегории становятся
+        категориями верхнего уровня, как и в репозитории, где они
+        продолжают ссылаться на удаленного родителя.
+        """
+        del self._nodes[pk], self._depth[pk]
+        del self._enter[pk], self._exit[pk], self._used[pk]
+        parent = self._parent.pop(pk)
+        del self._children[parent][pk]
+        for child in self._children.pop(pk):
+            self._children[None][child] = None
+            self._parent[child] = None
+            self._place(child)
@@ -1,11 +1,13 @@
 """ Модуль реализующий внутреннюю логику и связывающий компоненты View и Model"""
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from typing import Any
 
 from ..models.expense import Expense
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.unit_of_work import UnitOfWork
 
 
 class Presenter:
@@ -59,24 +61,27 @@ class Presenter:
                         break
             self.view.set_expense_table(self.exp_data)
 
+    def spent_since(self, since: datetime) -> int:
+        """Сумма расходов начиная с даты since, считается в хранилище"""
+        res = self.exp_repo.aggregate(
+            [], {'total': ('sum', 'amount')},
+            Query([('expense_date', '>=', since)])
+        )
+        return res[0]['total'] or 0
+
     def update_budget_data(self) -> None:
         """Обновляет отображаемую таблицу бюджета в соответствии с базой данных"""
-        self.exp_data = self.exp_repo.get_all()
-        day, week, month = 0, 0, 0
-        today = datetime.now()
-        for expense in self.exp_data:
-            if expense.expense_date >= f'{(today - timedelta(days=1)):%Y-%m-%d}':
-                day += expense.amount
-            if expense.expense_date >= f'{(today - timedelta(days=7)):%Y-%m-%d}':
-                week += expense.amount
-            if expense.expense_date >= f'{(today - timedelta(days=30)):%Y-%m-%d}':
-                month += expense.amount
-        self.budget_repo.update(Budget(amount=day,
-                                       time="День", budget=self.b_day, pk=1))
-        self.budget_repo.update(Budget(amount=week,
-                                       time="Неделя", budget=self.b_week, pk=2))
-        self.budget_repo.update(Budget(amount=month,
-                                       time="Месяц", budget=self.b_month, pk=3))
+        today = datetime.combine(date.today(), time())
+        day = self.spent_since(today - timedelta(days=1))
+        week = self.spent_since(today - timedelta(days=7))
+        month = self.spent_since(today - timedelta(days=30))
+        with UnitOfWork(self.budget_repo):
+            self.budget_repo.update(Budget(amount=day,
+                                           time="День", budget=self.b_day, pk=1))
+            self.budget_repo.update(Budget(amount=week,
+                                           time="Неделя", budget=self.b_week, pk=2))
+            self.budget_repo.update(Budget(amount=month,
+                                           time="Месяц", budget=self.b_month, pk=3))
         self.view.set_budget_table(self.budget_repo.get_all())
 
     def update_category_data(self) -> None:
@@ -106,8 +111,8 @@ class Presenter:
         cat_pk = self.view.get_selected_cat()
         amount = self.view.get_amount()
         comment = self.view.get_comment()
-        date = self.view.get_selected_date()
-        exp = Expense(int(amount), cat_pk, expense_date=date, comment=comment)
+        expense_date = datetime.strptime(self.view.get_selected_date(), '%Y-%m-%d')
+        exp = Expense(int(amount), cat_pk, expense_date=expense_date, comment=comment)
         self.exp_repo.add(exp)
         self.update_expense_data()
         self.update_budget_data()
@@ -121,8 +126,7 @@ class Presenter:
         """
         selected = self.view.get_selected(self.exp_repo.get_all())
         if selected:
-            for pk in selected:
-                self.exp_repo.delete(pk)
+            self.exp_repo.delete_many(selected)
             self.update_expense_data()
             self.update_budget_data()
 
@@ -134,10 +138,10 @@ class Presenter:
         cat_pk = self.view.get_selected_cat()
         amount = self.view.get_amount()
         comment = self.view.get_comment()
-        date = self.view.get_selected_date()
+        expense_date = datetime.strptime(self.view.get_selected_date(), '%Y-%m-%d')
         select = self.view.get_selected(self.exp_repo.get_all())
         if select:
-            exp = Expense(amount, cat_pk, expense_date=date,
+            exp = Expense(amount, cat_pk, expense_date=expense_date,
                           comment=comment, pk=select[0])
             self.exp_repo.update(exp)
             self.update_expense_data()
@@ -190,8 +194,7 @@ class Presenter:
         """
         selected = self.cat_view.get_selected(self.cat_repo.get_all())
         if selected:
-            for pk in selected:
-                self.cat_repo.delete(pk)
+            self.cat_repo.delete_many(selected)
         self.update_category_data()
 
     def handle_category_change_button_clicked(self) -> None:
@@ -8,7 +8,12 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Protocol, Any
+from contextlib import AbstractContextManager, nullcontext
+from typing import (
+    Generic, TypeVar, Protocol, Any, Iterable, Iterator, Sequence, runtime_checkable
+)
+
+from bookkeeper.repository.query import Query, aggregate, to_query
 
 
 class Model(Protocol):  # pylint: disable=too-few-public-methods
@@ -21,6 +26,22 @@ class Model(Protocol):  # pylint: disable=too-few-public-methods
 T = TypeVar('T', bound=Model)
 
 
+@runtime_checkable
+class HierarchicalRepository(Protocol):
+    """
+    Репозиторий, который сам выбирает потомков и предков записи в иерархии,
+    заданной полем parent_field со ссылкой (id) на родителя.
+    Модели проверяют эту возможность через isinstance и без нее
+    обходят иерархию сами.
+    """
+
+    def get_descendants(self, pk: int, parent_field: str = 'parent') -> list[Any]:
+        """ Все потомки записи pk в порядке обхода в глубину """
+
+    def get_ancestors(self, pk: int, parent_field: str = 'parent') -> list[Any]:
+        """ Предки записи pk от родителя до записи верхнего уровня """
+
+
 class AbstractRepository(ABC, Generic[T]):
     """
     Абстрактный репозиторий.
@@ -30,6 +51,17 @@ class AbstractRepository(ABC, Generic[T]):
     get_all
     update
     delete
+    Методы с реализацией по умолчанию (через абстрактные методы),
+    которые наследники могут переопределить более эффективно:
+    find
+    iter_all
+    aggregate
+    add_many
+    update_many
+    delete_many
+    transaction
+    data_version
+    write_version
     """
 
     @abstractmethod
@@ -58,3 +90,79 @@ class AbstractRepository(ABC, Generic[T]):
     @abstractmethod
     def delete(self, pk: int) -> None:
         """ Удалить запись """
+
+    def find(self, query: Query) -> list[T]:
+        """
+        Получить записи, удовлетворяющие запросу (условия с операторами
+        сравнения, сортировка, ограничение количества и смещение)
+        """
+        return query.apply(self.get_all())
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        """
+        Перебрать записи, удовлетворяющие условию, в порядке id,
+        не загружая их все в память. Из запроса используются только
+        условия; batch_size - количество записей, читаемых за раз.
+        Реализация по умолчанию загружает все записи сразу.
+        """
+        return iter(self.find(Query(to_query(where).where, order_by=['pk'])))
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        """
+        Вычислить агрегатные функции (sum, count, min, max, avg)
+        по записям, удовлетворяющим условию, с группировкой по полям.
+        Возвращает список словарей {поле группировки или имя результата: значение},
+        упорядоченный по значениям полей группировки.
+        Формат group_by и aggregates описан в модуле query.
+
+        Пример - расходы по категориям и месяцам:
+        repo.aggregate(['category', 'expense_date:month'],
+                       {'total': ('sum', 'amount')})
+        """
+        return aggregate(self.find(Query(to_query(where).where)), group_by, aggregates)
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """
+        Добавить несколько объектов, вернуть список их id
+        в порядке добавления, также записать id в атрибуты pk.
+        """
+        return [self.add(obj) for obj in objs]
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        """ Обновить данные о нескольких объектах """
+        for obj in objs:
+            self.update(obj)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        """ Удалить несколько записей """
+        for pk in pks:
+            self.delete(pk)
+
+    def transaction(self) -> AbstractContextManager[Any]:
+        """
+        Контекстный менеджер, внутри которого изменения применяются
+        атомарно: фиксируются при выходе из блока и отменяются при
+        исключении. Реализация по умолчанию атомарности не обеспечивает.
+        """
+        return nullcontext()
+
+    def data_version(self) -> int | None:
+        """
+        Номер версии данных, который меняется, когда данные изменены
+        в обход этого объекта (другим соединением или процессом).
+        None, если хранилище не позволяет это отследить.
+        """
+        return None
+
+    def write_version(self) -> int | None:
+        """
+        Номер версии данных, который меняется при каждой фиксации изменений
+        в этом процессе через общее хранилище (в том числе другими объектами
+        репозиториев). Проверяется без обращения к хранилищу.
+        None, если хранилище не позволяет это отследить.
+        """
+        return None
@@ -0,0 +1,198 @@
+"""
+Модуль описывает асинхронный интерфейс репозитория для использования
+из asyncio и его реализации
+
+AsyncSQLiteRepository не блокирует цикл событий: чтение выполняется
+в пуле потоков-читателей (у каждого потока свое соединение, в режиме WAL
+читатели работают параллельно), а запись - в единственном потоке-писателе,
+поэтому операции записи выполняются строго по очереди.
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import TracebackType
+from typing import Any, Callable, Generic, Iterable, TypeVar
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+R = TypeVar('R')
+
+
+class AsyncAbstractRepository(ABC, Generic[T]):
+    """
+    Асинхронный абстрактный репозиторий. Методы повторяют
+    AbstractRepository, но являются сопрограммами.
+    Абстрактные методы:
+    add
+    get
+    get_all
+    update
+    delete
+    Методы с реализацией по умолчанию:
+    find
+    add_many
+    update_many
+    delete_many
+    """
+
+    @abstractmethod
+    async def add(self, obj: T) -> int:
+        """
+        Добавить объект в репозиторий, вернуть id объекта,
+        также записать id в атрибут pk.
+        """
+
+    @abstractmethod
+    async def get(self, pk: int) -> T | None:
+        """ Получить объект по id """
+
+    @abstractmethod
+    async def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        """ Получить все записи по некоторому условию """
+
+    @abstractmethod
+    async def update(self, obj: T) -> None:
+        """ Обновить данные об объекте. Объект должен содержать поле pk. """
+
+    @abstractmethod
+    async def delete(self, pk: int) -> None:
+        """ Удалить запись """
+
+    async def find(self, query: Query) -> list[T]:
+        """ Получить записи, удовлетворяющие запросу """
+        return query.apply(await self.get_all())
+
+    async def add_many(self, objs: Iterable[T]) -> list[int]:
+        """ Добавить несколько объектов, вернуть список их id """
+        return [await self.add(obj) for obj in objs]
+
+    async def update_many(self, objs: Iterable[T]) -> None:
+        """ Обновить данные о нескольких объектах """
+        for obj in objs:
+            await self.update(obj)
+
+    async def delete_many(self, pks: Iterable[int]) -> None:
+        """ Удалить несколько записей """
+        for pk in pks:
+            await self.delete(pk)
+
+
+class AsyncMemoryRepository(AsyncAbstractRepository[T]):
+    """
+    Асинхронный репозиторий в оперативной памяти. Операции не блокируют
+    и выполняются сразу в потоке цикла событий.
+    """
+
+    def __init__(self, repo: MemoryRepository[T] | None = None) -> None:
+        self.repo: MemoryRepository[T] = repo if repo is not None else MemoryRepository()
+
+    async def add(self, obj: T) -> int:
+        return self.repo.add(obj)
+
+    async def get(self, pk: int) -> T | None:
+        return self.repo.get(pk)
+
+    async def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        return self.repo.get_all(where)
+
+    async def update(self, obj: T) -> None:
+        self.repo.update(obj)
+
+    async def delete(self, pk: int) -> None:
+        self.repo.delete(pk)
+
+    async def find(self, query: Query) -> list[T]:
+        return self.repo.find(query)
+
+    async def add_many(self, objs: Iterable[T]) -> list[int]:
+        return self.repo.add_many(objs)
+
+    async def update_many(self, objs: Iterable[T]) -> None:
+        self.repo.update_many(objs)
+
+    async def delete_many(self, pks: Iterable[int]) -> None:
+        self.repo.delete_many(pks)
+
+
+class AsyncSQLiteRepository(AsyncAbstractRepository[T]):
+    """
+    Асинхронный репозиторий SQLite.
+    readers - количество потоков (и соединений) для чтения.
+    После использования репозиторий нужно закрыть методом close
+    или использовать его как асинхронный контекстный менеджер.
+    """
+
+    def __init__(self, db_file: str, cls: type, readers: int = 4,
+                 manager: ConnectionManager | None = None) -> None:
+        repo: SQLiteRepository[T] = SQLiteRepository(db_file, cls, manager)
+        self.repo: AbstractRepository[T] = repo
+        self.manager = repo.manager
+        self._reader_count = readers
+        self._readers = ThreadPoolExecutor(readers, 'bookkeeper-reader')
+        self._writer = ThreadPoolExecutor(1, 'bookkeeper-writer')
+
+    async def _run(self, executor: ThreadPoolExecutor,
+                   func: Callable[..., R], *args: Any) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, *args))
+
+    async def add(self, obj: T) -> int:
+        return await self._run(self._writer, self.repo.add, obj)
+
+    async def get(self, pk: int) -> T | None:
+        return await self._run(self._readers, self.repo.get, pk)
+
+    async def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        return await self._run(self._readers, self.repo.get_all, where)
+
+    async def update(self, obj: T) -> None:
+        await self._run(self._writer, self.repo.update, obj)
+
+    async def delete(self, pk: int) -> None:
+        await self._run(self._writer, self.repo.delete, pk)
+
+    async def find(self, query: Query) -> list[T]:
+        return await self._run(self._readers, self.repo.find, query)
+
+    async def add_many(self, objs: Iterable[T]) -> list[int]:
+        return await self._run(self._writer, self.repo.add_many, list(objs))
+
+    async def update_many(self, objs: Iterable[T]) -> None:
+        await self._run(self._writer, self.repo.update_many, list(objs))
+
+    async def delete_many(self, pks: Iterable[int]) -> None:
+        await self._run(self._writer, self.repo.delete_many, list(pks))
+
+    def _close_reader(self, barrier: threading.Barrier) -> None:
+        # барьер не дает одному потоку выполнить две задачи,
+        # так что соединение закрывает каждый поток пула
+        barrier.wait()
+        self.manager.close_connection()
+
+    async def close(self) -> None:
+        """
+        Дождаться завершения операций, закрыть соединения потоков
+        в общем менеджере и остановить потоки
+        """
+        await self._run(self._writer, self.manager.close_connection)
+        barrier = threading.Barrier(self._reader_count)
+        await asyncio.gather(*(self._run(self._readers, self._close_reader, barrier)
+                               for _ in range(self._reader_count)))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.shutdown)
+        await loop.run_in_executor(None, self._readers.shutdown)
+
+    async def __aenter__(self) -> 'AsyncSQLiteRepository[T]':
+        return self
+
+    async def __aexit__(self, exc_type: type[BaseException] | None,
+                        exc_value: BaseException | None,
+                        traceback: TracebackType | None) -> None:
+        await self.close()
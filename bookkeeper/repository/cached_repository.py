@@ -0,0 +1,203 @@
+"""
+Модуль описывает кэширующую обертку над репозиторием
+
+Обертка хранит последние использованные объекты в LRU-кэше ограниченного
+размера и работает как карта идентичности (identity map): пока объект
+находится в кэше, все методы чтения возвращают для его id один и тот же
+экземпляр. Поэтому изменять полученные объекты нужно только для
+последующего сохранения через update, иначе изменения будут видны
+остальным читателям кэша.
+
+Запись через обертку обновляет кэш. Изменения, сделанные в обход обертки,
+обнаруживаются по номерам версий данных репозитория, и при их изменении
+кэш очищается. Фиксации в этом процессе (для SQLite - через общий
+менеджер соединений) отслеживаются по write_version при каждом обращении
+без запросов к базе. Изменения другими процессами (для SQLite - PRAGMA
+data_version) проверяются при чтении из исходного репозитория, а при
+попаданиях в кэш - не чаще раза в recheck_interval секунд.
+"""
+
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.query import Query
+
+
+class CachedRepository(AbstractRepository[T]):
+    """
+    Кэширующая обертка над любым репозиторием.
+    repo - исходный репозиторий
+    max_size - максимальное количество объектов в кэше
+    recheck_interval - наибольшее время (в секундах), в течение которого
+                       get может не замечать изменений другими процессами
+    Счетчики hits и misses показывают количество попаданий и промахов get.
+    """
+
+    def __init__(self, repo: AbstractRepository[T], max_size: int = 1024,
+                 recheck_interval: float = 1.0) -> None:
+        if max_size < 1:
+            raise ValueError('cache size must be positive')
+        self.repo = repo
+        self.max_size = max_size
+        self.recheck_interval = recheck_interval
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[int, T] = OrderedDict()
+        self._write_version = repo.write_version()
+        self._data_version = repo.data_version()
+        self._checked_at = time.monotonic()
+
+    def _check_version(self, force: bool = True) -> None:
+        """
+        Очистить кэш, если данные изменены в обход обертки. Версия данных
+        других процессов проверяется при force или по истечении
+        recheck_interval с предыдущей проверки.
+        """
+        version = self.repo.write_version()
+        if version != self._write_version:
+            self._cache.clear()
+            self._write_version = version
+        now = time.monotonic()
+        if force or now - self._checked_at >= self.recheck_interval:
+            self._checked_at = now
+            version = self.repo.data_version()
+            if version != self._data_version:
+                self._cache.clear()
+                self._data_version = version
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """
+        Запись через обертку: собственная фиксация не очищает кэш,
+        если между началом и концом записи не было других фиксаций
+        """
+        self._check_version(force=False)
+        before = self.repo.write_version()
+        yield
+        after = self.repo.write_version()
+        if before is not None and after is not None and after - before <= 1:
+            self._write_version = after
+
+    def _remember(self, obj: T) -> None:
+        self._cache[obj.pk] = obj
+        self._cache.move_to_end(obj.pk)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _intern(self, obj: T, remember: bool = True) -> T:
+        """ Вернуть экземпляр из кэша, если объект с таким id уже загружен """
+        cached = self._cache.get(obj.pk)
+        if cached is not None:
+            self._cache.move_to_end(obj.pk)
+            return cached
+        if remember:
+            self._remember(obj)
+        return obj
+
+    def clear(self) -> None:
+        """ Очистить кэш (например, в конце сессии) """
+        self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """ Статистика кэша для подбора его размера """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache),
+                'max_size': self.max_size,
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def add(self, obj: T) -> int:
+        with self._writing():
+            pk = self.repo.add(obj)
+        self._remember(obj)
+        return pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        items = list(objs)
+        with self._writing():
+            pks = self.repo.add_many(items)
+        for obj in items:
+            self._remember(obj)
+        return pks
+
+    def get(self, pk: int) -> T | None:
+        self._check_version(force=False)
+        obj = self._cache.get(pk)
+        if obj is not None:
+            self.hits += 1
+            self._cache.move_to_end(pk)
+            return obj
+        self.misses += 1
+        obj = self.repo.get(pk)
+        if obj is not None:
+            self._remember(obj)
+        return obj
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        self._check_version()
+        return [self._intern(obj) for obj in self.repo.get_all(where)]
+
+    def find(self, query: Query) -> list[T]:
+        self._check_version()
+        return [self._intern(obj) for obj in self.repo.find(query)]
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        """
+        Перебрать записи исходного репозитория. Уже загруженные объекты
+        берутся из кэша, новые в кэш не добавляются, чтобы длинный перебор
+        не вытеснял из него часто используемые объекты.
+        """
+        self._check_version()
+        for obj in self.repo.iter_all(where, batch_size):
+            yield self._intern(obj, remember=False)
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        return self.repo.aggregate(group_by, aggregates, where)
+
+    def update(self, obj: T) -> None:
+        with self._writing():
+            self.repo.update(obj)
+        self._cache.pop(obj.pk, None)
+        self._remember(obj)
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        items = list(objs)
+        with self._writing():
+            self.repo.update_many(items)
+        for obj in items:
+            self._cache.pop(obj.pk, None)
+            self._remember(obj)
+
+    def delete(self, pk: int) -> None:
+        self._cache.pop(pk, None)
+        with self._writing():
+            self.repo.delete(pk)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pk_list = list(pks)
+        for pk in pk_list:
+            self._cache.pop(pk, None)
+        with self._writing():
+            self.repo.delete_many(pk_list)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """ Транзакция исходного репозитория; при откате кэш очищается """
+        with self._writing(), self.repo.transaction() as tr:
+            try:
+                yield tr
+            except BaseException:
+                self._cache.clear()
+                raise
+
+    def data_version(self) -> int | None:
+        return self.repo.data_version()
+
+    def write_version(self) -> int | None:
+        return self.repo.write_version()
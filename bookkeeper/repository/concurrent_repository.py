@@ -0,0 +1,168 @@
+"""
+Модуль описывает потокобезопасный репозиторий в оперативной памяти
+
+ConcurrentMemoryRepository защищает данные MemoryRepository блокировкой
+чтения-записи: методы чтения выполняются параллельно друг с другом,
+методы записи - монопольно. Блокировка отдает приоритет ожидающим
+писателям, чтобы постоянный поток чтения не откладывал запись бесконечно.
+
+iter_all отбирает записи под блокировкой чтения, а перебирает их уже без
+нее, поэтому долгий перебор не задерживает писателей.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import T
+from bookkeeper.repository.journal import Journal
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+
+
+class RWLock:
+    """
+    Блокировка чтения-записи с приоритетом писателей.
+    Поток, удерживающий блокировку записи, может повторно брать блокировку
+    записи и брать блокировку чтения; повторная блокировка чтения тоже
+    допускается. Переход от чтения к записи не поддерживается.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: int | None = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """ Блокировка чтения """
+        depth = getattr(self._local, 'reads', 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """ Блокировка записи """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError('cannot upgrade a read lock to a write lock')
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._write_depth = 0
+                self._cond.notify_all()
+
+
+class ConcurrentMemoryRepository(MemoryRepository[T]):
+    """
+    Репозиторий в оперативной памяти, безопасный для использования
+    из нескольких потоков. Параметры те же, что у MemoryRepository.
+    """
+
+    def __init__(self, indexed_fields: Iterable[str] = (),
+                 range_indexed_fields: Iterable[str] = (),
+                 journal: Journal | None = None) -> None:
+        self.lock = RWLock()
+        super().__init__(indexed_fields, range_indexed_fields, journal)
+
+    def add(self, obj: T) -> int:
+        with self.lock.write():
+            return super().add(obj)
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        items = list(objs)
+        with self.lock.write():
+            return super().add_many(items)
+
+    def get(self, pk: int) -> T | None:
+        with self.lock.read():
+            return super().get(pk)
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        with self.lock.read():
+            return super().get_all(where)
+
+    def find(self, query: Query) -> list[T]:
+        with self.lock.read():
+            return super().find(query)
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        with self.lock.read():
+            items = list(super().iter_all(where, batch_size))
+        return iter(items)
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        with self.lock.read():
+            return super().aggregate(group_by, aggregates, where)
+
+    def update(self, obj: T) -> None:
+        with self.lock.write():
+            super().update(obj)
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        items = list(objs)
+        with self.lock.write():
+            super().update_many(items)
+
+    def delete(self, pk: int) -> None:
+        with self.lock.write():
+            super().delete(pk)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pk_list = list(pks)
+        with self.lock.write():
+            super().delete_many(pk_list)
+
+    def snapshot(self) -> None:
+        with self.lock.write():
+            super().snapshot()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Транзакция удерживает блокировку записи: другие потоки
+        не видят промежуточных изменений
+        """
+        with self.lock.write(), super().transaction():
+            yield
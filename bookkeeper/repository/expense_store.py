@@ -0,0 +1,350 @@
+"""
+Модуль описывает колоночное хранилище расходов в оперативной памяти
+
+В отличие от MemoryRepository, который хранит по объекту Expense на запись,
+ExpenseStore хранит каждое поле в отдельном типизированном массиве
+(модуль array): id, сумму, категорию, дату расхода и дату добавления
+(секунды от начала эпохи, см. sqlite_codecs) - 64-битными целыми,
+комментарий - номером строки в общем пуле уникальных строк. Запись занимает
+45 байт, так что 10 млн расходов помещаются примерно в 450 МБ.
+
+Условия отбора вычисляются по столбцам целиком встроенными функциями
+(map, itertools.compress) без создания объектов Expense; отбор по диапазону
+дат использует отсортированный индекс дат, который перестраивается при
+первом запросе после изменения данных. Объекты Expense создаются только
+для возвращаемых записей, поэтому изменения полученных объектов не влияют
+на хранилище, пока не вызван update.
+"""
+
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from functools import partial
+from itertools import compress, repeat
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.query import (
+    DATE_PARTS, Condition, Query, check_aggregates, split_group, to_query
+)
+from bookkeeper.repository.sqlite_codecs import decode_datetime, encode_datetime
+
+INT_COLUMNS = ('amount', 'category', 'expense_date', 'added_date')
+DATE_COLUMNS = ('expense_date', 'added_date')
+
+_COMPARE: dict[str, Callable[[Any, Any], bool]] = {
+    # аргументы переставлены: partial(op, value)(x) означает x <оператор> value
+    '=': operator.eq, '<': operator.gt, '<=': operator.ge,
+    '>': operator.lt, '>=': operator.le,
+}
+
+
+class ExpenseStore(AbstractRepository[Expense]):
+    """
+    Колоночный репозиторий расходов в оперативной памяти
+    """
+
+    def __init__(self) -> None:
+        self._pk = array('q')
+        self._cols: dict[str, array] = {name: array('q') for name in INT_COLUMNS}
+        self._comment = array('I')
+        self._alive = bytearray()
+        self._strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+        self._next_pk = 1
+        self._deleted = 0
+        self._date_index: tuple[Sequence[int], Sequence[int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._pk) - self._deleted
+
+    def nbytes(self) -> int:
+        """ Объем памяти, занимаемый столбцами (без пула строк) """
+        return (sum(col.itemsize * len(col) for col in (self._pk, self._comment,
+                                                        *self._cols.values()))
+                + len(self._alive))
+
+    def _string_id(self, value: str) -> int:
+        sid = self._string_ids.get(value)
+        if sid is None:
+            sid = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return sid
+
+    def _row(self, i: int) -> Expense:
+        obj: Expense = object.__new__(Expense)
+        obj.pk = self._pk[i]
+        obj.amount = self._cols['amount'][i]
+        obj.category = self._cols['category'][i]
+        obj.expense_date = decode_datetime(self._cols['expense_date'][i])
+        obj.added_date = decode_datetime(self._cols['added_date'][i])
+        obj.comment = self._strings[self._comment[i]]
+        return obj
+
+    def _index(self, pk: int) -> int | None:
+        """ Номер строки с данным id или None, если ее нет """
+        i = bisect_left(self._pk, pk)
+        if i < len(self._pk) and self._pk[i] == pk and self._alive[i]:
+            return i
+        return None
+
+    @staticmethod
+    def _encode_row(obj: Expense) -> array:
+        """
+        Значения целочисленных столбцов записи (в порядке INT_COLUMNS).
+        Неподходящие значения вызывают TypeError или OverflowError
+        до изменения столбцов.
+        """
+        return array('q', (obj.amount, obj.category, encode_datetime(obj.expense_date),
+                           encode_datetime(obj.added_date)))
+
+    def _write(self, i: int, values: array, comment: str) -> None:
+        for name, value in zip(INT_COLUMNS, values):
+            self._cols[name][i] = value
+        self._comment[i] = self._string_id(comment)
+        self._date_index = None
+
+    def add(self, obj: Expense) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        values = self._encode_row(obj)
+        pk = self._next_pk
+        self._pk.append(pk)
+        for name, value in zip(INT_COLUMNS, values):
+            self._cols[name].append(value)
+        self._comment.append(self._string_id(obj.comment))
+        self._alive.append(1)
+        self._date_index = None
+        self._next_pk += 1
+        obj.pk = pk
+        return pk
+
+    def add_many(self, objs: Iterable[Expense]) -> list[int]:
+        items = list(objs)
+        for obj in items:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        return [self.add(obj) for obj in items]
+
+    def get(self, pk: int) -> Expense | None:
+        i = self._index(pk)
+        return None if i is None else self._row(i)
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[Expense]:
+        return [self._row(i) for i in self._select(to_query(where).where)]
+
+    def find(self, query: Query) -> list[Expense]:
+        rows = [self._row(i) for i in self._select(query.where)]
+        return Query(order_by=query.order_by, limit=query.limit,
+                     offset=query.offset).apply(rows)
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[Expense]:
+        for i in self._select(to_query(where).where):
+            if self._alive[i]:
+                yield self._row(i)
+
+    def update(self, obj: Expense) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        i = self._index(obj.pk)
+        if i is None:
+            raise KeyError(obj.pk)
+        self._write(i, self._encode_row(obj), obj.comment)
+
+    def delete(self, pk: int) -> None:
+        i = self._index(pk)
+        if i is None:
+            raise KeyError(pk)
+        self._alive[i] = 0
+        self._deleted += 1
+        self._date_index = None
+        if self._deleted > len(self._pk) // 2:
+            self.compact()
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pk_list = list(dict.fromkeys(pks))
+        for pk in pk_list:
+            if self._index(pk) is None:
+                raise KeyError(pk)
+        for pk in pk_list:
+            self.delete(pk)
+
+    def compact(self) -> None:
+        """ Удалить из столбцов строки удаленных записей """
+        if not self._deleted:
+            return
+        self._pk = array('q', compress(self._pk, self._alive))
+        self._comment = array('I', compress(self._comment, self._alive))
+        self._cols = {name: array('q', compress(col, self._alive))
+                      for name, col in self._cols.items()}
+        self._alive = bytearray(repeat(1, len(self._pk)))
+        self._deleted = 0
+        self._date_index = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Транзакция на основе копии столбцов: при исключении содержимое
+        хранилища восстанавливается
+        """
+        state = (array('q', self._pk), array('I', self._comment),
+                 {name: array('q', col) for name, col in self._cols.items()},
+                 bytearray(self._alive), self._deleted)
+        try:
+            yield
+        except BaseException:
+            self._pk, self._comment, self._cols, self._alive, self._deleted = state
+            self._date_index = None
+            raise
+
+    def _column(self, name: str) -> Sequence[int]:
+        if name == 'pk':
+            return self._pk
+        if name == 'comment':
+            return self._comment
+        if name not in self._cols:
+            raise ValueError(f'unknown field {name!r}')
+        return self._cols[name]
+
+    def _encode(self, name: str, value: Any) -> Any:
+        if name in DATE_COLUMNS:
+            return encode_datetime(value)
+        if name == 'comment':
+            return self._string_ids.get(value, -1)
+        return value
+
+    def _mask(self, cond: Condition, rows: Sequence[int] | None = None
+              ) -> Iterator[bool]:
+        """ Значения условия для строк rows (по умолчанию - для всех строк) """
+        values: Sequence[Any] = self._column(cond.field)
+        if rows is not None:
+            values = list(map(values.__getitem__, rows))
+        if cond.field == 'comment' and cond.op not in ('=', 'in'):
+            values = list(map(self._strings.__getitem__, values))
+            value: Any = cond.value
+        elif cond.op in ('between', 'in'):
+            value = tuple(self._encode(cond.field, v) for v in cond.value)
+        else:
+            value = self._encode(cond.field, cond.value)
+        if cond.op == 'in':
+            return map(frozenset(value).__contains__, values)
+        if cond.op == 'between':
+            low, high = value
+            return map(operator.and_, map(partial(operator.le, low), values),
+                       map(partial(operator.ge, high), values))
+        return map(partial(_COMPARE[cond.op], value), values)
+
+    def _date_range(self, conditions: Sequence[Condition]) -> list[int] | None:
+        """
+        Номера строк (в порядке id) по отсортированному индексу дат
+        для условий на диапазон дат расхода или None, если таких условий нет
+        """
+        keys: Sequence[int] = ()
+        order: Sequence[int] = ()
+        low = high = 0
+        found = False
+        for cond in conditions:
+            if cond.field != 'expense_date' or cond.op in ('=', 'in'):
+                continue
+            if not found:
+                keys, order = self._date_order()
+                low, high, found = 0, len(keys), True
+            if cond.op == 'between':
+                low = max(low, bisect_left(keys, encode_datetime(cond.value[0])))
+                high = min(high, bisect_right(keys, encode_datetime(cond.value[1])))
+            elif cond.op in ('>', '>='):
+                find = bisect_right if cond.op == '>' else bisect_left
+                low = max(low, find(keys, encode_datetime(cond.value)))
+            else:
+                find = bisect_left if cond.op == '<' else bisect_right
+                high = min(high, find(keys, encode_datetime(cond.value)))
+        if not found:
+            return None
+        return sorted(order[low:high]) if low < high else []
+
+    def _date_order(self) -> tuple[Sequence[int], Sequence[int]]:
+        if self._date_index is None:
+            dates = self._cols['expense_date']
+            order = array('q', sorted(compress(range(len(dates)), self._alive),
+                                      key=dates.__getitem__))
+            self._date_index = array('q', map(dates.__getitem__, order)), order
+        return self._date_index
+
+    def _select(self, conditions: Sequence[Condition]) -> list[int]:
+        """ Номера строк, удовлетворяющих всем условиям, в порядке id """
+        rows = self._date_range(conditions)
+        if rows is None:
+            mask: Iterator[Any] = iter(self._alive)
+            for cond in conditions:
+                mask = map(operator.and_, mask, self._mask(cond))
+            return list(compress(range(len(self._pk)), mask))
+        for cond in conditions:
+            if cond.field != 'expense_date' or cond.op in ('=', 'in'):
+                rows = list(compress(rows, self._mask(cond, rows)))
+        return rows
+
+    def _group_values(self, spec: str, rows: list[int]) -> list[Any]:
+        name, part = split_group(spec)
+        values = list(map(self._column(name).__getitem__, rows))
+        if name == 'comment':
+            return list(map(self._strings.__getitem__, values))
+        if part is None:
+            return [decode_datetime(v) for v in values] if name in DATE_COLUMNS \
+                else values
+        if name not in DATE_COLUMNS:
+            raise TypeError(f'cannot truncate {name} to {part}')
+        fmt = DATE_PARTS[part]
+        days: dict[int, str] = {}
+        result = []
+        for seconds in values:
+            day = seconds // 86400
+            key = days.get(day)
+            if key is None:
+                key = days[day] = decode_datetime(day * 86400).strftime(fmt)
+            result.append(key)
+        return result
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        """
+        Агрегация по столбцам: строки отбираются по маскам столбцов
+        (или по индексу дат), значения берутся прямо из массивов
+        """
+        check_aggregates(aggregates)
+        rows = self._select(to_query(where).where)
+        keys = list(zip(*(self._group_values(spec, rows) for spec in group_by))) \
+            if group_by else [()] * len(rows)
+        groups: dict[tuple[Any, ...], list[int]] = {}
+        for row, key in zip(rows, keys):
+            groups.setdefault(key, []).append(row)
+        if not group_by and not groups:
+            groups[()] = []
+        result = []
+        for key in sorted(groups):
+            members = groups[key]
+            res = dict(zip(group_by, key))
+            for res_name, (func, name) in aggregates.items():
+                res[res_name] = self._apply(func, name, members)
+            result.append(res)
+        return result
+
+    def _apply(self, func: str, name: str, rows: list[int]) -> Any:
+        if func == 'count':
+            return len(rows)
+        if not rows:
+            return None
+        values: Iterable[Any] = map(self._column(name).__getitem__, rows)
+        if name == 'comment':
+            values = map(self._strings.__getitem__, values)
+        if func == 'sum':
+            return sum(values)
+        if func == 'avg':
+            return sum(values) / len(rows)
+        result = min(values) if func == 'min' else max(values)
+        return decode_datetime(result) if name in DATE_COLUMNS else result
+
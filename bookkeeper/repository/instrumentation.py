@@ -0,0 +1,360 @@
+"""
+Модуль описывает сбор статистики работы репозиториев
+
+InstrumentedRepository - обертка над любым репозиторием, которая для
+каждого метода считает количество вызовов, ошибок и обработанных записей
+и строит гистограмму времени выполнения. Статистика хранится в объекте
+Metrics с ключом (модель, операция) и доступна в виде словаря (snapshot)
+или JSON (dump_json).
+
+Гистограмма логарифмическая: интервал номер i содержит вызовы
+длительностью от 2**(i-1) до 2**i наносекунд, поэтому запись одного
+значения - это несколько целочисленных операций, и сбор статистики можно
+не отключать в рабочем режиме.
+
+Для SQLite (см. ConnectionManager.instrument) отдельно учитываются
+открытие соединений (операция connect, в том числе соединений, открытых
+до включения учета), выполнение запросов (execute) и выборка строк (fetch)
+с моделью 'sqlite'.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Sequence, TypeVar
+
+from bookkeeper.repository.abstract_repository import (
+    AbstractRepository, HierarchicalRepository, T
+)
+from bookkeeper.repository.query import Query
+
+R = TypeVar('R')
+
+BUCKETS = 65
+
+
+class OperationStats:
+    """
+    Статистика одной операции: количество вызовов и ошибок, количество
+    записей, суммарное и максимальное время и гистограмма времени
+    """
+    __slots__ = ('calls', 'errors', 'rows', 'total_ns', 'max_ns', 'buckets', '_lock')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, elapsed_ns: int, rows: int = 0, error: bool = False) -> None:
+        """ Учесть вызов длительностью elapsed_ns наносекунд """
+        with self._lock:
+            self.calls += 1
+            self.rows += rows
+            self.total_ns += elapsed_ns
+            self.buckets[elapsed_ns.bit_length()] += 1
+            if elapsed_ns > self.max_ns:
+                self.max_ns = elapsed_ns
+            if error:
+                self.errors += 1
+
+    def percentile(self, fraction: float) -> int:
+        """ Оценка сверху для квантиля времени (в наносекундах) """
+        rank = fraction * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> dict[str, Any]:
+        """ Статистика в виде словаря, время - в микросекундах """
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self) -> dict[str, Any]:
+        return {
+            'calls': self.calls, 'errors': self.errors, 'rows': self.rows,
+            'total_us': self.total_ns / 1000,
+            'mean_us': self.total_ns / self.calls / 1000 if self.calls else 0.0,
+            'p50_us': self.percentile(0.5) / 1000,
+            'p99_us': self.percentile(0.99) / 1000,
+            'max_us': self.max_ns / 1000,
+            'histogram': {f'<{(1 << i) / 1000:g}us': count
+                          for i, count in enumerate(self.buckets) if count},
+        }
+
+
+class Metrics:
+    """ Набор статистики операций с ключом (модель, операция) """
+
+    def __init__(self) -> None:
+        self._stats: dict[tuple[str, str], OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, model: str, operation: str) -> OperationStats:
+        """ Статистика операции (создается при первом обращении) """
+        key = (model, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, OperationStats())
+        return stats
+
+    def record(self, model: str, operation: str, elapsed_ns: int,
+               rows: int = 0, error: bool = False) -> None:
+        """ Учесть вызов операции """
+        self.stats(model, operation).record(elapsed_ns, rows, error)
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """ Копия статистики: {модель: {операция: {показатель: значение}}} """
+        result: dict[str, dict[str, dict[str, Any]]] = {}
+        with self._lock:
+            items = sorted(self._stats.items())
+        for (model, operation), stats in items:
+            result.setdefault(model, {})[operation] = stats.to_dict()
+        return result
+
+    def dump_json(self, path: str | None = None) -> str:
+        """ Статистика в формате JSON; если указан path, она записывается в файл """
+        text = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+        return text
+
+    def reset(self) -> None:
+        """ Очистить статистику """
+        with self._lock:
+            self._stats.clear()
+
+
+METRICS = Metrics()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """ Курсор SQLite, учитывающий время выполнения запросов и выборки строк """
+    metrics: Metrics = METRICS
+
+    def _timed(self, operation: str, func: Callable[..., R], *args: Any) -> R:
+        stats = self.metrics.stats('sqlite', operation)
+        start = time.perf_counter_ns()
+        try:
+            result = func(self, *args)
+        except BaseException:
+            stats.record(time.perf_counter_ns() - start, error=True)
+            raise
+        stats.record(time.perf_counter_ns() - start)
+        return result
+
+    def execute(self, sql: str, parameters: Any = (), /) -> 'TimedCursor':
+        return self._timed('execute', sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /
+                    ) -> 'TimedCursor':
+        return self._timed('execute', sqlite3.Cursor.executemany, sql,
+                           seq_of_parameters)
+
+    def fetchone(self) -> Any:
+        return self._timed('fetch', sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        if size is None:
+            return self._timed('fetch', sqlite3.Cursor.fetchmany)
+        return self._timed('fetch', sqlite3.Cursor.fetchmany, size)
+
+    def fetchall(self) -> list[Any]:
+        return self._timed('fetch', sqlite3.Cursor.fetchall)
+
+    def __next__(self) -> Any:
+        return self._timed('fetch', sqlite3.Cursor.__next__)
+
+
+def _model_name(repo: AbstractRepository[Any]) -> str:
+    cls = getattr(repo, 'obj_cls', None)
+    return cls.__name__ if cls is not None else type(repo).__name__
+
+
+class InstrumentedRepository(AbstractRepository[T]):
+    """
+    Обертка над репозиторием, собирающая статистику вызовов.
+    repo - исходный репозиторий
+    metrics - набор статистики (по умолчанию общий METRICS)
+    model - имя модели в статистике (по умолчанию имя класса модели
+            SQLiteRepository или имя класса репозитория)
+    Если у репозитория есть менеджер соединений SQLite, для него
+    включается учет времени соединений и запросов. Для репозитория,
+    поддерживающего HierarchicalRepository, создается
+    InstrumentedHierarchicalRepository.
+    """
+
+    def __new__(cls, repo: AbstractRepository[T], *args: Any,
+                **kwargs: Any) -> 'InstrumentedRepository[T]':
+        if cls is InstrumentedRepository and isinstance(repo, HierarchicalRepository):
+            cls = InstrumentedHierarchicalRepository
+        return super().__new__(cls)
+
+    def __init__(self, repo: AbstractRepository[T], metrics: Metrics | None = None,
+                 model: str | None = None) -> None:
+        self.repo = repo
+        self.metrics = metrics if metrics is not None else METRICS
+        self.model = model or _model_name(repo)
+        self._stats: dict[str, OperationStats] = {}
+        manager = getattr(repo, 'manager', None)
+        if manager is not None and hasattr(manager, 'instrument'):
+            manager.instrument(self.metrics)
+
+    def _operation(self, operation: str) -> OperationStats:
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = self.metrics.stats(self.model, operation)
+        return stats
+
+    def _call(self, operation: str, rows: Callable[[Any], int],
+              func: Callable[..., R], *args: Any) -> R:
+        stats = self._operation(operation)
+        start = time.perf_counter_ns()
+        try:
+            result = func(*args)
+        except BaseException:
+            stats.record(time.perf_counter_ns() - start, error=True)
+            raise
+        stats.record(time.perf_counter_ns() - start, rows(result))
+        return result
+
+    def add(self, obj: T) -> int:
+        return self._call('add', _one, self.repo.add, obj)
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        return self._call('add_many', len, self.repo.add_many, list(objs))
+
+    def get(self, pk: int) -> T | None:
+        return self._call('get', _found, self.repo.get, pk)
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        return self._call('get_all', len, self.repo.get_all, where)
+
+    def find(self, query: Query) -> list[T]:
+        return self._call('find', len, self.repo.find, query)
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        """
+        Перебор записей исходного репозитория. Учитывается время получения
+        записей (без времени их обработки вызывающим кодом) и их количество;
+        статистика записывается по окончании или прерывании перебора.
+        """
+        elapsed = 0
+        rows = 0
+        error = True
+        it = iter(self.repo.iter_all(where, batch_size))
+        try:
+            while True:
+                start = time.perf_counter_ns()
+                try:
+                    obj = next(it)
+                except StopIteration:
+                    elapsed += time.perf_counter_ns() - start
+                    error = False
+                    return
+                elapsed += time.perf_counter_ns() - start
+                rows += 1
+                yield obj
+        except GeneratorExit:
+            error = False
+            raise
+        finally:
+            self._operation('iter_all').record(elapsed, rows, error)
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        return self._call('aggregate', len, self.repo.aggregate,
+                          group_by, aggregates, where)
+
+    def update(self, obj: T) -> None:
+        self._call('update', _one, self.repo.update, obj)
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        items = list(objs)
+        self._call('update_many', lambda _: len(items), self.repo.update_many, items)
+
+    def delete(self, pk: int) -> None:
+        self._call('delete', _one, self.repo.delete, pk)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pk_list = list(pks)
+        self._call('delete_many', lambda _: len(pk_list), self.repo.delete_many,
+                   pk_list)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """ Транзакция исходного репозитория; учитывается время всего блока """
+        start = time.perf_counter_ns()
+        error = True
+        try:
+            with self.repo.transaction() as tr:
+                yield tr
+            error = False
+        finally:
+            self._operation('transaction').record(time.perf_counter_ns() - start,
+                                                  error=error)
+
+    def data_version(self) -> int | None:
+        return self.repo.data_version()
+
+    def write_version(self) -> int | None:
+        return self.repo.write_version()
+
+
+class InstrumentedHierarchicalRepository(InstrumentedRepository[T]):
+    """
+    Обертка над репозиторием, который сам выбирает потомков и предков
+    (например, SQLiteRepository): запросы к иерархии и итоги по таблице
+    замыкания (subtree_totals) передаются исходному репозиторию.
+    Создается конструктором InstrumentedRepository.
+    """
+
+    def get_descendants(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        repo: Any = self.repo
+        return self._call('get_descendants', len, repo.get_descendants, pk,
+                          parent_field)
+
+    def get_ancestors(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        repo: Any = self.repo
+        return self._call('get_ancestors', len, repo.get_ancestors, pk, parent_field)
+
+    @property
+    def closure_parent(self) -> str | None:
+        """ Поле родителя таблицы замыкания исходного репозитория """
+        return getattr(self.repo, 'closure_parent', None)
+
+    def subtree_totals(self, facts: AbstractRepository[Any], field: str,
+                       amount: str, where: Query | dict[str, Any] | None = None
+                       ) -> dict[int, tuple[int, int]]:
+        """ См. SQLiteRepository.subtree_totals """
+        repo: Any = self.repo
+        return self._call('subtree_totals', len, repo.subtree_totals, unwrap(facts),
+                          field, amount, where)
+
+
+def unwrap(repo: AbstractRepository[Any]) -> AbstractRepository[Any]:
+    """ Исходный репозиторий, если repo - обертка InstrumentedRepository """
+    while isinstance(repo, InstrumentedRepository):
+        repo = repo.repo
+    return repo
+
+
+def _one(_: Any) -> int:
+    return 1
+
+
+def _found(obj: Any) -> int:
+    return 0 if obj is None else 1
@@ -0,0 +1,306 @@
+"""
+Модуль описывает журнал изменений для хранения данных MemoryRepository
+на диске
+
+Журнал состоит из двух файлов: снимка (path.snapshot) с полным содержимым
+репозитория на некоторый момент и журнала (path.log), в конец которого
+дописывается каждое последующее изменение. Запись журнала - заголовок
+(операция, длина данных, CRC32 данных) и данные, сериализованные pickle.
+При запуске содержимое восстанавливается из снимка, после чего
+применяются записи журнала; оборванная при сбое последняя запись
+отбрасывается.
+
+Каждая запись сразу передается операционной системе (flush), поэтому
+не теряется при аварийном завершении процесса. На диск (fsync) записи
+сбрасываются не чаще раза в sync_interval секунд - групповая фиксация:
+одна операция fsync подтверждает все накопленные записи. Если новых
+записей нет, fsync выполняет фоновый таймер, так что при сбое системы
+теряются изменения не более чем за sync_interval секунд. При
+sync_interval=0 fsync выполняется после каждой записи.
+
+Когда в журнале накапливается snapshot_every записей, репозиторий
+записывает новый снимок, и журнал начинается заново. Повторное применение
+журнала к более новому снимку (сбой между заменой снимка и очисткой
+журнала) дает то же состояние, так как операции над одним id применяются
+в исходном порядке.
+
+Объекты dataclass сохраняются в снимке кортежами значений полей
+и восстанавливаются функцией материализации (см. materializer), что
+заметно быстрее восстановления самих объектов через pickle.
+
+ВНИМАНИЕ: файлы журнала - доверенные данные, так как читаются pickle.
+"""
+
+import dataclasses
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from operator import itemgetter
+from types import TracebackType
+from typing import Any, BinaryIO, Iterator
+
+from bookkeeper.repository.materializer import Materializer, make_materializer
+
+ADD, UPDATE, DELETE = 1, 2, 3
+
+HEADER = struct.Struct('<BII')
+SNAPSHOT_FORMAT = 1
+CHUNK_SIZE = 10_000
+
+
+class Journal:
+    """
+    Журнал изменений репозитория.
+    path - путь к файлам без расширения
+    sync_interval - максимальное время (в секундах) между записью и fsync
+    snapshot_every - количество записей журнала, после которого нужен снимок
+    """
+
+    def __init__(self, path: str, sync_interval: float = 0.05,
+                 snapshot_every: int = 1_000_000) -> None:
+        self.path = path
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.last_pk = 0
+        self._records = 0
+        self._pending: list[bytes] | None = None
+        self._marks: list[int] = []
+        self._file: BinaryIO | None = None
+        self._synced_at = time.monotonic()
+        self._dirty = False
+        # таймер и фоновый fsync работают под блокировкой файла
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    @property
+    def log_path(self) -> str:
+        """ Путь к файлу журнала """
+        return self.path + '.log'
+
+    @property
+    def snapshot_path(self) -> str:
+        """ Путь к файлу снимка """
+        return self.path + '.snapshot'
+
+    def recover(self) -> dict[int, Any]:
+        """
+        Восстановить содержимое репозитория из снимка и журнала
+        и открыть журнал для записи. Возвращает словарь id -> объект.
+        """
+        objects = self._load_snapshot()
+        valid = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as file:
+                data = file.read()
+            for op, pk, obj, end in _read_records(data):
+                if op == DELETE:
+                    objects.pop(pk, None)
+                else:
+                    objects[pk] = obj
+                    self.last_pk = max(self.last_pk, pk)
+                self._records += 1
+                valid = end
+            if valid < len(data):
+                os.truncate(self.log_path, valid)
+        self._file = open(self.log_path, 'ab')  # pylint: disable=consider-using-with
+        return objects
+
+    def _load_snapshot(self) -> dict[int, Any]:
+        objects: dict[int, Any] = {}
+        if not os.path.exists(self.snapshot_path):
+            return objects
+        materializers: dict[type, Materializer] = {}
+        with open(self.snapshot_path, 'rb') as file:
+            header = pickle.load(file)
+            if header.get('format') != SNAPSHOT_FORMAT:
+                raise ValueError(f'unknown snapshot format in {self.snapshot_path}')
+            self.last_pk = header['last_pk']
+            while True:
+                try:
+                    cls, names, rows = pickle.load(file)
+                except EOFError:
+                    break
+                if cls is None:
+                    objects.update(rows)
+                    continue
+                make = materializers.get(cls)
+                if make is None:
+                    make = materializers[cls] = make_materializer(
+                        cls, dict.fromkeys(names), {})
+                objects.update(zip(map(itemgetter(0), rows), map(make, rows)))
+        return objects
+
+    def append(self, op: int, pk: int, obj: Any = None) -> None:
+        """ Добавить в журнал запись об операции над объектом с данным id """
+        payload = pickle.dumps(pk if op == DELETE else (pk, obj),
+                               pickle.HIGHEST_PROTOCOL)
+        record = HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+        if op != DELETE:
+            self.last_pk = max(self.last_pk, pk)
+        if self._pending is not None:
+            self._pending.append(record)
+        else:
+            self._write([record])
+
+    def _write(self, records: list[bytes]) -> None:
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError('journal is not open, call recover first')
+            self._file.write(b''.join(records))
+            self._file.flush()
+            self._records += len(records)
+            self._dirty = True
+            elapsed = time.monotonic() - self._synced_at
+            if elapsed >= self.sync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.sync_interval - elapsed,
+                                              self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._synced_at = time.monotonic()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def sync(self) -> None:
+        """ Сбросить накопленные записи на диск """
+        with self._lock:
+            self._cancel_timer()
+            self._sync()
+
+    def begin(self) -> None:
+        """ Начать транзакцию: записи копятся в памяти до commit """
+        if self._pending is None:
+            self._pending = []
+        self._marks.append(len(self._pending))
+
+    def commit(self) -> None:
+        """ Завершить транзакцию; внешняя транзакция пишет записи в журнал """
+        self._marks.pop()
+        if not self._marks and self._pending is not None:
+            records, self._pending = self._pending, None
+            if records:
+                self._write(records)
+
+    def rollback(self) -> None:
+        """ Отменить записи, сделанные с начала текущей транзакции """
+        mark = self._marks.pop()
+        if self._pending is not None:
+            del self._pending[mark:]
+            if not self._marks:
+                self._pending = None
+
+    @property
+    def snapshot_due(self) -> bool:
+        """ Нужно ли записать снимок (вне транзакции) """
+        return self._pending is None and self._records >= self.snapshot_every
+
+    def write_snapshot(self, objects: dict[int, Any]) -> None:
+        """ Записать снимок содержимого репозитория и очистить журнал """
+        if self._pending is not None:
+            raise RuntimeError('cannot write snapshot inside a transaction')
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'format': SNAPSHOT_FORMAT, 'last_pk': self.last_pk},
+                        file, pickle.HIGHEST_PROTOCOL)
+            for chunk in _chunks(objects):
+                pickle.dump(chunk, file, pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with self._lock:
+            self._cancel_timer()
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.log_path, 'wb')  # pylint: disable=consider-using-with
+            os.fsync(self._file.fileno())
+            self._records = 0
+            self._dirty = False
+
+    def close(self) -> None:
+        """ Сбросить записи на диск и закрыть журнал """
+        with self._lock:
+            self._cancel_timer()
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
+
+
+def _read_records(data: bytes) -> Iterator[tuple[int, int, Any, int]]:
+    """ Записи журнала (операция, id, объект, конец записи) до первой поврежденной """
+    view = memoryview(data)
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        op, length, crc = HEADER.unpack_from(view, pos)
+        start = pos + HEADER.size
+        payload = view[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        pos = start + length
+        if op == DELETE:
+            yield op, pickle.loads(payload), None, pos
+        else:
+            pk, obj = pickle.loads(payload)
+            yield op, pk, obj, pos
+
+
+def _field_names(cls: type) -> list[str] | None:
+    if not dataclasses.is_dataclass(cls):
+        return None
+    names = [f.name for f in dataclasses.fields(cls)]
+    if 'pk' not in names:
+        return None
+    return [name for name in names if name != 'pk']
+
+
+def _chunks(objects: dict[int, Any]) -> Iterator[tuple[Any, Any, list[Any]]]:
+    """
+    Части снимка: (класс, имена полей, строки (pk, поле_1, ...)) для dataclass
+    или (None, None, пары (pk, объект)) для прочих объектов
+    """
+    names_cache: dict[type, list[str] | None] = {}
+    cls: type | None = None
+    names: list[str] | None = None
+    rows: list[Any] = []
+    for pk, obj in objects.items():
+        obj_cls = type(obj)
+        if obj_cls not in names_cache:
+            names_cache[obj_cls] = _field_names(obj_cls)
+        obj_names = names_cache[obj_cls]
+        key = obj_cls if obj_names is not None else None
+        if rows and (key is not cls or len(rows) >= CHUNK_SIZE):
+            yield cls, names, rows
+            rows = []
+        cls, names = key, obj_names
+        if obj_names is None:
+            rows.append((pk, obj))
+        else:
+            rows.append((pk, *[getattr(obj, name) for name in obj_names]))
+    if rows:
+        yield cls, names, rows
@@ -0,0 +1,59 @@
+"""
+Модуль описывает построение объектов моделей из строк таблицы
+
+Для каждой модели один раз генерируется специализированная функция,
+которая создает объект без вызова конструктора (и, значит, без фабрик
+значений по умолчанию) и заполняет атрибуты из строки позиционно.
+Строка имеет вид (pk, поле_1, поле_2, ...) в порядке аннотаций модели.
+Значения полей с типами datetime и date преобразуются обратно
+в datetime/date кодеками sqlite_codecs.
+"""
+
+import dataclasses
+from typing import Any, Callable, Sequence
+
+from bookkeeper.repository.sqlite_codecs import field_codecs
+
+Materializer = Callable[[Sequence[Any]], Any]
+
+
+def _can_skip_init(cls: type, names: list[str]) -> bool:
+    if not dataclasses.is_dataclass(cls) or hasattr(cls, '__post_init__'):
+        return False
+    return {f.name for f in dataclasses.fields(cls)} == {*names, 'pk'}
+
+
+def make_materializer(cls: type, fields: dict[str, Any],
+                      decoders: dict[str, Callable[[Any], Any]] | None = None
+                      ) -> Materializer:
+    """
+    Сгенерировать функцию, создающую объект cls из строки таблицы.
+    fields - поля модели (без pk) в порядке столбцов таблицы,
+    decoders - функции преобразования значений отдельных полей
+    (по умолчанию - для полей с датами).
+    Если cls не dataclass, использует __post_init__ или имеет поля,
+    не хранящиеся в таблице, объект создается вызовом конструктора,
+    так как обойти его нельзя без изменения поведения.
+    """
+    if decoders is None:
+        decoders = {name: codec.decode for name, codec in field_codecs(fields).items()}
+    names = list(fields)
+    env: dict[str, Any] = {'cls': cls, 'new': object.__new__}
+    values = []
+    for i, name in enumerate(names, start=1):
+        if name in decoders:
+            env[f'decode_{i}'] = decoders[name]
+            values.append(f'decode_{i}(row[{i}])')
+        else:
+            values.append(f'row[{i}]')
+
+    if _can_skip_init(cls, names):
+        body = ['    obj = new(cls)', '    obj.pk = row[0]']
+        body += [f'    obj.{name} = {value}' for name, value in zip(names, values)]
+    else:
+        args = ', '.join(f'{name}={value}' for name, value in zip(names, values))
+        body = [f'    obj = cls({args})', '    obj.pk = row[0]']
+    source = '\n'.join(['def materialize(row):', *body, '    return obj'])
+    exec(source, env)  # pylint: disable=exec-used
+    materialize: Materializer = env['materialize']
+    return materialize
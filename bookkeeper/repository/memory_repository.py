@@ -1,43 +1,439 @@
 """
 Модуль описывает репозиторий, работающий в оперативной памяти
+
+Для полей, перечисленных в indexed_fields, репозиторий поддерживает
+хэш-индексы (значение поля -> множество id), поэтому отбор по равенству
+(get_all(where), условия '=' и 'in' в запросах) просматривает только
+подходящие записи, а не все содержимое репозитория.
+
+Для полей из range_indexed_fields (например, дат) поддерживается
+упорядоченный индекс - отсортированный список пар (значение, id).
+Условия на диапазон значений находят записи двоичным поиском за
+O(log N + k), а запрос с сортировкой по такому полю (например, последние
+10 расходов) перебирает записи в порядке индекса и останавливается,
+набрав нужное количество. Значения None в упорядоченный индекс
+не попадают и хранятся отдельно.
+
+Индексы обновляются в add, update и delete, так что изменения объектов
+нужно сохранять через update; найденные по индексу объекты дополнительно
+проверяются на соответствие условиям.
+
+Если передан журнал (см. journal.Journal), содержимое репозитория
+восстанавливается из него при создании, а каждое изменение записывается
+в журнал, так что данные сохраняются между запусками.
+
+Транзакции откатываются по журналу отмены: при первом обращении к записи
+в транзакции (чтении или изменении) запоминается объект и состояние его
+полей (кортеж значений). Поэтому откатываются и изменения "на месте"
+объектов, полученных в транзакции. Состояния хранятся только для записей,
+затронутых транзакцией, и освобождаются при ее завершении, так что вне
+транзакций дополнительной памяти не требуется. Изменения на месте,
+сделанные до первого обращения к записи в транзакции, не откатываются.
 """
 
-from itertools import count
-from typing import Any
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from dataclasses import fields, is_dataclass
+from functools import cache
+from itertools import chain, count
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Collection, Iterable, Iterator, Sequence
 
 from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.journal import ADD, DELETE, UPDATE, Journal
+from bookkeeper.repository.query import Condition, Query, aggregate, to_query
+
+RANGE_OPERATORS = ('=', '<', '<=', '>', '>=', 'between')
+
+_KEY = itemgetter(0)
+# запись журнала отмены для записи, добавленной в транзакции
+_ADDED = (None, None)
+
+
+@cache
+def _field_names(cls: type) -> tuple[str, ...] | None:
+    """ Имена полей dataclass или None для остальных классов """
+    return tuple(f.name for f in fields(cls)) if is_dataclass(cls) else None
+
+
+@cache
+def _state_getter(cls: type) -> Callable[[Any], Any]:
+    """
+    Функция, возвращающая состояние полей объекта класса cls:
+    кортеж значений полей для dataclass, иначе копию __dict__
+    """
+    names = _field_names(cls)
+    if names is None:
+        return lambda obj: dict(vars(obj))
+    if len(names) == 1:
+        return lambda obj: (getattr(obj, names[0]),)
+    return attrgetter(*names)
+
+
+def _restore_state(obj: Any, state: Any) -> None:
+    """ Вернуть объекту состояние, полученное функцией _state_getter """
+    names = _field_names(type(obj))
+    if names is None:
+        obj.__dict__.clear()
+        obj.__dict__.update(state)
+        return
+    for name, value in zip(names, state):
+        object.__setattr__(obj, name, value)
 
 
 class MemoryRepository(AbstractRepository[T]):
     """
     Репозиторий, работающий в оперативной памяти. Хранит данные в словаре.
+    indexed_fields - поля, по которым строятся хэш-индексы
+    range_indexed_fields - поля, по которым строятся упорядоченные индексы
+    journal - журнал для хранения данных на диске; после использования
+              репозитория журнал нужно закрыть
     """
 
-    def __init__(self) -> None:
+    def __init__(self, indexed_fields: Iterable[str] = (),
+                 range_indexed_fields: Iterable[str] = (),
+                 journal: Journal | None = None) -> None:
         self._container: dict[int, T] = {}
         self._counter = count(1)
+        self._indexes: dict[str, dict[Any, set[int]]] = {
+            name: {} for name in indexed_fields}
+        self._ranges: dict[str, list[tuple[Any, int]]] = {
+            name: [] for name in range_indexed_fields}
+        self._range_nulls: dict[str, set[int]] = {name: set() for name in self._ranges}
+        self._index_keys: dict[int, tuple[Any, ...]] = {}
+        self._indexed = bool(self._indexes or self._ranges)
+        # состояния полей записей, затронутых текущей транзакцией,
+        # на момент последнего сохранения; вне транзакций пуст
+        self._states: dict[int, Any] = {}
+        # журналы отмены вложенных транзакций: id -> (объект, состояние),
+        # объект None - запись добавлена в транзакции
+        self._undo: list[dict[int, tuple[T | None, Any]]] = []
+        self._journal = journal
+        if journal is not None:
+            self._container = journal.recover()
+            self._counter = count(journal.last_pk + 1)
+            self._reindex()
+
+    def _log(self, op: int, pk: int, obj: T | None = None) -> None:
+        if self._journal is not None:
+            self._journal.append(op, pk, obj)
+            if self._journal.snapshot_due:
+                self.snapshot()
+
+    def snapshot(self) -> None:
+        """ Записать снимок содержимого в журнал (если он используется) """
+        if self._journal is not None:
+            self._journal.write_snapshot(self._container)
+
+    def _index(self, pk: int, obj: T) -> None:
+        keys = tuple(getattr(obj, name) for name in chain(self._indexes, self._ranges))
+        for index, key in zip(self._indexes.values(), keys):
+            index.setdefault(key, set()).add(pk)
+        for name, key in zip(self._ranges, keys[len(self._indexes):]):
+            if key is None:
+                self._range_nulls[name].add(pk)
+            else:
+                insort(self._ranges[name], (key, pk))
+        self._index_keys[pk] = keys
+
+    def _unindex(self, pk: int) -> None:
+        keys = self._index_keys.pop(pk, None)
+        if keys is None:
+            return
+        for index, key in zip(self._indexes.values(), keys):
+            pks = index[key]
+            pks.discard(pk)
+            if not pks:
+                del index[key]
+        for name, key in zip(self._ranges, keys[len(self._indexes):]):
+            if key is None:
+                self._range_nulls[name].discard(pk)
+            else:
+                entries = self._ranges[name]
+                del entries[bisect_left(entries, (key, pk))]
+
+    def _touch(self, pk: int, obj: T) -> None:
+        """ Запомнить состояние записи при первом обращении к ней в транзакции """
+        undo = self._undo[-1]
+        if pk not in undo:
+            state = self._states.get(pk)
+            if state is None:
+                state = self._states[pk] = _state_getter(type(obj))(obj)
+            undo[pk] = (obj, state)
+
+    def _touch_all(self, objs: list[T]) -> list[T]:
+        if self._undo:
+            for obj in objs:
+                self._touch(obj.pk, obj)
+        return objs
+
+    def _saved(self, pk: int, obj: T | None) -> None:
+        """ В транзакции запомнить состояние записи перед изменением и после него """
+        if not self._undo:
+            return
+        old = self._container.get(pk)
+        if old is None:
+            self._undo[-1].setdefault(pk, _ADDED)
+        else:
+            self._touch(pk, old)
+        if obj is None:
+            self._states.pop(pk, None)
+        else:
+            self._states[pk] = _state_getter(type(obj))(obj)
+
+    def _rollback(self, undo: dict[int, tuple[T | None, Any]]) -> None:
+        """ Отменить изменения записей из журнала отмены """
+        reorder = False
+        for pk, (obj, state) in undo.items():
+            if self._indexed:
+                self._unindex(pk)
+            if obj is None:
+                self._container.pop(pk, None)
+                self._states.pop(pk, None)
+                continue
+            _restore_state(obj, state)
+            reorder = reorder or pk not in self._container
+            self._container[pk] = obj
+            self._states[pk] = state
+            if self._indexed:
+                self._index(pk, obj)
+        if reorder:
+            # восстановленные удаленные записи возвращаются на свои места
+            self._container = dict(sorted(self._container.items(), key=_KEY))
+
+    def _reindex(self) -> None:
+        for index in self._indexes.values():
+            index.clear()
+        for name in self._ranges:
+            self._ranges[name] = []
+            self._range_nulls[name] = set()
+        self._index_keys.clear()
+        if self._indexed:
+            for pk, obj in self._container.items():
+                self._index(pk, obj)
+
+    def _lookup(self, cond: Condition) -> set[int] | None:
+        """ id записей, подходящих под условие, по хэш-индексу или None """
+        index = self._indexes.get(cond.field)
+        if index is None:
+            return None
+        if cond.op == '=':
+            return index.get(cond.value, set())
+        if cond.op == 'in':
+            return set().union(*(index.get(value, ()) for value in cond.value))
+        return None
+
+    @staticmethod
+    def _uses_range(cond: Condition, name: str) -> bool:
+        return (cond.field == name and cond.op in RANGE_OPERATORS
+                and not (cond.op == '=' and cond.value is None))
+
+    def _range_bounds(self, name: str, conditions: Sequence[Condition]
+                      ) -> tuple[int, int]:
+        """ Границы части упорядоченного индекса, подходящей под условия """
+        entries = self._ranges[name]
+        low, high = 0, len(entries)
+        for cond in conditions:
+            if not self._uses_range(cond, name):
+                continue
+            first, last = cond.value if cond.op == 'between' else (cond.value,) * 2
+            if cond.op in ('=', '>=', 'between'):
+                low = max(low, bisect_left(entries, first, key=_KEY))
+            elif cond.op == '>':
+                low = max(low, bisect_right(entries, first, key=_KEY))
+            if cond.op in ('=', '<=', 'between'):
+                high = min(high, bisect_right(entries, last, key=_KEY))
+            elif cond.op == '<':
+                high = min(high, bisect_left(entries, last, key=_KEY))
+        return low, max(low, high)
+
+    def _smallest_hash(self, conditions: Sequence[Condition]) -> set[int] | None:
+        best: set[int] | None = None
+        for cond in conditions:
+            pks = self._lookup(cond)
+            if pks is not None and (best is None or len(pks) < len(best)):
+                best = pks
+        return best
+
+    def _candidates(self, conditions: Sequence[Condition]) -> Iterable[T]:
+        """
+        Объекты, среди которых нужно искать подходящие под условия:
+        по наименьшему из подходящих индексов или все объекты
+        """
+        best: Collection[int] | None = self._smallest_hash(conditions)
+        for name, entries in self._ranges.items():
+            if any(self._uses_range(cond, name) for cond in conditions):
+                low, high = self._range_bounds(name, conditions)
+                if best is None or high - low < len(best):
+                    best = [pk for _, pk in entries[low:high]]
+        if best is None:
+            return self._container.values()
+        return [self._container[pk] for pk in sorted(best)]
+
+    def _descending(self, name: str, low: int, high: int) -> Iterator[int]:
+        """
+        id из части упорядоченного индекса по убыванию значения;
+        при равных значениях - по возрастанию id, как при устойчивой сортировке
+        """
+        entries = self._ranges[name]
+        while high > low:
+            start = max(low, bisect_left(entries, entries[high - 1][0], key=_KEY))
+            for _, pk in entries[start:high]:
+                yield pk
+            high = start
+
+    def _ordered(self, query: Query) -> list[T] | None:
+        """
+        Выполнить запрос с сортировкой по полю с упорядоченным индексом,
+        перебирая записи в порядке индекса. None, если это невыгодно
+        """
+        if len(query.order_by) != 1:
+            return None
+        name = query.order_by[0].lstrip('-')
+        if name not in self._ranges:
+            return None
+        low, high = self._range_bounds(name, query.where)
+        hashed = self._smallest_hash(query.where)
+        if hashed is not None and len(hashed) < high - low:
+            return None
+        nulls: list[int] = []
+        if not any(self._uses_range(cond, name) for cond in query.where):
+            nulls = sorted(self._range_nulls[name])
+        if query.order_by[0].startswith('-'):
+            pks: Iterable[int] = chain(self._descending(name, low, high), nulls)
+        else:
+            pks = chain(nulls, (pk for _, pk in self._ranges[name][low:high]))
+        result: list[T] = []
+        skip = query.offset
+        for pk in pks:
+            obj = self._container[pk]
+            if not query.matches(obj):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if query.limit is not None and len(result) >= query.limit:
+                break
+            result.append(obj)
+        return result
 
     def add(self, obj: T) -> int:
         if getattr(obj, 'pk', None) != 0:
             raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
         pk = next(self._counter)
-        self._container[pk] = obj
         obj.pk = pk
+        self._saved(pk, obj)
+        self._container[pk] = obj
+        if self._indexed:
+            self._index(pk, obj)
+        self._log(ADD, pk, obj)
         return pk
 
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        items = list(objs)
+        for obj in items:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        return [self.add(obj) for obj in items]
+
     def get(self, pk: int) -> T | None:
-        return self._container.get(pk)
+        obj = self._container.get(pk)
+        if self._undo and obj is not None:
+            self._touch(pk, obj)
+        return obj
 
     def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
         if where is None:
-            return list(self._container.values())
-        return [obj for obj in self._container.values()
-                if all(getattr(obj, attr) == value for attr, value in where.items())]
+            return self._touch_all(list(self._container.values()))
+        query = to_query(where)
+        return self._touch_all([
+            obj for obj in self._candidates(query.where)
+            if all(getattr(obj, attr) == value for attr, value in where.items())])
+
+    def find(self, query: Query) -> list[T]:
+        result = self._ordered(query) if self._ranges else None
+        if result is None:
+            result = query.apply(self._candidates(query.where))
+        return self._touch_all(result)
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        query = to_query(where)
+        for obj in list(self._candidates(query.where)):
+            if query.matches(obj):
+                if self._undo:
+                    self._touch(obj.pk, obj)
+                yield obj
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        query = to_query(where)
+        return aggregate(filter(query.matches, self._candidates(query.where)),
+                         group_by, aggregates)
 
     def update(self, obj: T) -> None:
         if obj.pk == 0:
             raise ValueError('attempt to update object with unknown primary key')
+        self._saved(obj.pk, obj)
         self._container[obj.pk] = obj
+        if self._indexed:
+            self._unindex(obj.pk)
+            self._index(obj.pk, obj)
+        self._log(UPDATE, obj.pk, obj)
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        items = list(objs)
+        if any(obj.pk == 0 for obj in items):
+            raise ValueError('attempt to update object with unknown primary key')
+        for obj in items:
+            self.update(obj)
 
     def delete(self, pk: int) -> None:
-        self._container.pop(pk)
+        if pk not in self._container:
+            raise KeyError(pk)
+        self._saved(pk, None)
+        del self._container[pk]
+        if self._indexed:
+            self._unindex(pk)
+        self._log(DELETE, pk)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pk_list = list(dict.fromkeys(pks))
+        for pk in pk_list:
+            if pk not in self._container:
+                raise KeyError(pk)
+        for pk in pk_list:
+            self.delete(pk)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Транзакция на основе журнала отмены: при исключении измененные
+        записи восстанавливаются вместе с состоянием полей объектов.
+        Выданные id повторно не используются. Изменения записываются
+        в журнал при завершении внешней транзакции.
+        """
+        undo: dict[int, tuple[T | None, Any]] = {}
+        self._undo.append(undo)
+        if self._journal is not None:
+            self._journal.begin()
+        try:
+            yield
+        except BaseException:
+            self._undo.pop()
+            self._rollback(undo)
+            if not self._undo:
+                self._states.clear()
+            if self._journal is not None:
+                self._journal.rollback()
+            raise
+        self._undo.pop()
+        if self._undo:
+            for pk, entry in undo.items():
+                self._undo[-1].setdefault(pk, entry)
+        else:
+            self._states.clear()
+        if self._journal is not None:
+            self._journal.commit()
@@ -0,0 +1,227 @@
+"""
+Модуль описывает репозиторий расходов только для чтения поверх
+отображенного в память (mmap) двоичного файла
+
+Файл состоит из заголовка (наибольший id и количество записей) и записей
+фиксированной длины: запись с id pk лежит по смещению
+HEADER.size + (pk - 1) * RECORD.size, поэтому get(pk) читает одну запись
+без поиска. Запись содержит id (0 - записи нет),
+сумму, категорию, дату расхода и дату добавления (секунды от начала
+эпохи, см. sqlite_codecs), а также смещение и длину комментария
+в отдельном файле-куче (path.heap, строки UTF-8, одинаковые комментарии
+хранятся один раз).
+
+Записи разбираются по мере перебора (struct) из копий небольших блоков
+отображенного буфера, так что незавершенный перебор не мешает закрыть
+файл. Условия на числовые поля проверяются до создания объектов
+Expense. Несколько процессов, открывших один файл, используют общие
+страницы кэша ОС.
+
+Файл создается из базы SQLite функцией convert_sqlite; база открывается
+только для чтения и не изменяется.
+"""
+
+import mmap
+import operator
+import os
+import sqlite3
+import struct
+from functools import partial
+from itertools import chain
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Iterator, Sequence
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.query import Condition, Query, to_query
+from bookkeeper.repository.sqlite_codecs import decode_datetime, encode_datetime
+
+MAGIC = b'BKEXP002'
+HEADER = struct.Struct('<8sQQ')
+RECORD = struct.Struct('<qqqqqQI4x')
+
+COLUMNS = {'pk': 0, 'amount': 1, 'category': 2, 'expense_date': 3, 'added_date': 4}
+DATE_COLUMNS = ('expense_date', 'added_date')
+
+_COMPARE: dict[str, Callable[[Any, Any], bool]] = {
+    # аргументы переставлены: partial(op, value)(x) означает x <оператор> value
+    '=': operator.eq, '<': operator.gt, '<=': operator.ge,
+    '>': operator.lt, '>=': operator.le,
+}
+
+Row = tuple[int, int, int, int, int, int, int]
+
+
+class MappedExpenseRepository(AbstractRepository[Expense]):
+    """
+    Репозиторий расходов только для чтения над файлом path
+    (см. convert_sqlite). Методы изменения данных вызывают
+    NotImplementedError. После использования репозиторий нужно закрыть
+    методом close или использовать его как контекстный менеджер.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._live = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not an expense file')
+        heap_path = path + '.heap'
+        self._heap: bytes | mmap.mmap = b''
+        if os.path.getsize(heap_path):
+            with open(heap_path, 'rb') as file:
+                self._heap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _make(self, row: Row) -> Expense:
+        obj: Expense = object.__new__(Expense)
+        obj.pk, obj.amount, obj.category = row[0], row[1], row[2]
+        obj.expense_date = decode_datetime(row[3])
+        obj.added_date = decode_datetime(row[4])
+        obj.comment = str(self._heap[row[5]:row[5] + row[6]], 'utf-8')
+        return obj
+
+    def get(self, pk: int) -> Expense | None:
+        if not 1 <= pk <= self._count:
+            return None
+        row = RECORD.unpack_from(self._map, HEADER.size + (pk - 1) * RECORD.size)
+        return self._make(row) if row[0] else None
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[Expense]:
+        return list(self.iter_all(where))
+
+    def find(self, query: Query) -> list[Expense]:
+        return Query(order_by=query.order_by, limit=query.limit,
+                     offset=query.offset).apply(self.iter_all(query))
+
+    def _pk_bounds(self, conditions: Sequence[Condition]) -> tuple[int, int]:
+        """ Диапазон id, который нужно просмотреть """
+        low, high = 1, self._count
+        for cond in conditions:
+            if cond.field != 'pk' or cond.value is None:
+                continue
+            if cond.op in ('=', '>=', 'between'):
+                low = max(low, cond.value[0] if cond.op == 'between' else cond.value)
+            elif cond.op == '>':
+                low = max(low, cond.value + 1)
+            if cond.op in ('=', '<=', 'between'):
+                high = min(high, cond.value[1] if cond.op == 'between' else cond.value)
+            elif cond.op == '<':
+                high = min(high, cond.value - 1)
+        return low, high
+
+    def _rows(self, low: int, high: int, batch_size: int) -> Iterator[Row]:
+        """ Записи с id от low до high, разобранные из копий блоков по batch_size """
+        def chunk(first: int) -> bytes:
+            last = min(high, first + batch_size - 1)
+            return self._map[HEADER.size + (first - 1) * RECORD.size:
+                             HEADER.size + last * RECORD.size]
+        chunks = map(chunk, range(low, high + 1, max(batch_size, 1)))
+        return chain.from_iterable(map(RECORD.iter_unpack, chunks))
+
+    def _row_test(self, cond: Condition) -> Callable[[Row], bool] | None:
+        """ Проверка условия по неразобранной записи, если это возможно """
+        column = COLUMNS.get(cond.field)
+        if column is None:
+            return None
+        encode: Callable[[Any], Any] = (encode_datetime if cond.field in DATE_COLUMNS
+                                        else _same)
+        if cond.op == 'in':
+            values = frozenset(map(encode, cond.value))
+            return lambda row: row[column] in values
+        if cond.op == 'between':
+            low, high = map(encode, cond.value)
+            return lambda row: bool(low <= row[column] <= high)
+        compare = partial(_COMPARE[cond.op], encode(cond.value))
+        return lambda row: compare(row[column])
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[Expense]:
+        """
+        Перебрать записи в порядке id, разбирая их из отображенного файла.
+        Условия на поля, кроме комментария, проверяются до создания объектов.
+        """
+        conditions = to_query(where).where
+        low, high = self._pk_bounds(conditions)
+        if low > high:
+            return
+        late = []
+        rows: Iterator[Row] = filter(operator.itemgetter(0),
+                                     self._rows(low, high, batch_size))
+        for cond in conditions:
+            test = self._row_test(cond)
+            if test is None:
+                late.append(cond)
+            else:
+                rows = filter(test, rows)
+        for obj in map(self._make, rows):
+            if all(cond.matches(obj) for cond in late):
+                yield obj
+
+    def add(self, obj: Expense) -> int:
+        raise NotImplementedError('MappedExpenseRepository is read-only')
+
+    def update(self, obj: Expense) -> None:
+        raise NotImplementedError('MappedExpenseRepository is read-only')
+
+    def delete(self, pk: int) -> None:
+        raise NotImplementedError('MappedExpenseRepository is read-only')
+
+    def close(self) -> None:
+        """ Закрыть отображение файлов """
+        self._map.close()
+        if isinstance(self._heap, mmap.mmap):
+            self._heap.close()
+
+    def __enter__(self) -> 'MappedExpenseRepository':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
+
+
+def _same(value: Any) -> Any:
+    return value
+
+
+def convert_sqlite(db_file: str, path: str) -> int:
+    """
+    Записать расходы из базы SQLite db_file в файл path (и path.heap).
+    База открывается только для чтения. Возвращает количество
+    записанных расходов.
+    """
+    source = sqlite3.connect(Path(db_file).absolute().as_uri() + '?mode=ro', uri=True)
+    heap_offsets: dict[str, tuple[int, int]] = {}
+    heap_size = 0
+    written = 0
+    count = 0
+    empty = RECORD.pack(0, 0, 0, 0, 0, 0, 0)
+    with (source, open(path + '.tmp', 'wb') as out,
+          open(path + '.heap.tmp', 'wb') as heap):
+        out.write(HEADER.pack(MAGIC, 0, 0))
+        rows = source.execute('SELECT pk, amount, category, expense_date, added_date, '
+                              'comment FROM expense ORDER BY pk')
+        for pk, amount, category, expense_date, added_date, text in rows:
+            comment = heap_offsets.get(text)
+            if comment is None:
+                data = text.encode('utf-8')
+                comment = heap_offsets[text] = heap_size, len(data)
+                heap.write(data)
+                heap_size += len(data)
+            out.write(empty * (pk - 1 - count))
+            out.write(RECORD.pack(pk, amount, category, encode_datetime(expense_date),
+                                  encode_datetime(added_date), *comment))
+            count = pk
+            written += 1
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, count, written))
+    source.close()
+    os.replace(path + '.heap.tmp', path + '.heap')
+    os.replace(path + '.tmp', path)
+    return written
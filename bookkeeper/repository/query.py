@@ -0,0 +1,227 @@
+"""
+Модуль описывает объект запроса к репозиторию
+
+Запрос состоит из условий отбора, порядка сортировки, ограничения
+количества записей и смещения. Пример: расходы за последние 30 дней,
+сначала новые, не более 10 штук:
+
+    Query(where=[('expense_date', '>=', month_ago)],
+          order_by=['-expense_date'], limit=10)
+
+Условие в виде словаря {'название_поля': значение} означает проверку
+на равенство, как в AbstractRepository.get_all.
+Репозитории, хранящие данные в СУБД, транслируют запрос в SQL,
+остальные вычисляют его методом Query.apply.
+
+Здесь же описана агрегация (см. AbstractRepository.aggregate). Поле группировки
+задается именем, для дат можно указать усечение до года, месяца или дня
+через двоеточие: 'expense_date:month' (ключ группы - строка вида '2023-01').
+Агрегатные функции задаются словарем {'имя результата': (функция, поле)},
+например {'total': ('sum', 'amount'), 'n': ('count', '*')}.
+"""
+
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Sequence, TypeVar
+
+X = TypeVar('X')
+
+OPERATORS = ('=', '<', '<=', '>', '>=', 'between', 'in')
+
+AGGREGATES = ('sum', 'count', 'min', 'max', 'avg')
+
+DATE_PARTS = {'year': '%Y', 'month': '%Y-%m', 'day': '%Y-%m-%d'}
+
+
+@dataclass(frozen=True)
+class Condition:
+    """
+    Условие отбора: field op value.
+    Для оператора between значение - пара (нижняя граница, верхняя граница),
+    границы включаются; для оператора in - коллекция допустимых значений.
+    """
+    field: str
+    op: str
+    value: Any
+
+    def __post_init__(self) -> None:
+        if self.op not in OPERATORS:
+            raise ValueError(f'unknown operator {self.op!r}')
+        if self.op == 'between':
+            low, high = self.value
+            object.__setattr__(self, 'value', (low, high))
+        elif self.op == 'in':
+            object.__setattr__(self, 'value', tuple(self.value))
+
+    def matches(self, obj: Any) -> bool:
+        """ Проверить, удовлетворяет ли объект условию """
+        value = getattr(obj, self.field)
+        if self.op == '=':
+            return bool(value == self.value)
+        if self.op == 'in':
+            return value in self.value
+        if value is None:
+            return False
+        if self.op == '<':
+            return bool(value < self.value)
+        if self.op == '<=':
+            return bool(value <= self.value)
+        if self.op == '>':
+            return bool(value > self.value)
+        if self.op == '>=':
+            return bool(value >= self.value)
+        low, high = self.value
+        return bool(low <= value <= high)
+
+
+def _to_conditions(where: Any) -> tuple[Condition, ...]:
+    if isinstance(where, dict):
+        return tuple(Condition(name, '=', value) for name, value in where.items())
+    return tuple(cond if isinstance(cond, Condition) else Condition(*cond)
+                 for cond in where)
+
+
+@dataclass(frozen=True, init=False)
+class Query:
+    """
+    Запрос к репозиторию.
+    where - условия, объединяемые через И: список объектов Condition
+            или троек (поле, оператор, значение), либо словарь равенств
+    order_by - поля для сортировки, '-поле' означает сортировку по убыванию
+    limit - максимальное количество записей (None - без ограничения)
+    offset - количество пропускаемых записей
+    """
+    where: tuple[Condition, ...] = ()
+    order_by: tuple[str, ...] = ()
+    limit: int | None = None
+    offset: int = 0
+
+    def __init__(self, where: Any = (), order_by: Iterable[str] = (),
+                 limit: int | None = None, offset: int = 0) -> None:
+        object.__setattr__(self, 'where', _to_conditions(where))
+        object.__setattr__(self, 'order_by', tuple(order_by))
+        object.__setattr__(self, 'limit', limit)
+        object.__setattr__(self, 'offset', offset)
+
+    def filter(self, name: str, op: str, value: Any) -> 'Query':
+        """ Получить новый запрос с дополнительным условием """
+        return replace(self, where=(*self.where, Condition(name, op, value)))
+
+    def fields(self) -> set[str]:
+        """ Все поля, используемые в запросе """
+        return ({cond.field for cond in self.where}
+                | {name.lstrip('-') for name in self.order_by})
+
+    def matches(self, obj: Any) -> bool:
+        """ Проверить, удовлетворяет ли объект всем условиям """
+        return all(cond.matches(obj) for cond in self.where)
+
+    def apply(self, objs: Iterable[X]) -> list[X]:
+        """
+        Выполнить запрос над последовательностью объектов.
+        При сортировке значения None идут первыми, как в SQLite.
+        """
+        result = [obj for obj in objs if self.matches(obj)]
+        for name in reversed(self.order_by):
+            result.sort(key=_sort_key(name.lstrip('-')), reverse=name.startswith('-'))
+        end = None if self.limit is None else self.offset + self.limit
+        return result[self.offset:end]
+
+
+def _sort_key(name: str) -> Callable[[Any], tuple[bool, Any]]:
+    def key(obj: Any) -> tuple[bool, Any]:
+        value = getattr(obj, name)
+        return value is not None, value
+    return key
+
+
+def to_query(where: 'Query | dict[str, Any] | None') -> Query:
+    """ Привести условие (запрос, словарь равенств или None) к запросу """
+    if isinstance(where, Query):
+        return where
+    return Query(where or {})
+
+
+def split_group(spec: str) -> tuple[str, str | None]:
+    """ Разобрать поле группировки на имя поля и усечение даты """
+    name, _, part = spec.partition(':')
+    if part and part not in DATE_PARTS:
+        raise ValueError(f'unknown date part {part!r}')
+    return name, part or None
+
+
+def truncate_date(value: Any, part: str) -> str | None:
+    """ Усечь дату (datetime, date или строку ISO) до года, месяца или дня """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, date):
+        raise TypeError(f'cannot truncate {value!r} to {part}')
+    return value.strftime(DATE_PARTS[part])
+
+
+def check_aggregates(aggregates: dict[str, tuple[str, str]]) -> None:
+    """ Проверить описание агрегатных функций """
+    for func, name in aggregates.values():
+        if func not in AGGREGATES:
+            raise ValueError(f'unknown aggregate function {func!r}')
+        if name == '*' and func != 'count':
+            raise ValueError(f'{func}(*) is not supported')
+
+
+_STEPS: dict[str, Callable[[Any, Any], Any]] = {
+    'count': lambda acc, value: None,
+    'sum': lambda acc, value: value if acc is None else acc + value,
+    'avg': lambda acc, value: value if acc is None else acc + value,
+    'min': lambda acc, value: value if acc is None or value < acc else acc,
+    'max': lambda acc, value: value if acc is None or value > acc else acc,
+}
+
+
+def _result(func: str, count: int, acc: Any) -> Any:
+    if func == 'count':
+        return count
+    if func == 'avg':
+        return None if count == 0 else acc / count
+    return acc
+
+
+def _sort_group(key: tuple[Any, ...]) -> list[tuple[bool, Any]]:
+    return [(value is not None, value) for value in key]
+
+
+def aggregate(objs: Iterable[Any], group_by: Sequence[str],
+              aggregates: dict[str, tuple[str, str]]) -> list[dict[str, Any]]:
+    """
+    Агрегировать объекты за один проход с хешированием по ключу группы.
+    Семантика совпадает с SQL: значения None не учитываются,
+    sum, min, max и avg без значений дают None. Без группировки
+    всегда возвращается ровно одна строка. Строки упорядочены по ключу группы.
+    """
+    check_aggregates(aggregates)
+    groups = [split_group(spec) for spec in group_by]
+    specs = [(_STEPS[func], name) for func, name in aggregates.values()]
+    # для каждой группы и каждой функции: [количество значений, накопленное значение]
+    acc: dict[tuple[Any, ...], list[list[Any]]] = {}
+    for obj in objs:
+        key = tuple(getattr(obj, name) if part is None
+                    else truncate_date(getattr(obj, name), part)
+                    for name, part in groups)
+        state = acc.get(key)
+        if state is None:
+            state = acc[key] = [[0, None] for _ in specs]
+        for st, (step, name) in zip(state, specs):
+            value = 1 if name == '*' else getattr(obj, name)
+            if value is not None:
+                st[0] += 1
+                st[1] = step(st[1], value)
+    if not groups and not acc:
+        acc[()] = [[0, None] for _ in specs]
+    result = []
+    for key in sorted(acc, key=_sort_group):
+        row = dict(zip(group_by, key))
+        for (count, value), (res_name, (func, _)) in zip(acc[key], aggregates.items()):
+            row[res_name] = _result(func, count, value)
+        result.append(row)
+    return result
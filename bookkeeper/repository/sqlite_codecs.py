@@ -0,0 +1,106 @@
+"""
+Модуль описывает преобразование значений полей при хранении в SQLite
+
+Кодек задает тип столбца, функции преобразования значения при записи
+и при чтении, а также SQL-выражения для работы с сохраненным значением.
+Поля типа datetime хранятся как целое число секунд от начала эпохи
+(1970-01-01 00:00:00), поля типа date - как целое число дней от начала
+эпохи. Это дает компактные целочисленные индексы для отбора по диапазону
+дат. Дробная часть секунд не сохраняется. Даты с часовым поясом
+переводятся в UTC, прочие считаются заданными в UTC.
+"""
+
+import types
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Union, get_args, get_origin
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+SECOND = timedelta(seconds=1)
+
+
+def base_type(annotation: Any) -> Any:
+    """ Тип X для аннотаций вида X | None, иначе сама аннотация """
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    raise TypeError(f'cannot store {value!r} as datetime')
+
+
+def encode_datetime(value: Any) -> Any:
+    """ datetime (а также date или строка ISO) -> секунды от начала эпохи """
+    if value is None or isinstance(value, int):
+        return value
+    return (_to_datetime(value) - EPOCH) // SECOND
+
+
+def decode_datetime(value: Any) -> Any:
+    """ Секунды от начала эпохи -> datetime; строки ISO тоже допускаются """
+    if isinstance(value, int):
+        return EPOCH + timedelta(seconds=value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_date(value: Any) -> Any:
+    """ date (а также datetime или строка ISO) -> дни от начала эпохи """
+    if value is None or isinstance(value, int):
+        return value
+    return (_to_datetime(value).date() - EPOCH_DATE).days
+
+
+def decode_date(value: Any) -> Any:
+    """ Дни от начала эпохи -> date; строки ISO тоже допускаются """
+    if isinstance(value, int):
+        return EPOCH_DATE + timedelta(days=value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    return value
+
+
+@dataclass(frozen=True)
+class Codec:
+    """
+    Кодек значений поля.
+    sql_type - тип столбца
+    encode, decode - преобразование при записи и при чтении
+    time_sql - аргументы функции strftime для столбца (шаблон с {col})
+    from_text_sql - выражение для перевода значений, сохраненных
+                    ранее строкой ISO (шаблон с {col})
+    """
+    sql_type: str
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any], Any]
+    time_sql: str
+    from_text_sql: str
+
+
+CODECS: dict[type, Codec] = {
+    datetime: Codec('INTEGER', encode_datetime, decode_datetime,
+                    "{col}, 'unixepoch'",
+                    "CAST(strftime('%s', {col}) AS INTEGER)"),
+    date: Codec('INTEGER', encode_date, decode_date,
+                "{col} * 86400, 'unixepoch'",
+                "CAST(strftime('%s', {col}) AS INTEGER) / 86400"),
+}
+
+
+def field_codecs(fields: dict[str, Any]) -> dict[str, Codec]:
+    """ Кодеки для полей модели, которым они нужны """
+    return {name: CODECS[base_type(ann)] for name, ann in fields.items()
+            if base_type(ann) in CODECS}
@@ -0,0 +1,197 @@
+"""
+Модуль описывает менеджер соединений с базой данных SQLite
+
+Менеджер создается один на файл базы данных и разделяется всеми
+репозиториями, работающими с этим файлом. Каждый поток получает собственное
+долгоживущее соединение, которое открывается при первом обращении
+и настраивается (журнал WAL, PRAGMA) один раз. Поэтому базы в памяти
+(':memory:') не поддерживаются: у каждого соединения была бы своя пустая
+база.
+
+Счетчик commits увеличивается при каждой фиксации внешней транзакции.
+По нему кэши обнаруживают изменения, сделанные другими репозиториями
+в этом процессе: PRAGMA data_version не меняется после фиксаций через
+то же соединение.
+
+После вызова instrument менеджер учитывает время открытия соединений,
+выполнения запросов и выборки строк (см. instrumentation). Время открытия
+запоминается в каждом соединении, поэтому соединения, открытые до вызова
+instrument, тоже учитываются.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+
+from bookkeeper.repository.instrumentation import Metrics, TimedCursor
+
+
+class Connection(sqlite3.Connection):
+    """
+    Соединение, которое при заданном metrics выполняет запросы
+    курсором TimedCursor, учитывающим время их выполнения.
+    connect_ns - время открытия и настройки соединения
+    """
+    metrics: Metrics | None = None
+    connect_ns = 0
+
+    def _timed_cursor(self) -> TimedCursor:
+        cur = self.cursor(TimedCursor)
+        cur.metrics = self.metrics  # type: ignore[assignment]
+        return cur
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        if self.metrics is None:
+            return super().execute(sql, parameters)
+        return self._timed_cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /
+                    ) -> sqlite3.Cursor:
+        if self.metrics is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self._timed_cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionManager:
+    """
+    Менеджер соединений с одним файлом базы данных SQLite.
+    Соединения работают в режиме autocommit, транзакции открываются
+    явно методом transaction.
+    """
+
+    PRAGMAS: tuple[tuple[str, str], ...] = (
+        ('foreign_keys', 'ON'),
+        ('synchronous', 'NORMAL'),
+        ('temp_store', 'MEMORY'),
+        ('cache_size', '-16000'),
+        ('busy_timeout', '5000'),
+    )
+
+    _registry: dict[str, 'ConnectionManager'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, db_file: str) -> None:
+        if db_file in ('', ':memory:'):
+            raise ValueError('in-memory SQLite databases are not supported, '
+                             'use MemoryRepository or a database file')
+        self.db_file = db_file
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[Connection] = []
+        self._wal_enabled = False
+        self.metrics: Metrics | None = None
+        self.commits = 0
+
+    @classmethod
+    def for_file(cls, db_file: str) -> 'ConnectionManager':
+        """
+        Получить общий менеджер для файла базы данных.
+        Повторные вызовы с тем же файлом возвращают тот же объект.
+        """
+        key = os.path.abspath(db_file)
+        with cls._registry_lock:
+            manager = cls._registry.get(key)
+            if manager is None:
+                manager = cls(db_file)
+                cls._registry[key] = manager
+            return manager
+
+    def connection(self) -> sqlite3.Connection:
+        """ Получить соединение текущего потока, при необходимости открыть его """
+        con: sqlite3.Connection | None = getattr(self._local, 'con', None)
+        if con is None:
+            con = self._open()
+            self._local.con = con
+            self._local.depth = 0
+        return con
+
+    def _open(self) -> sqlite3.Connection:
+        start = time.perf_counter_ns()
+        con = sqlite3.connect(self.db_file, isolation_level=None,
+                              check_same_thread=False, factory=Connection)
+        with self._lock:
+            if not self._wal_enabled:
+                con.execute('PRAGMA journal_mode = WAL')
+                self._wal_enabled = True
+        for name, value in self.PRAGMAS:
+            con.execute(f'PRAGMA {name} = {value}')
+        con.connect_ns = time.perf_counter_ns() - start
+        with self._lock:
+            self._connections.append(con)
+            con.metrics = metrics = self.metrics
+        if metrics is not None:
+            metrics.record('sqlite', 'connect', con.connect_ns)
+        return con
+
+    def close_connection(self) -> None:
+        """ Закрыть соединение текущего потока, если оно открыто """
+        con: Connection | None = getattr(self._local, 'con', None)
+        if con is None:
+            return
+        with self._lock:
+            if con in self._connections:
+                self._connections.remove(con)
+        con.close()
+        del self._local.con
+        self._local.depth = 0
+
+    def instrument(self, metrics: Metrics | None) -> None:
+        """
+        Включить учет времени работы с базой (None - выключить).
+        Время открытия уже открытых соединений учитывается сразу.
+        """
+        with self._lock:
+            self.metrics = metrics
+            for con in self._connections:
+                if metrics is not None and con.metrics is not metrics:
+                    metrics.record('sqlite', 'connect', con.connect_ns)
+                con.metrics = metrics
+
+    def in_transaction(self) -> bool:
+        """ Открыта ли транзакция в текущем потоке """
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Выполнить блок в транзакции. Вложенные вызовы не фиксируют
+        изменения, а используют точки сохранения (SAVEPOINT), так что
+        фиксация происходит один раз при выходе из внешнего блока.
+        При исключении изменения блока откатываются.
+        """
+        con = self.connection()
+        depth = self._local.depth
+        if depth == 0:
+            begin, commit, rollback = 'BEGIN IMMEDIATE', ('COMMIT',), ('ROLLBACK',)
+        else:
+            name = f'sp_{depth}'
+            begin, commit = f'SAVEPOINT {name}', (f'RELEASE {name}',)
+            rollback = (f'ROLLBACK TO {name}', f'RELEASE {name}')
+        con.execute(begin)
+        self._local.depth = depth + 1
+        try:
+            yield con
+        except BaseException:
+            for statement in rollback:
+                con.execute(statement)
+            raise
+        else:
+            for statement in commit:
+                con.execute(statement)
+            if depth == 0:
+                with self._lock:
+                    self.commits += 1
+        finally:
+            self._local.depth = depth
+
+    def close(self) -> None:
+        """ Закрыть все соединения, открытые менеджером """
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+            self._wal_enabled = False
+        self._local = threading.local()
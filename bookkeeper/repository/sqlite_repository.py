@@ -3,30 +3,55 @@
 """
 
 import sqlite3
-from typing import Any
+from contextlib import AbstractContextManager
+from typing import Any, Iterable, Iterator, Sequence
 from inspect import get_annotations
 
+from bookkeeper.repository import sqlite_codecs, sqlite_schema
 from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.materializer import make_materializer
+from bookkeeper.repository.query import (
+    DATE_PARTS, Condition, Query, check_aggregates, split_group, to_query
+)
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+
 
 class SQLiteRepository(AbstractRepository[T]):
+    """
+    Репозиторий, работающий в базе данных SQLite.
+    Соединения берутся у менеджера соединений, общего для всех
+    репозиториев одного файла базы данных.
+    indexes - списки столбцов, по которым строятся индексы;
+    по умолчанию берутся из sqlite_schema.MODEL_INDEXES.
+    Для иерархических моделей из sqlite_schema.MODEL_CLOSURES
+    поддерживается таблица замыкания (см. subtree_totals).
+    Значения полей с датами хранятся целыми числами (см. sqlite_codecs),
+    значения в условиях запросов по этим полям преобразуются так же.
+    """
 
-    def __init__(self, db_file: str, cls: type) -> None:
+    def __init__(self, db_file: str, cls: type,
+                 manager: ConnectionManager | None = None,
+                 indexes: Iterable[Sequence[str]] | None = None) -> None:
         self.db_file = db_file
+        self.manager = manager or ConnectionManager.for_file(db_file)
         self.table_name = cls.__name__.lower()
         self.fields = get_annotations(cls, eval_str=True)
         self.fields.pop('pk')
         self.obj_cls = cls
+        self._codecs = sqlite_codecs.field_codecs(self.fields)
+        self._encoders = [(name, self._codecs[name].encode if name in self._codecs
+                           else None) for name in self.fields]
+        self._make = make_materializer(
+            cls, self.fields, {name: c.decode for name, c in self._codecs.items()})
+        if indexes is None:
+            indexes = sqlite_schema.MODEL_INDEXES.get(self.table_name, ())
+
+        self.closure_parent = sqlite_schema.MODEL_CLOSURES.get(self.table_name)
 
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            res = cur.execute('SELECT name FROM sqlite_master')
-            db_tables = [t[0].lower() for t in res.fetchall()]
-            if self.table_name not in db_tables:
-                col_names = ', '.join(self.fields.keys())
-                query = f'CREATE TABLE {self.table_name} (' \
-                    f'"pk" INTEGER PRIMARY KEY AUTOINCREMENT, {col_names})'
-                cur.execute(query)
-        con.close()
+        with self.manager.transaction() as con:
+            sqlite_schema.ensure_schema(con, self.table_name, self.fields, indexes)
+            if self.closure_parent is not None:
+                sqlite_schema.ensure_closure(con, self.table_name, self.closure_parent)
 
     def add(self, obj: T) -> int:
         """ Добавляет объект в базу данных """
@@ -34,55 +59,258 @@ class SQLiteRepository(AbstractRepository[T]):
             raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
         names = ', '.join(self.fields.keys())
         param = ', '.join("?" * len(self.fields))
-        values = [getattr(obj, x) for x in self.fields]
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            cur.execute(
+        values = self._values(obj)
+        with self.manager.transaction() as con:
+            cur = con.execute(
                 f'INSERT INTO {self.table_name} ({names}) VALUES ({param})', values
             )
             obj.pk = cur.lastrowid
-        con.close()
         return obj.pk
 
-    def get(self, pk: int) -> T | None:
-        """ Получить объект по id """
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute(
-                f'SELECT * FROM {self.table_name} WHERE ROWID=={pk}'
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """
+        Добавляет объекты в базу данных одной транзакцией.
+        Пока транзакция удерживает блокировку записи, id выдаются подряд,
+        поэтому они вычисляются по id последней вставленной строки.
+        """
+        items = list(objs)
+        for obj in items:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        if not items:
+            return []
+        names = ', '.join(self.fields.keys())
+        param = ', '.join("?" * len(self.fields))
+        with self.manager.transaction() as con:
+            con.executemany(
+                f'INSERT INTO {self.table_name} ({names}) VALUES ({param})',
+                (self._values(obj) for obj in items)
             )
-            res = cur.fetchall()
-        con.close()
-        if not res:
-            obj = None
-        else:
-            res = res[0]
-            kwargs = dict(zip(self.fields, res[1:]))
-            obj = self.obj_cls(**kwargs)
+            last = con.execute('SELECT last_insert_rowid()').fetchone()[0]
+        first = last - len(items) + 1
+        for pk, obj in enumerate(items, start=first):
             obj.pk = pk
-        return obj
+        return list(range(first, last + 1))
+
+    def _values(self, obj: T) -> list[Any]:
+        """ Значения полей объекта в виде для записи в таблицу """
+        return [getattr(obj, name) if encode is None else encode(getattr(obj, name))
+                for name, encode in self._encoders]
+
+    def get(self, pk: int) -> T | None:
+        """ Получить объект по id """
+        con = self.manager.connection()
+        res = con.execute(
+            f'SELECT * FROM {self.table_name} WHERE pk = ?', (pk,)
+        ).fetchone()
+        if res is None:
+            return None
+        return self._make(res)
 
     def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
         """
         Получить все записи по некоторому условию
         """
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            if where is None:
-                res_s = cur.execute(f'SELECT * FROM {self.table_name}').fetchall()
+        return self.find(Query(where or {}))
+
+    def find(self, query: Query) -> list[T]:
+        """
+        Получить записи, удовлетворяющие запросу. Запрос транслируется
+        в параметризованный SQL, значения сравниваются точно.
+        """
+        sql, params = self._compile(query)
+        res_s = self.manager.connection().execute(
+            f'SELECT * FROM {self.table_name}{sql}', params).fetchall()
+        return [self._make(res) for res in res_s]
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        """
+        Перебрать записи пачками по batch_size с постраничной выборкой
+        по id (WHERE pk > последний id). Между пачками курсор закрыт,
+        поэтому соединение не занято, пока вызывающий код обрабатывает записи.
+        """
+        conditions = to_query(where).where
+        last_pk = 0
+        while True:
+            sql, params = self._compile(
+                Query((*conditions, Condition('pk', '>', last_pk)),
+                      order_by=['pk'], limit=batch_size))
+            cur = self.manager.connection().execute(
+                f'SELECT * FROM {self.table_name}{sql}', params)
+            rows = cur.fetchmany(batch_size)
+            cur.close()
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            batch = [self._make(row) for row in rows]
+            yield from batch
+            if len(batch) < batch_size:
+                return
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        """
+        Вычислить агрегатные функции одним запросом с GROUP BY,
+        не создавая объектов модели. Ключи группировки и результаты
+        min и max по полям с кодеком (датам) преобразуются обратно
+        в значения полей.
+        """
+        check_aggregates(aggregates)
+        groups = [self._group_sql(spec) for spec in group_by]
+        funcs = [f'{func.upper()}({"*" if name == "*" else self._column(name)})'
+                 for func, name in aggregates.values()]
+        sql, params = self._where_sql(to_query(where))
+        query = f'SELECT {", ".join(groups + funcs)} FROM {self.table_name}{sql}'
+        if groups:
+            positions = ', '.join(str(i) for i in range(1, len(groups) + 1))
+            query += f' GROUP BY {positions} ORDER BY {positions}'
+        names = [*group_by, *aggregates]
+        # столбцы со значениями полей: ключи группировки без усечения, min и max
+        columns = [name if part is None else None
+                   for name, part in map(split_group, group_by)]
+        columns += [name if func in ('min', 'max') else None
+                    for func, name in aggregates.values()]
+        decoders = [(i, self._codecs[name].decode) for i, name in enumerate(columns)
+                    if name in self._codecs]
+        rows = self.manager.connection().execute(query, params).fetchall()
+        if decoders:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i, decode in decoders:
+                    row[i] = decode(row[i])
+        return [dict(zip(names, row)) for row in rows]
+
+    def _group_sql(self, spec: str) -> str:
+        name, part = split_group(spec)
+        col = self._column(name)
+        if part is None:
+            return col
+        codec = self._codecs.get(name)
+        time_sql = col if codec is None else codec.time_sql.format(col=col)
+        return f"strftime('{DATE_PARTS[part]}', {time_sql})"
+
+    def _column(self, name: str) -> str:
+        if name != 'pk' and name not in self.fields:
+            raise ValueError(f'unknown field {name!r} for table {self.table_name}')
+        return f'"{name}"'
+
+    def _condition_sql(self, cond: Condition) -> tuple[str, list[Any]]:
+        col = self._column(cond.field)
+        codec = self._codecs.get(cond.field)
+        if codec is not None:
+            if cond.op in ('between', 'in'):
+                value: Any = tuple(codec.encode(v) for v in cond.value)
             else:
-                fields = " AND ".join([f"{f} LIKE ?" for f in where.keys()])
-                res_s = cur.execute(
-                    f'SELECT * FROM {self.table_name} ' + f'WHERE {fields}',
-                    list(where.values())).fetchall()
-        obj_s = []
-        for res in res_s:
-            kwargs = dict(zip(self.fields, res[1:]))
-            obj = self.obj_cls(**kwargs)
-            obj.pk = res[0]
-            obj_s.append(obj)
-        return obj_s
+                value = codec.encode(cond.value)
+            cond = Condition(cond.field, cond.op, value)
+        if cond.op == '=':
+            if cond.value is None:
+                return f'{col} IS NULL', []
+            return f'{col} = ?', [cond.value]
+        if cond.op == 'between':
+            return f'{col} BETWEEN ? AND ?', list(cond.value)
+        if cond.op == 'in':
+            if not cond.value:
+                return '0', []
+            return f'{col} IN ({", ".join("?" * len(cond.value))})', list(cond.value)
+        return f'{col} {cond.op} ?', [cond.value]
+
+    def _where_sql(self, query: Query) -> tuple[str, list[Any]]:
+        """ Часть WHERE запроса и ее параметры """
+        if not query.where:
+            return '', []
+        parts, params = [], []
+        for cond in query.where:
+            sql, cond_params = self._condition_sql(cond)
+            parts.append(sql)
+            params.extend(cond_params)
+        return ' WHERE ' + ' AND '.join(parts), params
+
+    def _compile(self, query: Query) -> tuple[str, list[Any]]:
+        """ Части WHERE, ORDER BY, LIMIT и OFFSET запроса и их параметры """
+        sql, params = self._where_sql(query)
+        if query.order_by:
+            sql += ' ORDER BY ' + ', '.join(
+                self._column(name.lstrip('-')) + (' DESC' if name.startswith('-') else '')
+                for name in query.order_by)
+        if query.limit is not None or query.offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if query.limit is None else query.limit, query.offset]
+        return sql, params
+
+    def get_descendants(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        """
+        Все потомки записи pk в иерархии, заданной полем parent_field,
+        в порядке обхода в глубину (братья - по возрастанию id).
+        Выбираются одним рекурсивным запросом по индексу на parent_field.
+        """
+        parent = self._column(parent_field)
+        rows = self.manager.connection().execute(
+            f'WITH RECURSIVE sub(pk) AS ('
+            f'SELECT pk FROM {self.table_name} WHERE {parent} = ? '
+            f'UNION SELECT t.pk FROM {self.table_name} AS t '
+            f'JOIN sub ON t.{parent} = sub.pk) '
+            f'SELECT * FROM {self.table_name} WHERE pk IN sub AND pk != ? '
+            f'ORDER BY pk', (pk, pk)).fetchall()
+        children: dict[Any, list[T]] = {}
+        for obj in map(self._make, rows):
+            children.setdefault(getattr(obj, parent_field), []).append(obj)
+        result = []
+        stack = list(reversed(children.get(pk, [])))
+        while stack:
+            obj = stack.pop()
+            result.append(obj)
+            stack.extend(reversed(children.get(obj.pk, [])))
+        return result
+
+    def get_ancestors(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        """
+        Предки записи pk в иерархии, заданной полем parent_field,
+        от родителя до записи верхнего уровня. Выбираются одним
+        рекурсивным запросом; порядок восстанавливается по ссылкам.
+        """
+        parent = self._column(parent_field)
+        rows = self.manager.connection().execute(
+            f'WITH RECURSIVE up(pk) AS (VALUES (?) '
+            f'UNION SELECT t.{parent} FROM {self.table_name} AS t '
+            f'JOIN up ON t.pk = up.pk) '
+            f'SELECT * FROM {self.table_name} WHERE pk IN up', (pk,)).fetchall()
+        by_pk = {obj.pk: obj for obj in map(self._make, rows)}
+        result: list[T] = []
+        node = by_pk.pop(pk, None)
+        while node is not None:
+            node = by_pk.pop(getattr(node, parent_field), None)
+            if node is not None:
+                result.append(node)
+        return result
+
+    def subtree_totals(self, facts: 'SQLiteRepository[Any]', field: str,
+                       amount: str, where: Query | dict[str, Any] | None = None
+                       ) -> dict[int, tuple[int, int]]:
+        """
+        Суммы поля amount записей facts (из того же файла базы данных),
+        отобранных условием where и ссылающихся полем field на записи
+        этого репозитория. Возвращает {id: (сумма по самой записи, сумма
+        по записи и всем ее потомкам)} для записей с ненулевым числом
+        слагаемых. Считается одним запросом: суммы по записям соединяются
+        с таблицей замыкания и группируются по предку.
+        """
+        if self.closure_parent is None:
+            raise ValueError(f'table {self.table_name} has no closure table')
+        closure = sqlite_schema.closure_table(self.table_name)
+        sql, params = facts._where_sql(to_query(where))
+        rows = self.manager.connection().execute(
+            f'WITH own(pk, total) AS ('
+            f'SELECT {facts._column(field)}, SUM({facts._column(amount)}) '
+            f'FROM {facts.table_name}{sql} GROUP BY 1) '
+            f'SELECT c.ancestor, SUM(CASE WHEN c.depth = 0 THEN own.total END), '
+            f'SUM(own.total) '
+            f'FROM own JOIN {closure} AS c ON c.descendant = own.pk '
+            f'GROUP BY c.ancestor', params)
+        return {pk: (own or 0, total) for pk, own, total in rows}
 
     def update(self, obj: T) -> None:
         """ Заменить объект по id """
@@ -90,22 +318,64 @@ class SQLiteRepository(AbstractRepository[T]):
             raise ValueError('attempt to update object with unknown primary key')
 
         fields = ", ".join([f"{f}=?" for f in self.fields.keys()])
-        values = [getattr(obj, f) for f in self.fields]
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute(
-                f'UPDATE {self.table_name} SET {fields} WHERE ROWID=={obj.pk}', values
+        values = self._values(obj)
+        with self.manager.transaction() as con:
+            con.execute(
+                f'UPDATE {self.table_name} SET {fields} WHERE pk = ?', [*values, obj.pk]
+            )
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        """ Заменить объекты по id одной транзакцией """
+        items = list(objs)
+        if any(obj.pk == 0 for obj in items):
+            raise ValueError('attempt to update object with unknown primary key')
+        fields = ", ".join([f"{f}=?" for f in self.fields.keys()])
+        with self.manager.transaction() as con:
+            con.executemany(
+                f'UPDATE {self.table_name} SET {fields} WHERE pk = ?',
+                ([*self._values(obj), obj.pk] for obj in items)
             )
-        con.close()
 
     def delete(self, pk: int) -> None:
         """ Удалить объект по id """
         if pk == 0:
             raise ValueError('attempt to delete object with unknown primary key')
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute(f'DELETE FROM {self.table_name} WHERE pk = {pk}')
+        with self.manager.transaction() as con:
+            cur = con.execute(f'DELETE FROM {self.table_name} WHERE pk = ?', (pk,))
             deleted_count = cur.rowcount
-        con.close()
         if deleted_count == 0:
-            raise KeyError
\ No newline at end of file
+            raise KeyError(pk)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        """
+        Удалить объекты по id одной транзакцией. Если хотя бы один
+        объект не найден, ни один объект не удаляется.
+        """
+        pk_list = list(dict.fromkeys(pks))
+        if 0 in pk_list:
+            raise ValueError('attempt to delete object with unknown primary key')
+        with self.manager.transaction() as con:
+            cur = con.executemany(
+                f'DELETE FROM {self.table_name} WHERE pk = ?', ((pk,) for pk in pk_list)
+            )
+            if cur.rowcount != len(pk_list):
+                raise KeyError(pk_list)
+
+    def transaction(self) -> AbstractContextManager[sqlite3.Connection]:
+        """
+        Транзакция менеджера соединений. Все репозитории, использующие
+        тот же менеджер, внутри блока работают в этой же транзакции.
+        """
+        return self.manager.transaction()
+
+    def data_version(self) -> int | None:
+        """
+        PRAGMA data_version соединения текущего потока: меняется после
+        фиксации изменений другими соединениями с тем же файлом
+        """
+        res = self.manager.connection().execute('PRAGMA data_version').fetchone()
+        return int(res[0])
+
+    def write_version(self) -> int | None:
+        """ Количество фиксаций транзакций через общий менеджер соединений """
+        return self.manager.commits
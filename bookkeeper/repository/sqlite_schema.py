@@ -0,0 +1,221 @@
+"""
+Модуль описывает схему таблиц репозитория SQLite: типы столбцов,
+индексы и версионные миграции
+
+Типы столбцов выводятся из аннотаций модели. Индексы задаются декларативно
+для каждой модели (по имени таблицы) в словаре MODEL_INDEXES, иерархические
+модели с таблицей замыкания (closure table) - в словаре MODEL_CLOSURES. Версия схемы
+каждой таблицы хранится в таблице schema_version. Таблицы, созданные
+до появления версий, считаются таблицами версии 1 и при открытии
+обновляются на месте последовательным применением миграций.
+"""
+
+import sqlite3
+from typing import Any, Callable, Iterable, Sequence
+
+from bookkeeper.repository.sqlite_codecs import CODECS, base_type, field_codecs
+
+Migration = Callable[[sqlite3.Connection, str, dict[str, Any]], None]
+
+SQL_TYPES: dict[type, str] = {
+    bool: 'INTEGER',
+    int: 'INTEGER',
+    float: 'REAL',
+    str: 'TEXT',
+    bytes: 'BLOB',
+}
+
+MODEL_INDEXES: dict[str, tuple[tuple[str, ...], ...]] = {
+    'category': (('parent',),),
+    'expense': (('category',), ('expense_date',)),
+}
+
+# таблица -> поле со ссылкой на родителя
+MODEL_CLOSURES: dict[str, str] = {
+    'category': 'parent',
+}
+
+
+def sql_type(annotation: Any) -> str:
+    """
+    Получить тип столбца SQLite по аннотации поля.
+    Для необязательных полей (X | None) используется тип X, для типов,
+    хранимых через кодеки (даты), - тип кодека, для неизвестных типов
+    возвращается пустая строка (без приведения типа).
+    """
+    annotation = base_type(annotation)
+    if annotation in CODECS:
+        return CODECS[annotation].sql_type
+    if isinstance(annotation, type):
+        for cls in annotation.__mro__:
+            if cls in SQL_TYPES:
+                return SQL_TYPES[cls]
+    return ''
+
+
+def column_defs(fields: dict[str, Any]) -> str:
+    """ Описания столбцов таблицы для CREATE TABLE """
+    cols = ', '.join(f'"{name}" {sql_type(ann)}'.rstrip()
+                     for name, ann in fields.items())
+    return f'"pk" INTEGER PRIMARY KEY AUTOINCREMENT, {cols}'
+
+
+def create_table(con: sqlite3.Connection, table: str, fields: dict[str, Any]) -> None:
+    """ Создать таблицу текущей версии схемы """
+    con.execute(f'CREATE TABLE {table} ({column_defs(fields)})')
+
+
+def rebuild_table(con: sqlite3.Connection, table: str, fields: dict[str, Any],
+                  exprs: dict[str, str] | None = None) -> None:
+    """
+    Пересоздать таблицу по текущему описанию полей, сохранив данные
+    и счетчик id. exprs - SQL-выражения для преобразования значений
+    отдельных столбцов при копировании (по умолчанию значение копируется).
+    """
+    exprs = exprs or {}
+    tmp = f'{table}__new'
+    seq = con.execute('SELECT seq FROM sqlite_sequence WHERE name = ?',
+                      (table,)).fetchone()
+    con.execute(f'CREATE TABLE {tmp} ({column_defs(fields)})')
+    names = ', '.join(f'"{name}"' for name in fields)
+    values = ', '.join(exprs.get(name, f'"{name}"') for name in fields)
+    con.execute(f'INSERT INTO {tmp} ("pk", {names}) SELECT "pk", {values} FROM {table}')
+    con.execute(f'DROP TABLE {table}')
+    con.execute(f'ALTER TABLE {tmp} RENAME TO {table}')
+    if seq is not None:
+        con.execute('UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?',
+                    (seq[0], table))
+
+
+def _typed_columns(con: sqlite3.Connection, table: str, fields: dict[str, Any]) -> None:
+    """ 1 -> 2: столбцы без типа заменяются типизированными """
+    rebuild_table(con, table, fields)
+
+
+def _integer_dates(con: sqlite3.Connection, table: str, fields: dict[str, Any]) -> None:
+    """ 2 -> 3: даты, сохраненные строками ISO, переводятся в целые числа """
+    codecs = field_codecs(fields)
+    if not codecs:
+        return
+    exprs = {}
+    for name, codec in codecs.items():
+        col = f'"{name}"'
+        exprs[name] = (f"CASE WHEN typeof({col}) = 'text' "
+                       f"THEN {codec.from_text_sql.format(col=col)} ELSE {col} END")
+    rebuild_table(con, table, fields, exprs)
+
+
+MIGRATIONS: list[Migration] = [
+    _typed_columns,
+    _integer_dates,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS) + 1
+
+
+def index_name(table: str, columns: Sequence[str]) -> str:
+    """ Имя индекса по таблице и столбцам """
+    return f'idx_{table}_{"_".join(columns)}'
+
+
+def get_version(con: sqlite3.Connection, table: str) -> int:
+    """ Версия схемы таблицы; для таблиц без записи о версии - 1 """
+    res = con.execute('SELECT version FROM schema_version WHERE table_name = ?',
+                      (table,)).fetchone()
+    return 1 if res is None else int(res[0])
+
+
+def ensure_schema(con: sqlite3.Connection, table: str, fields: dict[str, Any],
+                  indexes: Iterable[Sequence[str]] = ()) -> None:
+    """
+    Привести таблицу к текущей версии схемы: создать ее, если она
+    не существует, иначе применить недостающие миграции; создать индексы.
+    Должна вызываться внутри транзакции.
+    """
+    con.execute('CREATE TABLE IF NOT EXISTS schema_version '
+                '(table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND lower(name) = ?",
+        (table,)).fetchone()
+    if exists is None:
+        create_table(con, table, fields)
+        version = 0
+    else:
+        version = get_version(con, table)
+        for migration in MIGRATIONS[version - 1:]:
+            migration(con, table, fields)
+    if version != SCHEMA_VERSION:
+        con.execute('INSERT OR REPLACE INTO schema_version VALUES (?, ?)',
+                    (table, SCHEMA_VERSION))
+    for columns in indexes:
+        cols = ', '.join(f'"{col}"' for col in columns)
+        con.execute(f'CREATE INDEX IF NOT EXISTS {index_name(table, columns)} '
+                    f'ON {table} ({cols})')
+
+
+def closure_table(table: str) -> str:
+    """ Имя таблицы замыкания для иерархической таблицы """
+    return f'{table}_closure'
+
+
+def ensure_closure(con: sqlite3.Connection, table: str, parent: str) -> None:
+    """
+    Создать таблицу замыкания (ancestor, descendant, depth) для иерархии
+    table по полю parent и триггеры, которые поддерживают ее при добавлении,
+    удалении и смене родителя записей. В таблице есть пара (запись, запись)
+    глубины 0 и пары с каждым предком. Подкатегории удаленной записи,
+    как и записи с несуществующим родителем, становятся корнями.
+    Перенос записи внутрь ее поддерева вызывает sqlite3.IntegrityError.
+    При создании таблица заполняется по существующим записям.
+    Должна вызываться внутри транзакции.
+    """
+    closure = closure_table(table)
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (closure,)).fetchone()
+    if exists is None:
+        con.execute(f'CREATE TABLE {closure} (ancestor INTEGER NOT NULL, '
+                    f'descendant INTEGER NOT NULL, depth INTEGER NOT NULL, '
+                    f'PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID')
+        con.execute(f'CREATE INDEX {index_name(closure, ["descendant"])} '
+                    f'ON {closure} (descendant)')
+        con.execute(
+            f'INSERT INTO {closure} '
+            f'WITH RECURSIVE up(ancestor, descendant, depth) AS ('
+            f'SELECT pk, pk, 0 FROM {table} '
+            f'UNION ALL SELECT up.ancestor, t.pk, up.depth + 1 FROM {table} AS t '
+            f'JOIN up ON t."{parent}" = up.descendant) '
+            f'SELECT * FROM up')
+    subtree = f'SELECT descendant FROM {closure} WHERE ancestor = NEW.pk'
+    con.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_insert AFTER INSERT ON {table} '
+        f'BEGIN '
+        f'INSERT INTO {closure} SELECT NEW.pk, NEW.pk, 0 '
+        f'UNION ALL SELECT ancestor, NEW.pk, depth + 1 FROM {closure} '
+        f'WHERE descendant = NEW."{parent}"; '
+        f'END')
+    con.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_delete AFTER DELETE ON {table} '
+        f'BEGIN '
+        f'DELETE FROM {closure} '
+        f'WHERE descendant IN (SELECT descendant FROM {closure} '
+        f'WHERE ancestor = OLD.pk) '
+        f'AND ancestor IN (SELECT ancestor FROM {closure} WHERE descendant = OLD.pk); '
+        f'END')
+    con.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_check BEFORE UPDATE OF "{parent}" '
+        f'ON {table} WHEN NEW."{parent}" IN ({subtree}) '
+        f'BEGIN '
+        f"SELECT RAISE(ABORT, 'cannot move a record into its own subtree'); "
+        f'END')
+    con.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_move AFTER UPDATE OF "{parent}" '
+        f'ON {table} WHEN OLD."{parent}" IS NOT NEW."{parent}" '
+        f'BEGIN '
+        f'DELETE FROM {closure} WHERE descendant IN ({subtree}) '
+        f'AND ancestor NOT IN ({subtree}); '
+        f'INSERT INTO {closure} '
+        f'SELECT up.ancestor, down.descendant, up.depth + down.depth + 1 '
+        f'FROM {closure} AS up JOIN {closure} AS down '
+        f'ON up.descendant = NEW."{parent}" AND down.ancestor = NEW.pk; '
+        f'END')
@@ -0,0 +1,320 @@
+"""
+Модуль описывает репозиторий SQLite с отложенной записью (write-behind)
+
+Операции add, update и delete не выполняются сразу, а копятся в буфере
+и записываются пакетом в одной транзакции, когда в буфере набирается
+batch_size операций, когда с первой из них прошло flush_interval секунд,
+при явном вызове flush, а также при закрытии репозитория (close или выход
+из блока with). id новым объектам выдаются сразу, по счетчику, начатому
+со следующего после наибольшего id таблицы, поэтому репозиторий должен
+быть единственным, кто добавляет записи в свою таблицу.
+
+Несколько операций над одним объектом в буфере объединяются: например,
+добавление и последующее удаление не записываются вовсе. get учитывает
+буфер, остальные методы чтения сначала записывают буфер в базу.
+
+Окно потери данных при сбое ограничено flush_interval только при
+background=True: тогда буфер записывается фоновым потоком. Без него
+интервал проверяется при очередной операции записи.
+
+Если пакет не удается записать из-за ошибки в отдельных операциях
+(например, нарушения ограничения), операции записываются по одной,
+каждая в своей точке сохранения общей транзакции: успешные фиксируются,
+ошибочные удаляются из буфера и попадают в список rejected, а flush
+поднимает первую из ошибок. Если не удается начать или зафиксировать
+саму транзакцию (например, база заблокирована), буфер сохраняется
+для следующей попытки.
+
+Внутри transaction() операции выполняются сразу, в общей транзакции.
+
+update и delete записи, которой нет (в том числе удаленной в буфере),
+вызывают KeyError. После закрытия репозитория операции записи вызывают
+ValueError, как запись в закрытый файл: их уже некому было бы записать.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from types import TracebackType
+from typing import Any, Iterable, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import T
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+class WriteBehindSQLiteRepository(SQLiteRepository[T]):
+    """
+    Репозиторий SQLite с отложенной записью.
+    batch_size - количество операций в буфере, при котором он записывается
+    flush_interval - максимальное время (в секундах) хранения операций в буфере
+    background - записывать буфер по истечении flush_interval фоновым потоком
+    После использования репозиторий нужно закрыть методом close
+    или использовать его как контекстный менеджер.
+    В rejected копятся пары (id, ошибка) для операций, удаленных
+    из буфера, так как их не удалось записать.
+    """
+
+    def __init__(self, db_file: str, cls: type,
+                 manager: ConnectionManager | None = None,
+                 indexes: Iterable[Sequence[str]] | None = None,
+                 batch_size: int = 1000, flush_interval: float = 1.0,
+                 background: bool = False) -> None:
+        super().__init__(db_file, cls, manager, indexes)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # id -> значения полей для записи или None для удаления
+        self._pending: dict[int, list[Any] | None] = {}
+        self._new: set[int] = set()
+        self._next_pk: int | None = None
+        self._first_at = 0.0
+        self.rejected: list[tuple[int, sqlite3.Error]] = []
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._thread: threading.Thread | None = None
+        if background:
+            self._thread = threading.Thread(target=self._background, daemon=True,
+                                            name='bookkeeper-write-behind')
+            self._thread.start()
+
+    def _background(self) -> None:
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                if self._pending and self._expired():
+                    try:
+                        self.flush()
+                    except sqlite3.Error:
+                        # ошибочные операции уже в rejected,
+                        # остальные будут записаны при следующей попытке
+                        pass
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._first_at >= self.flush_interval
+
+    def _allocate_pk(self) -> int:
+        if self._next_pk is None:
+            con = self.manager.connection()
+            seq = con.execute('SELECT seq FROM sqlite_sequence WHERE name = ?',
+                              (self.table_name,)).fetchone()
+            top = con.execute(f'SELECT max(pk) FROM {self.table_name}').fetchone()[0]
+            self._next_pk = max(seq[0] if seq else 0, top or 0) + 1
+        pk = self._next_pk
+        self._next_pk += 1
+        return pk
+
+    def _enqueue(self, pk: int, values: list[Any] | None) -> None:
+        if not self._pending:
+            self._first_at = time.monotonic()
+        if values is None and pk in self._new:
+            self._new.discard(pk)
+            self._pending.pop(pk, None)
+        else:
+            self._pending[pk] = values
+        if len(self._pending) >= self.batch_size or self._expired():
+            self.flush()
+
+    def _check_open(self) -> None:
+        if self._closed.is_set():
+            raise ValueError('write-behind repository is closed')
+
+    def _exists(self, pk: int) -> bool:
+        if pk in self._pending:
+            return self._pending[pk] is not None
+        return self.manager.connection().execute(
+            f'SELECT 1 FROM {self.table_name} WHERE pk = ?', (pk,)
+        ).fetchone() is not None
+
+    def _statements(self) -> tuple[str, str, str]:
+        """ Запросы удаления, вставки и изменения записи """
+        names = ', '.join(self.fields)
+        params = ', '.join('?' * (len(self.fields) + 1))
+        sets = ', '.join(f'{name}=?' for name in self.fields)
+        return (f'DELETE FROM {self.table_name} WHERE pk = ?',
+                f'INSERT INTO {self.table_name} (pk, {names}) VALUES ({params})',
+                f'UPDATE {self.table_name} SET {sets} WHERE pk = ?')
+
+    def _params(self, pk: int, values: list[Any] | None) -> list[Any]:
+        if values is None:
+            return [pk]
+        return [pk, *values] if pk in self._new else [*values, pk]
+
+    def flush(self) -> None:
+        """
+        Записать операции из буфера в базу одной транзакцией.
+        При ошибке записи пакета ошибочные операции отбрасываются
+        (см. rejected), остальные записываются, и поднимается первая ошибка.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            groups: tuple[list[Any], list[Any], list[Any]] = ([], [], [])
+            for pk, values in self._pending.items():
+                kind = 0 if values is None else 1 if pk in self._new else 2
+                groups[kind].append(self._params(pk, values))
+            statements = self._statements()
+            try:
+                with self.manager.transaction() as con:
+                    for sql, rows in zip(statements, groups):
+                        con.executemany(sql, rows)
+                errors = []
+            except sqlite3.Error:
+                errors = self._write_each(statements)
+            self._pending.clear()
+            self._new.clear()
+            if errors:
+                self.rejected.extend(errors)
+                error = errors[0][1]
+                error.add_note('write-behind: dropped operations on pk '
+                               + ', '.join(str(pk) for pk, _ in errors))
+                raise error
+
+    def _write_each(self, statements: tuple[str, str, str]
+                    ) -> list[tuple[int, sqlite3.Error]]:
+        """
+        Записать операции буфера по одной, каждую в своей точке сохранения.
+        Возвращает ошибочные операции
+        """
+        errors = []
+        with self.manager.transaction():
+            for pk, values in self._pending.items():
+                kind = 0 if values is None else 1 if pk in self._new else 2
+                try:
+                    with self.manager.transaction() as con:
+                        con.execute(statements[kind], self._params(pk, values))
+                except sqlite3.Error as error:
+                    errors.append((pk, error))
+        return errors
+
+    def add(self, obj: T) -> int:
+        self._check_open()
+        if self.manager.in_transaction():
+            self.flush()
+            self._next_pk = None
+            return super().add(obj)
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        with self._lock:
+            pk = self._allocate_pk()
+            self._new.add(pk)
+            obj.pk = pk
+            self._enqueue(pk, self._values(obj))
+        return pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        self._check_open()
+        if self.manager.in_transaction():
+            self.flush()
+            self._next_pk = None
+            return super().add_many(objs)
+        items = list(objs)
+        for obj in items:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        return [self.add(obj) for obj in items]
+
+    def update(self, obj: T) -> None:
+        self.update_many([obj])
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        self._check_open()
+        items = list(objs)
+        if any(obj.pk == 0 for obj in items):
+            raise ValueError('attempt to update object with unknown primary key')
+        with self._lock:
+            for obj in items:
+                if not self._exists(obj.pk):
+                    raise KeyError(obj.pk)
+            if self.manager.in_transaction():
+                self.flush()
+                super().update_many(items)
+                return
+            for obj in items:
+                self._enqueue(obj.pk, self._values(obj))
+
+    def delete(self, pk: int) -> None:
+        self._check_open()
+        if self.manager.in_transaction():
+            self.flush()
+            super().delete(pk)
+            return
+        if pk == 0:
+            raise ValueError('attempt to delete object with unknown primary key')
+        with self._lock:
+            if not self._exists(pk):
+                raise KeyError(pk)
+            self._enqueue(pk, None)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        self._check_open()
+        pk_list = list(dict.fromkeys(pks))
+        if 0 in pk_list:
+            raise ValueError('attempt to delete object with unknown primary key')
+        with self._lock:
+            for pk in pk_list:
+                if not self._exists(pk):
+                    raise KeyError(pk)
+            for pk in pk_list:
+                self.delete(pk)
+
+    def get(self, pk: int) -> T | None:
+        with self._lock:
+            if pk in self._pending:
+                values = self._pending[pk]
+                return None if values is None else self._make([pk, *values])
+        return super().get(pk)
+
+    def find(self, query: Query) -> list[T]:
+        self.flush()
+        return super().find(query)
+
+    def iter_all(self, where: Query | dict[str, Any] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        self.flush()
+        return super().iter_all(where, batch_size)
+
+    def aggregate(self, group_by: Sequence[str],
+                  aggregates: dict[str, tuple[str, str]],
+                  where: Query | dict[str, Any] | None = None
+                  ) -> list[dict[str, Any]]:
+        self.flush()
+        return super().aggregate(group_by, aggregates, where)
+
+    def get_descendants(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        self.flush()
+        return super().get_descendants(pk, parent_field)
+
+    def get_ancestors(self, pk: int, parent_field: str = 'parent') -> list[T]:
+        self.flush()
+        return super().get_ancestors(pk, parent_field)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Транзакция менеджера соединений. Буфер записывается перед ее началом,
+        операции внутри нее выполняются сразу.
+        """
+        self.flush()
+        with self.manager.transaction() as con:
+            yield con
+
+    def data_version(self) -> int | None:
+        self.flush()
+        return super().data_version()
+
+    def close(self) -> None:
+        """ Записать буфер и остановить фоновый поток """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self) -> 'WriteBehindSQLiteRepository[T]':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
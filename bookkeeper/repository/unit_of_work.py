@@ -0,0 +1,50 @@
+"""
+Модуль описывает единицу работы (Unit of Work) - транзакцию,
+охватывающую несколько репозиториев
+
+Пример:
+    with UnitOfWork(category_repo, expense_repo):
+        category_repo.delete(pk)
+        expense_repo.delete_many(expense_pks)
+
+Изменения всех репозиториев фиксируются один раз при выходе из блока
+и отменяются, если внутри блока возникло исключение. Репозитории SQLite,
+работающие с одним файлом, внутри блока используют одно соединение
+и одну транзакцию.
+"""
+
+from contextlib import ExitStack
+from types import TracebackType
+from typing import Any
+
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+
+class UnitOfWork:
+    """
+    Контекстный менеджер, объединяющий транзакции нескольких репозиториев
+    """
+
+    def __init__(self, *repos: AbstractRepository[Any]) -> None:
+        self.repos = repos
+        self._stack: ExitStack | None = None
+
+    def __enter__(self) -> 'UnitOfWork':
+        if self._stack is not None:
+            raise RuntimeError('unit of work is already active')
+        stack = ExitStack()
+        try:
+            for repo in self.repos:
+                stack.enter_context(repo.transaction())
+        except BaseException:
+            stack.close()
+            raise
+        self._stack = stack
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> bool:
+        stack, self._stack = self._stack, None
+        assert stack is not None
+        return stack.__exit__(exc_type, exc_value, traceback)
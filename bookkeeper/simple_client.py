@@ -7,8 +7,8 @@ from bookkeeper.models.expense import Expense
 from bookkeeper.repository.memory_repository import MemoryRepository
 from bookkeeper.utils import read_tree
 
-cat_repo = MemoryRepository[Category]()
-exp_repo = MemoryRepository[Expense]()
+cat_repo = MemoryRepository[Category](indexed_fields=('name',))
+exp_repo = MemoryRepository[Expense](indexed_fields=('category',))
 
 cats = '''
 продукты
@@ -32,7 +32,8 @@ while True:
     if cmd == 'категории':
         print(*cat_repo.get_all(), sep='\n')
     elif cmd == 'расходы':
-        print(*exp_repo.get_all(), sep='\n')
+        for exp in exp_repo.iter_all():
+            print(exp)
     elif cmd[0].isdecimal():
         amount, name = cmd.split(maxsplit=1)
         try:
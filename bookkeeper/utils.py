@@ -42,22 +42,42 @@ def read_tree(lines: Iterable[str]) -> list[tuple[str, str | None]]:
     -------
     Список пар "потомок-родитель"
     """
-    parents: list[tuple[str | None, int]] = []
-    last_indent = -1
-    last_name = None
+    path: list[str] = []
     result: list[tuple[str, str | None]] = []
+    for level, name in iter_tree(lines):
+        del path[level:]
+        result.append((name, path[-1] if path else None))
+        path.append(name)
+    return result
+
+
+def iter_tree(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """
+    Лениво прочитать структуру дерева из текста на основе отступов.
+    Выдает пары (уровень, имя) в порядке строк; уровень элементов верхнего
+    уровня - 0, родитель элемента - ближайший предыдущий элемент уровнем
+    выше. В памяти хранятся только отступы открытых уровней, поэтому
+    функция подходит для файлов любого размера. Пустые строки игнорируются,
+    ошибки отступов - как в read_tree.
+
+    Parameters
+    ----------
+    lines - Итерируемый объект, содержащий строки текста (файл или список строк)
+
+    Yields
+    -------
+    Пары (уровень, имя)
+    """
+    indents: list[int] = []
     for i, (indent, name) in enumerate(_lines_with_indent(lines)):
-        if indent > last_indent:
-            parents.append((last_name, last_indent))
-        elif indent < last_indent:
-            while indent < last_indent:
-                _, last_indent = parents.pop()
-            if indent != last_indent:
+        if indents and indent < indents[-1]:
+            while indents and indent < indents[-1]:
+                indents.pop()
+            if not indents or indent != indents[-1]:
                 raise IndentationError(
                     f'unindent does not match any outer indentation '
                     f'level in line {i}:\n'
                 )
-        result.append((name, parents[-1][0]))
-        last_name = name
-        last_indent = indent
-    return result
+        elif not indents or indent > indents[-1]:
+            indents.append(indent)
+        yield len(indents) - 1, name
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.generator import (
+    batches, category_tree_lines, generate_expenses, main, populate, write_batches
+)
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import read_tree
+
+
+def test_category_tree_lines():
+    tree = read_tree(category_tree_lines(depth=3, fanout=2))
+    assert len(tree) == 2 + 4 + 8
+    assert tree[:3] == [('категория 1', None),
+                        ('категория 1.1', 'категория 1'),
+                        ('категория 1.1.1', 'категория 1.1')]
+    assert len({name for name, _ in tree}) == len(tree)
+
+
+def test_expenses_are_deterministic():
+    first = list(generate_expenses(100, [1, 2, 3], seed=5))
+    second = list(generate_expenses(100, [1, 2, 3], seed=5))
+    other = list(generate_expenses(100, [1, 2, 3], seed=6))
+    assert first == second
+    assert first != other
+
+
+def test_expenses_distribution():
+    start, end = datetime(2023, 1, 1), datetime(2023, 2, 1)
+    exps = list(generate_expenses(10_000, [10, 20, 30], start=start, end=end))
+    dates = [e.expense_date for e in exps]
+    assert dates == sorted(dates)
+    assert start <= dates[0] and dates[len(dates) // 2] < end
+    assert all(e.added_date >= e.expense_date for e in exps)
+    assert {e.category for e in exps} == {10, 20, 30}
+    amounts = sorted(e.amount for e in exps)
+    assert amounts[0] >= 1
+    assert amounts[-1] > 10 * amounts[len(amounts) // 2]
+    assert all(e.pk == 0 for e in exps)
+
+
+def test_expenses_need_categories():
+    with pytest.raises(ValueError):
+        next(generate_expenses(1, []))
+
+
+def test_batches():
+    assert list(batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batches([], 2)) == []
+
+
+def test_write_batches():
+    repo = MemoryRepository[Expense]()
+    assert write_batches(repo, generate_expenses(25, [1]), batch_size=10) == 25
+    assert len(repo.get_all()) == 25
+
+
+def test_populate():
+    cat_repo = MemoryRepository[Category]()
+    exp_repo = MemoryRepository[Expense]()
+    cats = populate(cat_repo, exp_repo, depth=2, fanout=3, expenses=50)
+    assert len(cats) == len(cat_repo.get_all()) == 12
+    pks = {cat.pk for cat in cats}
+    assert all(exp.category in pks for exp in exp_repo.get_all())
+
+
+def test_main_writes_sqlite(tmp_path):
+    db_file = str(tmp_path / 'ledger.db')
+    main(['--db', db_file, '--depth', '2', '--fanout', '2', '--expenses', '30',
+          '--batch-size', '7'])
+    assert len(SQLiteRepository[Category](db_file, Category).get_all()) == 6
+    assert len(SQLiteRepository[Expense](db_file, Expense).get_all()) == 30
+
+
+def test_main_tree_only(capsys):
+    main(['--depth', '2', '--fanout', '2', '--tree-only'])
+    lines = capsys.readouterr().out.splitlines()
+    assert read_tree(lines)[-1] == ('категория 2.2', 'категория 2')
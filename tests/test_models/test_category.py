@@ -7,6 +7,8 @@ import pytest
 
 from bookkeeper.models.category import Category
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import read_tree
 
 
 @pytest.fixture
@@ -106,3 +108,63 @@ def test_create_from_tree_error(repo):
     tree = [('1', 'parent'), ('parent', None)]
     with pytest.raises(KeyError):
         Category.create_from_tree(tree, repo)
+
+
+def test_create_from_tree_deep(repo):
+    tree = [('0', None), ('1', '0'), ('2', '1'), ('3', '0'), ('4', None)]
+    cats = Category.create_from_tree(tree, repo)
+    by_name = {c.name: c for c in cats}
+    assert by_name['1'].parent == by_name['0'].pk
+    assert by_name['2'].parent == by_name['1'].pk
+    assert by_name['3'].parent == by_name['0'].pk
+    assert by_name['4'].parent is None
+    assert repo.get_all() == sorted(cats, key=lambda c: c.pk)
+
+
+def test_hierarchy_in_sqlite(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test.db'), Category)
+    memory = MemoryRepository()
+    tree = [('0', None), ('1', '0'), ('2', '1'), ('3', '1')]
+    Category.create_from_tree(tree, memory)
+    cats = Category.create_from_tree(tree, repo)
+    root, leaf = cats[0], cats[-1]
+    gen = root.get_subcategories(repo)
+    assert isgenerator(gen)
+    assert [c.name for c in gen] == [c.name for c in root.get_subcategories(memory)]
+    assert [c.name for c in leaf.get_all_parents(repo)] == ['1', '0']
+
+
+def test_import_tree(repo):
+    text = '''
+    food
+        meat
+            raw
+        sweets
+            raw
+    books
+    '''
+    assert Category.import_tree(text.splitlines(), repo, batch_size=2) == 6
+    by_pk = {c.pk: c for c in repo.get_all()}
+    paths = set()
+    for c in by_pk.values():
+        names = [c.name] + [p.name for p in c.get_all_parents(repo)]
+        paths.add('/'.join(reversed(names)))
+    assert paths == {'food', 'food/meat', 'food/meat/raw', 'food/sweets',
+                     'food/sweets/raw', 'books'}
+
+
+def test_import_tree_same_as_create_from_tree(tmp_path):
+    text = [f'{"    " * (i % 4)}{i}' for i in range(50)]
+    imported = SQLiteRepository(str(tmp_path / 'a.db'), Category)
+    created = SQLiteRepository(str(tmp_path / 'b.db'), Category)
+    Category.import_tree(iter(text), imported, batch_size=7)
+    Category.create_from_tree(read_tree(text), created)
+    assert imported.get_all() == created.get_all()
+
+
+def test_import_tree_keeps_committed_batches(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test.db'), Category)
+    text = ['a', '    b', '    c', 'd', '    e', '  f']
+    with pytest.raises(IndentationError):
+        Category.import_tree(text, repo, batch_size=3)
+    assert [c.name for c in repo.get_all()] == ['a', 'b', 'c']
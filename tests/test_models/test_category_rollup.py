@@ -0,0 +1,130 @@
+"""
+Тесты для итогов расходов по дереву категорий
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_rollup import rollup
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import read_tree
+
+TREE = '''
+food
+    meat
+        raw meat
+        sausages
+    sweets
+books
+'''
+
+
+def fill(cat_repo, exp_repo):
+    cats = Category.create_from_tree(read_tree(TREE.splitlines()), cat_repo)
+    pk = {c.name: c.pk for c in cats}
+    exp_repo.add_many([
+        Expense(10, pk['food'], datetime(2023, 1, 1)),
+        Expense(20, pk['raw meat'], datetime(2023, 1, 5)),
+        Expense(30, pk['sausages'], datetime(2023, 2, 1)),
+        Expense(40, pk['sweets'], datetime(2023, 1, 10)),
+        Expense(50, pk['books'], datetime(2022, 12, 31)),
+        Expense(60, 100, datetime(2023, 1, 2)),
+    ])
+    return pk
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repos(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRepository[Category](), MemoryRepository[Expense]()
+    db_file = str(tmp_path / 'test.db')
+    return (SQLiteRepository[Category](db_file, Category),
+            SQLiteRepository[Expense](db_file, Expense))
+
+
+def summary(roots):
+    return {node.category.name: (node.own, node.total)
+            for root in roots for node in root.walk()}
+
+
+def test_rollup_all(repos):
+    fill(*repos)
+    roots = rollup(*repos)
+    assert [r.category.name for r in roots] == ['food', 'books']
+    assert [c.category.name for c in roots[0].children] == ['meat', 'sweets']
+    assert summary(roots) == {
+        'food': (10, 100), 'meat': (0, 50), 'raw meat': (20, 20),
+        'sausages': (30, 30), 'sweets': (40, 40), 'books': (50, 50),
+    }
+
+
+def test_rollup_date_range(repos):
+    fill(*repos)
+    roots = rollup(*repos, start=datetime(2023, 1, 1), end=datetime(2023, 2, 1))
+    assert summary(roots) == {
+        'food': (10, 70), 'meat': (0, 20), 'raw meat': (20, 20),
+        'sausages': (0, 0), 'sweets': (40, 40), 'books': (0, 0),
+    }
+
+
+def test_rollup_follows_changes(repos):
+    cat_repo, exp_repo = repos
+    pk = fill(cat_repo, exp_repo)
+    meat = cat_repo.get(pk['meat'])
+    meat.parent = pk['books']
+    cat_repo.update(meat)
+    new = Category('fish', pk['meat'])
+    cat_repo.add(new)
+    exp_repo.add(Expense(5, new.pk, datetime(2023, 1, 1)))
+    cat_repo.delete(pk['food'])
+    assert summary(rollup(cat_repo, exp_repo)) == {
+        'books': (50, 105), 'meat': (0, 55), 'raw meat': (20, 20),
+        'sausages': (30, 30), 'fish': (5, 5), 'sweets': (40, 40),
+    }
+
+
+def test_closure_table(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    cat_repo = SQLiteRepository[Category](db_file, Category)
+    pk = fill(cat_repo, SQLiteRepository[Expense](db_file, Expense))
+    con = cat_repo.manager.connection()
+
+    def ancestors(name):
+        return con.execute('SELECT ancestor, depth FROM category_closure '
+                           'WHERE descendant = ? ORDER BY depth',
+                           (pk[name],)).fetchall()
+
+    assert ancestors('raw meat') == [(pk['raw meat'], 0), (pk['meat'], 1),
+                                     (pk['food'], 2)]
+    food = cat_repo.get(pk['food'])
+    food.parent = pk['sausages']
+    with pytest.raises(sqlite3.IntegrityError):
+        cat_repo.update(food)
+    assert ancestors('food') == [(pk['food'], 0)]
+
+
+def test_closure_backfill(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute('CREATE TABLE category ("pk" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    '"name" TEXT, "parent" INTEGER)')
+        con.executemany('INSERT INTO category (name, parent) VALUES (?, ?)',
+                        [('a', None), ('b', 1), ('c', 2)])
+    con.close()
+    cat_repo = SQLiteRepository[Category](db_file, Category)
+    exp_repo = SQLiteRepository[Expense](db_file, Expense)
+    exp_repo.add(Expense(7, 3))
+    assert cat_repo.subtree_totals(exp_repo, 'category', 'amount') == {
+        1: (0, 7), 2: (0, 7), 3: (7, 7)}
+
+
+def test_subtree_totals_needs_closure(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    exp_repo = SQLiteRepository[Expense](db_file, Expense)
+    with pytest.raises(ValueError):
+        exp_repo.subtree_totals(exp_repo, 'category', 'amount')
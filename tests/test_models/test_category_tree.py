@@ -0,0 +1,157 @@
+"""
+Тесты для индекса дерева категорий
+"""
+import random
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_tree import CategoryTree
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.utils import read_tree
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository[Category]()
+    text = '''
+    food
+        meat
+            raw meat
+            sausages
+        sweets
+    books
+    '''
+    Category.create_from_tree(read_tree(text.splitlines()), repo)
+    return repo
+
+
+@pytest.fixture
+def tree(repo):
+    return CategoryTree.from_repo(repo)
+
+
+def pk(repo, name):
+    return repo.get_all({'name': name})[0].pk
+
+
+def names(cats):
+    return [c.name for c in cats]
+
+
+def test_structure(repo, tree):
+    assert len(tree) == 6
+    assert names(tree.roots()) == ['food', 'books']
+    assert names(tree.children(pk(repo, 'meat'))) == ['raw meat', 'sausages']
+    assert tree.parent(pk(repo, 'meat')).name == 'food'
+    assert tree.parent(pk(repo, 'food')) is None
+    assert tree.depth(pk(repo, 'sausages')) == 2
+    assert pk(repo, 'books') in tree
+    assert tree.get(100) is None
+
+
+def test_ancestors_and_descendants(repo, tree):
+    assert names(tree.ancestors(pk(repo, 'raw meat'))) == ['meat', 'food']
+    assert names(tree.descendants(pk(repo, 'food'))) == [
+        'meat', 'raw meat', 'sausages', 'sweets']
+    assert list(tree.descendants(pk(repo, 'books'))) == []
+
+
+def test_is_descendant(repo, tree):
+    food, meat, raw = pk(repo, 'food'), pk(repo, 'meat'), pk(repo, 'raw meat')
+    assert tree.is_descendant(raw, food)
+    assert tree.is_descendant(meat, food)
+    assert not tree.is_descendant(food, meat)
+    assert not tree.is_descendant(food, food)
+    assert not tree.is_descendant(raw, pk(repo, 'books'))
+
+
+def test_categories_in_any_order(repo):
+    tree = CategoryTree(reversed(repo.get_all()))
+    assert tree.depth(pk(repo, 'raw meat')) == 2
+    assert tree.is_descendant(pk(repo, 'raw meat'), pk(repo, 'food'))
+
+
+def test_add(repo, tree):
+    cat = Category('candy', pk(repo, 'sweets'))
+    repo.add(cat)
+    tree.add(cat)
+    assert tree.depth(cat.pk) == 2
+    assert tree.is_descendant(cat.pk, pk(repo, 'food'))
+    with pytest.raises(ValueError):
+        tree.add(cat)
+
+
+def test_update_moves_subtree(repo, tree):
+    meat = repo.get(pk(repo, 'meat'))
+    meat.parent = pk(repo, 'books')
+    repo.update(meat)
+    tree.update(meat)
+    raw = pk(repo, 'raw meat')
+    assert tree.is_descendant(raw, pk(repo, 'books'))
+    assert not tree.is_descendant(raw, pk(repo, 'food'))
+    assert names(tree.ancestors(raw)) == ['meat', 'books']
+    assert names(tree.children(pk(repo, 'food'))) == ['sweets']
+    meat.parent = None
+    tree.update(meat)
+    assert tree.depth(raw) == 1
+    assert names(tree.roots()) == ['food', 'books', 'meat']
+
+
+def test_update_into_subtree(repo, tree):
+    food = Category('food', pk(repo, 'raw meat'), pk(repo, 'food'))
+    with pytest.raises(ValueError):
+        tree.update(food)
+    assert tree.parent(food.pk) is None
+
+
+def test_delete(repo, tree):
+    tree.delete(pk(repo, 'meat'))
+    assert names(tree.roots()) == ['food', 'books', 'raw meat', 'sausages']
+    assert tree.depth(pk(repo, 'raw meat')) == 0
+    assert names(tree.descendants(pk(repo, 'food'))) == ['sweets']
+    assert not tree.is_descendant(pk(repo, 'raw meat'), pk(repo, 'food'))
+
+
+def test_intervals_follow_changes():
+    rnd = random.Random(1)
+    tree = CategoryTree()
+    pks: list[int] = []
+    for pk in range(1, 401):
+        parent = rnd.choice(pks) if pks and rnd.random() < 0.9 else None
+        tree.add(Category(str(pk), parent, pk))
+        pks.append(pk)
+        if pk % 5 == 0:
+            moved = Category('moved', rnd.choice([None, *pks]), rnd.choice(pks))
+            if moved.parent != moved.pk and (moved.parent is None or not any(
+                    c.pk == moved.pk for c in tree.ancestors(moved.parent))):
+                tree.update(moved)
+        if pk % 7 == 0:
+            tree.delete(pks.pop(rnd.randrange(len(pks))))
+        if pk % 50 == 0:
+            for x in pks:
+                above = {c.pk for c in tree.ancestors(x)}
+                assert [tree.is_descendant(x, y) for y in pks] == [
+                    y in above for y in pks]
+
+
+def test_category_methods_use_tree(repo, tree):
+    raw = repo.get(pk(repo, 'raw meat'))
+    food = repo.get(pk(repo, 'food'))
+    empty = MemoryRepository[Category]()
+    assert names(raw.get_all_parents(empty, tree)) == ['meat', 'food']
+    assert set(names(food.get_subcategories(empty, tree))) == {
+        'meat', 'raw meat', 'sausages', 'sweets'}
+
+
+def test_deep_tree(repo):
+    parent = None
+    for i in range(5000):
+        cat = Category(str(i), parent)
+        parent = repo.add(cat)
+    tree = CategoryTree.from_repo(repo)
+    assert len(list(cat.get_all_parents(repo))) == 4999
+    assert len(list(cat.get_all_parents(repo, tree))) == 4999
+    root = repo.get_all({'name': '0'})[0]
+    assert len(list(root.get_subcategories(repo))) == 4999
+    assert tree.is_descendant(cat.pk, root.pk)
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from bookkeeper.repository.async_repository import (
+    AsyncAbstractRepository, AsyncMemoryRepository, AsyncSQLiteRepository
+)
+from bookkeeper.repository.query import Query
+
+import pytest
+
+
+@dataclass
+class Custom:
+    name: str = 'food'
+    pk: int = 0
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_repo(request, tmp_path):
+    if request.param == 'memory':
+        return AsyncMemoryRepository
+    return lambda: AsyncSQLiteRepository(str(tmp_path / 'test_db.db'), Custom)
+
+
+def run(make_repo, scenario):
+    async def main():
+        repo = make_repo()
+        try:
+            return await scenario(repo)
+        finally:
+            if isinstance(repo, AsyncSQLiteRepository):
+                await repo.close()
+    return asyncio.run(main())
+
+
+def test_cannot_create_abstract_repository():
+    with pytest.raises(TypeError):
+        AsyncAbstractRepository()
+
+
+def test_crud(make_repo):
+    async def scenario(repo):
+        obj = Custom()
+        pk = await repo.add(obj)
+        assert obj.pk == pk
+        assert await repo.get(pk) == obj
+        await repo.update(Custom('new', pk))
+        assert (await repo.get(pk)).name == 'new'
+        await repo.delete(pk)
+        assert await repo.get(pk) is None
+        with pytest.raises(KeyError):
+            await repo.delete(pk)
+    run(make_repo, scenario)
+
+
+def test_batch(make_repo):
+    async def scenario(repo):
+        objects = [Custom(str(i)) for i in range(5)]
+        pks = await repo.add_many(objects)
+        assert pks == [o.pk for o in objects]
+        await repo.update_many([Custom('x', pk) for pk in pks[:2]])
+        assert [o.pk for o in await repo.get_all({'name': 'x'})] == pks[:2]
+        await repo.delete_many(pks[:3])
+        assert await repo.find(Query(order_by=['-name'])) == objects[:2:-1]
+    run(make_repo, scenario)
+
+
+def test_concurrent_tasks(make_repo):
+    async def scenario(repo):
+        pks = await asyncio.gather(*(repo.add(Custom(str(i))) for i in range(50)))
+        assert sorted(pks) == list(range(1, 51))
+        objs = await asyncio.gather(*(repo.get(pk) for pk in pks))
+        assert [o.pk for o in objs] == pks
+    run(make_repo, scenario)
+
+
+def test_sqlite_does_not_block_loop(tmp_path):
+    async def scenario():
+        async with AsyncSQLiteRepository(str(tmp_path / 'test_db.db'), Custom) as repo:
+            loop_thread = threading.get_ident()
+            threads = set()
+            original = repo.repo.get
+
+            def get(pk):
+                threads.add(threading.get_ident())
+                return original(pk)
+
+            repo.repo.get = get
+            await repo.get(1)
+            assert loop_thread not in threads
+    asyncio.run(scenario())
+
+
+def test_close_releases_connections(tmp_path):
+    async def scenario():
+        repo = AsyncSQLiteRepository(str(tmp_path / 'test_db.db'), Custom, readers=3)
+        opened = len(repo.manager._connections)
+        pks = await repo.add_many([Custom(str(i)) for i in range(10)])
+        await asyncio.gather(*(repo.get(pk) for pk in pks))
+        assert len(repo.manager._connections) > opened
+        await repo.close()
+        return opened, repo.manager
+    opened, manager = asyncio.run(scenario())
+    assert len(manager._connections) == opened
+    assert manager.connection().execute('SELECT count(*) FROM custom').fetchone() == (10,)
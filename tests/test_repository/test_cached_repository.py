@@ -0,0 +1,113 @@
+import sqlite3
+from dataclasses import dataclass
+
+from bookkeeper.repository.cached_repository import CachedRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+import pytest
+
+
+@dataclass
+class Custom:
+    name: str = 'food'
+    pk: int = 0
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repo(request, tmp_path):
+    if request.param == 'memory':
+        return CachedRepository(MemoryRepository(), max_size=3)
+    return CachedRepository(SQLiteRepository(str(tmp_path / 'test_db.db'), Custom),
+                            max_size=3)
+
+
+def test_identity_map(repo):
+    pk = repo.add(Custom())
+    repo.clear()
+    obj = repo.get(pk)
+    assert repo.get(pk) is obj
+    assert repo.get_all()[0] is obj
+    assert repo.find(Query({'name': 'food'}))[0] is obj
+    assert next(repo.iter_all()) is obj
+
+
+def test_hits_and_misses(repo):
+    pk = repo.add(Custom())
+    repo.clear()
+    repo.get(pk)
+    repo.get(pk)
+    repo.get(pk + 100)
+    stats = repo.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 1)
+
+
+def test_lru_eviction(repo):
+    pks = repo.add_many([Custom(str(i)) for i in range(4)])
+    assert repo.stats()['size'] == 3
+    repo.get(pks[1])
+    assert repo.hits == 1
+    repo.get(pks[0])
+    assert repo.misses == 1
+    repo.get(pks[1])
+    assert repo.hits == 2
+
+
+def test_write_through(repo):
+    pk = repo.add(Custom())
+    repo.update(Custom('new', pk=pk))
+    assert repo.get(pk).name == 'new'
+    assert repo.repo.get(pk).name == 'new'
+    repo.delete(pk)
+    assert repo.get(pk) is None
+
+
+def test_rollback_clears_cache(repo):
+    pk = repo.add(Custom())
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.update(Custom('new', pk=pk))
+            raise RuntimeError
+    assert repo.get(pk).name == 'food'
+
+
+def test_external_write_detected(tmp_path):
+    db_file = str(tmp_path / 'test_db.db')
+    repo = CachedRepository(SQLiteRepository(db_file, Custom), recheck_interval=0)
+    pk = repo.add(Custom())
+    assert repo.get(pk).name == 'food'
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute('UPDATE custom SET name = ? WHERE pk = ?', ('other', pk))
+    con.close()
+    assert repo.get(pk).name == 'other'
+
+
+def test_sibling_write_detected(tmp_path):
+    db_file = str(tmp_path / 'test_db.db')
+    repo = CachedRepository(SQLiteRepository(db_file, Custom), recheck_interval=3600)
+    sibling = SQLiteRepository(db_file, Custom)
+    pk = repo.add(Custom('a'))
+    assert repo.get(pk).name == 'a'
+    sibling.update(Custom('b', pk=pk))
+    assert repo.get(pk).name == 'b'
+    assert repo.get_all()[0].name == 'b'
+
+
+def test_hits_do_not_query_data_version(tmp_path, monkeypatch):
+    inner = SQLiteRepository(str(tmp_path / 'test_db.db'), Custom)
+    repo = CachedRepository(inner, recheck_interval=3600)
+    pk = repo.add(Custom())
+    repo.update(Custom('new', pk=pk))
+    calls = []
+    monkeypatch.setattr(inner, 'data_version', lambda: calls.append(1))
+    for _ in range(10):
+        assert repo.get(pk).name == 'new'
+    assert calls == []
+    assert repo.hits == 10
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        CachedRepository(MemoryRepository(), max_size=0)
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from bookkeeper.repository.concurrent_repository import ConcurrentMemoryRepository, RWLock
+from bookkeeper.repository.query import Query
+
+import pytest
+
+
+class Item():
+    def __init__(self, value):
+        self.value = value
+        self.pk = 0
+
+
+def test_readers_share_lock():
+    lock = RWLock()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            barrier.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+
+def test_writer_is_exclusive():
+    lock = RWLock()
+    inside = []
+
+    def write():
+        with lock.write():
+            inside.append('writer')
+
+    with lock.read():
+        thread = threading.Thread(target=write)
+        thread.start()
+        time.sleep(0.1)
+        assert inside == []
+    thread.join()
+    assert inside == ['writer']
+
+
+def test_reentrant_write_and_no_upgrade():
+    lock = RWLock()
+    with lock.write():
+        with lock.write(), lock.read():
+            pass
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                pass
+
+
+def test_concurrent_reads_and_writes():
+    repo = ConcurrentMemoryRepository(indexed_fields=('value',))
+    repo.add_many(Item(i % 10) for i in range(1000))
+    errors = []
+    stop = threading.Event()
+
+    def write():
+        try:
+            for i in range(2000):
+                pk = repo.add(Item(i % 10))
+                if i % 2:
+                    repo.delete(pk)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            stop.set()
+
+    def read():
+        try:
+            while not stop.is_set():
+                assert all(obj.value == 3 for obj in repo.get_all({'value': 3}))
+                repo.find(Query(order_by=['-pk'], limit=5))
+                list(repo.iter_all())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write)] + [
+        threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(repo.get_all()) == 2000
+
+
+def test_transaction_rollback_is_atomic():
+    repo = ConcurrentMemoryRepository()
+    repo.add(Item(1))
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.add(Item(2))
+            raise RuntimeError
+    assert [obj.value for obj in repo.get_all()] == [1]
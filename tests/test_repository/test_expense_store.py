@@ -0,0 +1,147 @@
+from datetime import datetime
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.expense_store import ExpenseStore
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+
+import pytest
+
+
+@pytest.fixture
+def repo():
+    return ExpenseStore()
+
+
+@pytest.fixture
+def expenses():
+    return [Expense(amount=100 * i, category=i % 3,
+                    expense_date=datetime(2023, 1 + i % 3, 1 + i, 12, 30),
+                    added_date=datetime(2023, 4, 1), comment=f'c{i % 2}')
+            for i in range(1, 10)]
+
+
+def test_crud(repo):
+    obj = Expense(100, 1, datetime(2023, 1, 2, 3, 4, 5), datetime(2023, 1, 3), 'x')
+    pk = repo.add(obj)
+    assert obj.pk == pk
+    assert repo.get(pk) == obj
+    assert repo.get(pk) is not obj
+    obj2 = Expense(200, 2, comment='y', pk=pk)
+    repo.update(obj2)
+    assert repo.get(pk).amount == 200
+    assert repo.get(pk).comment == 'y'
+    repo.delete(pk)
+    assert repo.get(pk) is None
+    assert len(repo) == 0
+
+
+def test_cannot_add_with_pk(repo):
+    with pytest.raises(ValueError):
+        repo.add(Expense(100, 1, pk=1))
+
+
+def test_cannot_update_unknown(repo):
+    with pytest.raises(ValueError):
+        repo.update(Expense(100, 1))
+    with pytest.raises(KeyError):
+        repo.update(Expense(100, 1, pk=5))
+
+
+def test_cannot_delete_unexistent(repo):
+    with pytest.raises(KeyError):
+        repo.delete(1)
+
+
+def test_invalid_values_are_not_written(repo, expenses):
+    pks = repo.add_many(expenses[:2])
+    with pytest.raises(TypeError):
+        repo.add(Expense('100', 1))
+    assert repo.add(Expense(300, 1)) == pks[-1] + 1
+    assert [e.pk for e in repo.get_all()] == [*pks, pks[-1] + 1]
+    assert len(repo) == 3
+    with pytest.raises(TypeError):
+        repo.update(Expense(500, 'x', pk=pks[0]))
+    assert repo.get(pks[0]) == expenses[0]
+
+
+def test_delete_many_is_atomic(repo, expenses):
+    pks = repo.add_many(expenses)
+    with pytest.raises(KeyError):
+        repo.delete_many([pks[0], 100])
+    assert repo.get(pks[0]) is not None
+
+
+def test_get_all_with_condition(repo, expenses):
+    repo.add_many(expenses)
+    assert repo.get_all({'category': 1, 'comment': 'c0'}) == [
+        e for e in expenses if e.category == 1 and e.comment == 'c0']
+    assert repo.get_all({'comment': 'unknown'}) == []
+
+
+def test_matches_memory_repository(repo, expenses):
+    memory = MemoryRepository()
+    repo.add_many(expenses)
+    memory.add_many(Expense(e.amount, e.category, e.expense_date, e.added_date,
+                            e.comment) for e in expenses)
+    queries = [
+        Query([('amount', 'between', (200, 500))], order_by=['-amount']),
+        Query([('category', 'in', [0, 2]), ('amount', '>', 300)]),
+        Query([('expense_date', '>=', datetime(2023, 2, 1)),
+               ('expense_date', '<', datetime(2023, 3, 1))]),
+        Query([('expense_date', 'between', (datetime(2023, 1, 1),
+                                            datetime(2023, 2, 28)))],
+              order_by=['-expense_date'], limit=3, offset=1),
+        Query([('comment', '>', 'c0')]),
+    ]
+    for query in queries:
+        assert repo.find(query) == memory.find(query)
+    spec = {'total': ('sum', 'amount'), 'n': ('count', '*'),
+            'avg': ('avg', 'amount'), 'last': ('max', 'expense_date')}
+    for group_by in ([], ['category'], ['expense_date:month', 'comment']):
+        for where in (None, {'category': 5},
+                      Query([('expense_date', '>=', datetime(2023, 2, 1))])):
+            assert repo.aggregate(group_by, spec, where) == \
+                memory.aggregate(group_by, spec, where)
+
+
+def test_date_index_follows_updates(repo, expenses):
+    repo.add_many(expenses)
+    query = Query([('expense_date', '<', datetime(2023, 1, 5))])
+    assert [e.pk for e in repo.find(query)] == [3]
+    obj = repo.get(5)
+    obj.expense_date = datetime(2022, 12, 31)
+    repo.update(obj)
+    assert [e.pk for e in repo.find(query)] == [3, 5]
+    repo.delete(3)
+    assert [e.pk for e in repo.find(query)] == [5]
+
+
+def test_compact_keeps_data(repo, expenses):
+    pks = repo.add_many(expenses)
+    repo.delete_many(pks[:6])
+    assert len(repo) == 3
+    assert [e.pk for e in repo.get_all()] == pks[6:]
+    assert repo.add(Expense(1, 1)) == pks[-1] + 1
+    assert repo.get(pks[7]) == expenses[7]
+
+
+def test_transaction_rollback(repo, expenses):
+    repo.add_many(expenses[:3])
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.delete(1)
+            repo.update(Expense(1, 1, pk=2))
+            raise RuntimeError
+    assert repo.get(1) == expenses[0]
+    assert repo.get(2) == expenses[1]
+
+
+def test_iter_all(repo, expenses):
+    repo.add_many(expenses)
+    assert list(repo.iter_all({'category': 0})) == repo.get_all({'category': 0})
+
+
+def test_nbytes(repo, expenses):
+    repo.add_many(expenses)
+    assert repo.nbytes() == 45 * len(expenses)
@@ -0,0 +1,128 @@
+import json
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_rollup import rollup
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import HierarchicalRepository
+from bookkeeper.repository.instrumentation import (
+    InstrumentedRepository, Metrics, OperationStats
+)
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+import pytest
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def repo(metrics):
+    return InstrumentedRepository(MemoryRepository(), metrics, model='Expense')
+
+
+def test_operation_stats():
+    stats = OperationStats()
+    for elapsed in (1000, 2000, 3000, 1_000_000):
+        stats.record(elapsed, rows=2, error=False)
+    stats.record(500, rows=0, error=True)
+    data = stats.to_dict()
+    assert data['calls'] == 5
+    assert data['errors'] == 1
+    assert data['rows'] == 8
+    assert data['max_us'] == 1000
+    assert data['p50_us'] <= 4.096
+    assert sum(data['histogram'].values()) == 5
+
+
+def test_counts_calls_and_rows(repo, metrics):
+    pks = repo.add_many([Expense(i, 1) for i in range(3)])
+    repo.get(pks[0])
+    repo.get(100)
+    repo.get_all({'category': 1})
+    repo.update(Expense(5, 1, pk=pks[0]))
+    repo.delete(pks[1])
+    with pytest.raises(KeyError):
+        repo.delete(100)
+    assert len(list(repo.iter_all())) == 2
+    stats = metrics.snapshot()['Expense']
+    assert stats['add_many']['rows'] == 3
+    assert stats['get']['calls'] == 2
+    assert stats['get']['rows'] == 1
+    assert stats['get_all']['rows'] == 3
+    assert stats['update']['calls'] == 1
+    assert stats['delete']['calls'] == 2
+    assert stats['delete']['errors'] == 1
+    assert stats['iter_all']['rows'] == 2
+
+
+def test_interrupted_iteration_is_recorded(repo, metrics):
+    repo.add_many([Expense(i, 1) for i in range(5)])
+    for _ in repo.iter_all():
+        break
+    stats = metrics.snapshot()['Expense']['iter_all']
+    assert stats['rows'] == 1
+    assert stats['errors'] == 0
+
+
+def test_sqlite_timings(tmp_path, metrics):
+    db_file = str(tmp_path / 'test.db')
+    manager = ConnectionManager(db_file)
+    repo = InstrumentedRepository(SQLiteRepository(db_file, Expense, manager), metrics)
+    repo.add(Expense(1, 1))
+    repo.find(Query({'category': 1}))
+    stats = metrics.snapshot()
+    assert stats['Expense']['find']['rows'] == 1
+    assert stats['sqlite']['execute']['calls'] >= 2
+    assert stats['sqlite']['fetch']['calls'] >= 1
+    assert stats['sqlite']['connect']['calls'] == 1
+    assert stats['sqlite']['connect']['total_us'] > 0
+    manager.instrument(metrics)
+    assert metrics.snapshot()['sqlite']['connect']['calls'] == 1
+    manager.close()
+    repo.get(1)
+    assert metrics.snapshot()['sqlite']['connect']['calls'] == 2
+    manager.instrument(None)
+    manager.close()
+
+
+def test_hierarchy_is_forwarded(tmp_path, metrics):
+    db_file = str(tmp_path / 'test.db')
+    manager = ConnectionManager(db_file)
+    cats = InstrumentedRepository[Category](
+        SQLiteRepository(db_file, Category, manager), metrics)
+    exps = InstrumentedRepository[Expense](
+        SQLiteRepository(db_file, Expense, manager), metrics)
+    assert isinstance(cats, HierarchicalRepository)
+    assert not isinstance(InstrumentedRepository(MemoryRepository()),
+                          HierarchicalRepository)
+    root = Category('root')
+    cats.add(root)
+    child = Category('child', root.pk)
+    cats.add(child)
+    exps.add(Expense(5, child.pk))
+    assert [c.name for c in root.get_subcategories(cats)] == ['child']
+    assert [c.name for c in child.get_all_parents(cats)] == ['root']
+    assert [(t.category.name, t.total) for t in rollup(cats, exps)[0].walk()] == [
+        ('root', 5), ('child', 5)]
+    stats = metrics.snapshot()['Category']
+    assert stats['get_descendants']['rows'] == 1
+    assert stats['get_ancestors']['calls'] == 1
+    assert stats['subtree_totals']['calls'] == 1
+    assert 'aggregate' not in metrics.snapshot()['Expense']
+    manager.instrument(None)
+    manager.close()
+
+
+def test_dump_json(repo, metrics, tmp_path):
+    repo.add(Expense(1, 1))
+    path = tmp_path / 'stats.json'
+    text = metrics.dump_json(str(path))
+    assert json.loads(path.read_text(encoding='utf-8')) == json.loads(text)
+    assert json.loads(text)['Expense']['add']['calls'] == 1
+    metrics.reset()
+    assert metrics.snapshot() == {}
@@ -0,0 +1,140 @@
+import os
+import time
+from datetime import datetime
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.journal import ADD, Journal
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+import pytest
+
+
+class Custom():
+    def __init__(self, value):
+        self.value = value
+        self.pk = 0
+
+    def __eq__(self, other):
+        return (self.value, self.pk) == (other.value, other.pk)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'data')
+
+
+def reopen(path, **kwargs):
+    journal = Journal(path, **kwargs)
+    return MemoryRepository(journal=journal), journal
+
+
+def test_recover_from_log(path):
+    repo, journal = reopen(path)
+    objs = [Expense(i, 1, datetime(2023, 1, i + 1), comment=str(i)) for i in range(5)]
+    repo.add_many(objs)
+    objs[1].amount = 100
+    repo.update(objs[1])
+    repo.delete(objs[2].pk)
+    journal.close()
+
+    repo, journal = reopen(path)
+    assert repo.get_all() == [objs[0], objs[1], objs[3], objs[4]]
+    assert repo.add(Expense(1, 1)) == 6
+    journal.close()
+
+
+def test_recover_from_snapshot_and_log(path):
+    repo, journal = reopen(path, snapshot_every=3)
+    objs = [Custom(i) for i in range(4)]
+    repo.add_many(objs)
+    assert os.path.exists(path + '.snapshot')
+    repo.delete(1)
+    journal.close()
+
+    repo, journal = reopen(path)
+    assert repo.get_all() == objs[1:]
+    journal.close()
+
+
+def test_dataclass_snapshot(path):
+    repo, journal = reopen(path)
+    objs = [Expense(i, i % 2, comment='x') for i in range(10)]
+    repo.add_many(objs)
+    repo.snapshot()
+    journal.close()
+    assert os.path.getsize(path + '.log') == 0
+
+    repo, journal = reopen(path)
+    assert repo.get_all() == objs
+    journal.close()
+
+
+def test_torn_tail_is_dropped(path):
+    repo, journal = reopen(path)
+    repo.add(Custom(1))
+    repo.add(Custom(2))
+    journal.close()
+    size = os.path.getsize(path + '.log')
+    os.truncate(path + '.log', size - 3)
+
+    repo, journal = reopen(path)
+    assert [obj.value for obj in repo.get_all()] == [1]
+    repo.add(Custom(3))
+    journal.close()
+    repo, journal = reopen(path)
+    assert [obj.value for obj in repo.get_all()] == [1, 3]
+    journal.close()
+
+
+def test_rolled_back_changes_are_not_logged(path):
+    repo, journal = reopen(path)
+    repo.add(Custom(1))
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.add(Custom(2))
+            raise RuntimeError
+    with repo.transaction():
+        repo.add(Custom(3))
+    journal.close()
+
+    repo, journal = reopen(path)
+    assert [obj.value for obj in repo.get_all()] == [1, 3]
+    journal.close()
+
+
+def test_group_commit(path, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(os, 'fsync', syncs.append)
+    journal = Journal(path, sync_interval=3600)
+    journal.recover()
+    for pk in range(1, 101):
+        journal.append(ADD, pk, Custom(pk))
+    assert syncs == []
+    journal.close()
+    assert len(syncs) == 1
+
+
+def test_records_are_flushed(path):
+    journal = Journal(path, sync_interval=3600)
+    journal.recover()
+    journal.append(ADD, 1, Custom(1))
+    with open(journal.log_path, 'rb') as file:
+        assert file.read()
+    journal.close()
+
+
+def test_idle_records_are_synced(path, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(os, 'fsync', syncs.append)
+    journal = Journal(path, sync_interval=0.5)
+    journal.recover()
+    journal.append(ADD, 1, Custom(1))
+    journal.append(ADD, 2, Custom(2))
+    assert syncs == []
+    deadline = time.monotonic() + 5
+    while not syncs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(syncs) == 1
+    journal.close()
+    assert len(syncs) == 1
+
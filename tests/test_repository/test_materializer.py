@@ -0,0 +1,73 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.materializer import make_materializer
+
+import pytest
+
+
+def expense_fields():
+    return {'amount': int, 'category': int, 'expense_date': datetime,
+            'added_date': datetime, 'comment': str}
+
+
+def test_expense():
+    make = make_materializer(Expense, expense_fields())
+    obj = make((5, 100, 2, '2023-01-05', '2023-01-06 10:20:30.123456', 'hi'))
+    assert obj == Expense(100, 2, datetime(2023, 1, 5),
+                          datetime(2023, 1, 6, 10, 20, 30, 123456), 'hi', pk=5)
+
+
+def test_skips_default_factories():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return 0
+
+    @dataclass
+    class Custom:
+        value: int = field(default_factory=factory)
+        pk: int = 0
+
+    obj = make_materializer(Custom, {'value': int})((1, 2))
+    assert (obj.pk, obj.value) == (1, 2)
+    assert calls == []
+
+
+def test_decoders():
+    @dataclass
+    class Custom:
+        day: date | None = None
+        moment: datetime | None = None
+        pk: int = 0
+
+    make = make_materializer(Custom, {'day': date | None, 'moment': datetime | None})
+    assert make((1, '2023-01-05', None)) == Custom(date(2023, 1, 5), None, 1)
+    moment = datetime(2023, 1, 5, 1, 2)
+    assert make((2, None, moment)) == Custom(None, moment, 2)
+    assert make_materializer(Custom, {'day': date | None, 'moment': datetime | None},
+                             decoders={})((3, '2023', 'x')) == Custom('2023', 'x', 3)
+
+
+@pytest.mark.parametrize('post_init', [False, True])
+def test_constructor_fallback(post_init):
+    class Plain:
+        pk = 0
+
+        def __init__(self, name):
+            self.name = name
+
+    @dataclass
+    class WithPostInit:
+        name: str
+        pk: int = 0
+
+        def __post_init__(self):
+            self.name = self.name.upper()
+
+    cls = WithPostInit if post_init else Plain
+    obj = make_materializer(cls, {'name': str})((7, 'abc'))
+    assert obj.pk == 7
+    assert obj.name == ('ABC' if post_init else 'abc')
@@ -1,4 +1,8 @@
+from inspect import isgenerator
+
+from bookkeeper.models.category import Category
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
 
 import pytest
 
@@ -69,3 +73,213 @@ def test_get_all_with_condition(repo, custom_class):
         objects.append(o)
     assert repo.get_all({'name': '0'}) == [objects[0]]
     assert repo.get_all({'test': 'test'}) == objects
+
+
+def test_add_many(repo, custom_class):
+    objects = [custom_class() for _ in range(5)]
+    pks = repo.add_many(objects)
+    assert pks == [o.pk for o in objects]
+    assert repo.get_all() == objects
+
+
+def test_cannot_add_many_with_pk(repo, custom_class):
+    objects = [custom_class() for _ in range(2)]
+    objects[1].pk = 1
+    with pytest.raises(ValueError):
+        repo.add_many(objects)
+    assert repo.get_all() == []
+
+
+def test_update_many(repo, custom_class):
+    pks = repo.add_many([custom_class() for _ in range(3)])
+    new_objects = []
+    for pk in pks:
+        obj = custom_class()
+        obj.pk = pk
+        new_objects.append(obj)
+    repo.update_many(new_objects)
+    assert repo.get_all() == new_objects
+
+
+def test_delete_many(repo, custom_class):
+    pks = repo.add_many([custom_class() for _ in range(3)])
+    repo.delete_many(pks[:2])
+    assert [o.pk for o in repo.get_all()] == pks[2:]
+    with pytest.raises(KeyError):
+        repo.delete_many([pks[2], pks[2] + 10])
+    assert [o.pk for o in repo.get_all()] == pks[2:]
+    repo.delete_many([pks[2], pks[2]])
+    assert repo.get_all() == []
+
+
+def test_find(repo, custom_class):
+    objects = []
+    for i in range(5):
+        o = custom_class()
+        o.value = i
+        repo.add(o)
+        objects.append(o)
+    query = Query([('value', '>=', 2)], order_by=['-value'], limit=2)
+    assert repo.find(query) == [objects[4], objects[3]]
+
+
+def test_aggregate(repo, custom_class):
+    for i in range(6):
+        o = custom_class()
+        o.value = i
+        o.group = i % 2
+        repo.add(o)
+    assert repo.aggregate(['group'], {'total': ('sum', 'value')},
+                          Query([('value', '>', 0)])) \
+        == [{'group': 0, 'total': 6}, {'group': 1, 'total': 9}]
+
+
+def test_iter_all(repo, custom_class):
+    objects = [custom_class() for _ in range(5)]
+    for i, o in enumerate(objects):
+        o.value = i
+        repo.add(o)
+    gen = repo.iter_all({'value': 3})
+    assert isgenerator(gen)
+    assert list(gen) == [objects[3]]
+    for obj in repo.iter_all():
+        repo.delete(obj.pk)
+    assert repo.get_all() == []
+
+
+@pytest.fixture
+def indexed_repo():
+    return MemoryRepository(indexed_fields=('category', 'name'))
+
+
+@pytest.fixture
+def item_class():
+    class Item():
+        def __init__(self, category, name=''):
+            self.category = category
+            self.name = name
+            self.pk = 0
+
+    return Item
+
+
+def test_indexed_get_all(indexed_repo, item_class):
+    items = [item_class(i % 3, f'n{i % 2}') for i in range(10)]
+    indexed_repo.add_many(items)
+    assert indexed_repo.get_all({'category': 1}) == [o for o in items if o.category == 1]
+    assert indexed_repo.get_all({'category': 1, 'name': 'n0'}) == [
+        o for o in items if o.category == 1 and o.name == 'n0']
+    assert indexed_repo.get_all({'category': 5}) == []
+    query = Query([('category', 'in', [0, 2])], order_by=['-pk'])
+    assert indexed_repo.find(query) == [o for o in reversed(items) if o.category != 1]
+
+
+def test_index_follows_update_and_delete(indexed_repo, item_class):
+    obj = item_class(1)
+    pk = indexed_repo.add(obj)
+    obj.category = 2
+    indexed_repo.update(obj)
+    assert indexed_repo.get_all({'category': 1}) == []
+    assert indexed_repo.get_all({'category': 2}) == [obj]
+    indexed_repo.delete(pk)
+    assert indexed_repo.get_all({'category': 2}) == []
+    assert list(indexed_repo.iter_all({'category': 2})) == []
+
+
+def test_index_restored_on_rollback(indexed_repo, item_class):
+    obj = item_class(1)
+    indexed_repo.add(obj)
+    with pytest.raises(RuntimeError):
+        with indexed_repo.transaction():
+            indexed_repo.delete(obj.pk)
+            raise RuntimeError
+    assert indexed_repo.get_all({'category': 1}) == [obj]
+    assert indexed_repo.aggregate([], {'n': ('count', '*')},
+                                  {'category': 1}) == [{'n': 1}]
+
+
+def test_rollback_restores_changed_in_place(indexed_repo, item_class):
+    objs = [item_class(1, 'a'), item_class(1, 'b'), item_class(2, 'c')]
+    indexed_repo.add_many(objs)
+    assert indexed_repo._states == {}
+    with pytest.raises(RuntimeError):
+        with indexed_repo.transaction():
+            first = indexed_repo.get(objs[0].pk)
+            first.name = 'changed'
+            indexed_repo.update(first)
+            second = indexed_repo.get_all({'name': 'b'})[0]
+            second.category = 3
+            indexed_repo.update(second)
+            indexed_repo.find(Query({'category': 2}))[0].name = 'not saved'
+            indexed_repo.delete(objs[2].pk)
+            indexed_repo.add(item_class(4))
+            raise RuntimeError
+    assert [o.name for o in indexed_repo.get_all()] == ['a', 'b', 'c']
+    assert indexed_repo.get_all({'category': 1}) == objs[:2]
+    assert indexed_repo.get_all({'name': 'changed'}) == []
+    assert indexed_repo.get_all({'category': 4}) == []
+    assert indexed_repo._states == {}
+
+
+def test_nested_rollback_restores_dataclass():
+    repo = MemoryRepository[Category]()
+    repo.add(Category('name'))
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            cat = repo.get(1)
+            cat.name = 'outer'
+            repo.update(cat)
+            with pytest.raises(RuntimeError):
+                with repo.transaction():
+                    cat.name = 'inner'
+                    repo.update(cat)
+                    raise RuntimeError
+            assert repo.get(cat.pk).name == 'outer'
+            cat.name = 'changed'
+            repo.update(cat)
+            raise RuntimeError
+    assert repo.get(cat.pk).name == 'name'
+
+
+@pytest.fixture
+def dated_items(item_class):
+    items = [item_class(i % 3) for i in range(30)]
+    for i, obj in enumerate(items):
+        obj.day = None if i % 7 == 0 else i * 5 % 11
+    return items
+
+
+def test_range_index_matches_scan(item_class, dated_items):
+    plain = MemoryRepository()
+    ranged = MemoryRepository(indexed_fields=('category',),
+                              range_indexed_fields=('day',))
+    plain.add_many(dated_items)
+    for obj in dated_items:
+        obj.pk = 0
+    ranged.add_many(dated_items)
+    queries = [
+        Query([('day', '>=', 3), ('day', '<', 8)]),
+        Query([('day', 'between', (2, 4))], order_by=['-day']),
+        Query([('day', '>', 4), ('category', '=', 1)], order_by=['day']),
+        Query([('day', '=', None)]),
+        Query(order_by=['-day'], limit=5),
+        Query(order_by=['day'], limit=5, offset=3),
+        Query([('category', '=', 2)], order_by=['-day'], limit=3),
+    ]
+    for query in queries:
+        assert ranged.find(query) == query.apply(plain.get_all())
+
+
+def test_range_index_follows_update(dated_items):
+    repo = MemoryRepository(range_indexed_fields=('day',))
+    repo.add_many(dated_items)
+    obj = dated_items[1]
+    obj.day = 100
+    repo.update(obj)
+    assert repo.find(Query(order_by=['-day'], limit=1)) == [obj]
+    assert obj not in repo.find(Query([('day', '=', 5)]))
+    obj.day = None
+    repo.update(obj)
+    assert repo.find(Query([('day', '>', 10)])) == []
+    repo.delete(obj.pk)
+    assert obj not in repo.find(Query(order_by=['day']))
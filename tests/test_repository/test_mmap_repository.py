@@ -0,0 +1,108 @@
+import sqlite3
+from datetime import datetime
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.mmap_repository import (
+    MappedExpenseRepository, convert_sqlite
+)
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+import pytest
+
+
+@pytest.fixture
+def expenses():
+    return [Expense(amount=10 * i, category=i % 3,
+                    expense_date=datetime(2023, 1, i + 1, 10),
+                    added_date=datetime(2023, 2, 1), comment=f'комментарий {i % 2}')
+            for i in range(10)]
+
+
+@pytest.fixture
+def db_file(tmp_path, expenses):
+    db_file = str(tmp_path / 'test.db')
+    repo = SQLiteRepository(db_file, Expense)
+    repo.add_many(expenses)
+    repo.delete_many([3, 4])
+    repo.add(Expense(5, 1, datetime(2023, 3, 1), datetime(2023, 3, 1)))
+    return db_file
+
+
+@pytest.fixture
+def repo(db_file, tmp_path):
+    path = str(tmp_path / 'expenses.bin')
+    assert convert_sqlite(db_file, path) == 9
+    with MappedExpenseRepository(path) as repo:
+        yield repo
+
+
+def test_same_content(repo, db_file):
+    source = SQLiteRepository(db_file, Expense)
+    assert repo.get_all() == source.get_all()
+    assert repo.get(3) is None
+    assert repo.get(11) == source.get(11)
+    assert repo.get(0) is None
+    assert repo.get(12) is None
+    assert len(repo) == 9 == len(repo.get_all())
+
+
+def test_queries(repo, db_file):
+    source = SQLiteRepository(db_file, Expense)
+    queries = [
+        Query({'category': 1}, order_by=['pk']),
+        Query([('pk', 'between', (2, 7)), ('amount', '>', 20)]),
+        Query([('expense_date', '>=', datetime(2023, 1, 5)),
+               ('comment', '=', 'комментарий 1')], order_by=['-amount'], limit=2),
+        Query([('category', 'in', [0, 2]), ('pk', '<', 9)], order_by=['pk']),
+        Query([('pk', '>', 20)]),
+    ]
+    for query in queries:
+        assert repo.find(query) == source.find(query)
+    spec = {'total': ('sum', 'amount'), 'n': ('count', '*')}
+    assert repo.aggregate(['category'], spec) == source.aggregate(['category'], spec)
+
+
+def test_close_with_unfinished_iterator(db_file, tmp_path):
+    path = str(tmp_path / 'expenses.bin')
+    convert_sqlite(db_file, path)
+    repo = MappedExpenseRepository(path)
+    rows = repo.iter_all(batch_size=2)
+    assert next(rows).pk == 1
+    repo.close()
+
+
+def test_convert_does_not_modify_source(tmp_path):
+    db_file = tmp_path / 'legacy.db'
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute('CREATE TABLE expense ("pk" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'amount, category, expense_date, added_date, comment)')
+        con.execute('INSERT INTO expense (amount, category, expense_date, added_date, '
+                    "comment) VALUES (10, 1, '2023-01-02T10:00:00', "
+                    "'2023-01-03T00:00:00', 'x')")
+    con.close()
+    content = db_file.read_bytes()
+    path = str(tmp_path / 'expenses.bin')
+    assert convert_sqlite(str(db_file), path) == 1
+    assert db_file.read_bytes() == content
+    with MappedExpenseRepository(path) as repo:
+        assert repo.get_all() == [Expense(10, 1, datetime(2023, 1, 2, 10),
+                                          datetime(2023, 1, 3), 'x', pk=1)]
+
+
+def test_read_only(repo):
+    with pytest.raises(NotImplementedError):
+        repo.add(Expense(1, 1))
+    with pytest.raises(NotImplementedError):
+        repo.update(Expense(1, 1, pk=1))
+    with pytest.raises(NotImplementedError):
+        repo.delete(1)
+
+
+def test_not_an_expense_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'x' * 64)
+    (tmp_path / 'other.bin.heap').write_bytes(b'')
+    with pytest.raises(ValueError):
+        MappedExpenseRepository(str(path))
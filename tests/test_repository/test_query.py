@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+
+from bookkeeper.repository.query import Condition, Query, aggregate
+
+import pytest
+
+
+@dataclass
+class Custom:
+    name: str = ''
+    value: int | None = 0
+    pk: int = 0
+
+
+@pytest.fixture
+def objects():
+    return [Custom(str(i), i, pk=i + 1) for i in range(10)]
+
+
+@pytest.mark.parametrize('op, value, expected', [
+    ('=', 3, [3]),
+    ('<', 2, [0, 1]),
+    ('<=', 2, [0, 1, 2]),
+    ('>', 7, [8, 9]),
+    ('>=', 8, [8, 9]),
+    ('between', (3, 5), [3, 4, 5]),
+    ('in', [1, 5, 11], [1, 5]),
+    ('in', [], []),
+])
+def test_operators(objects, op, value, expected):
+    assert [o.value for o in Query([('value', op, value)]).apply(objects)] == expected
+
+
+def test_unknown_operator():
+    with pytest.raises(ValueError):
+        Condition('value', 'like', 1)
+
+
+def test_dict_means_equality(objects):
+    assert Query({'name': '3'}).where == (Condition('name', '=', '3'),)
+    assert Query({'name': '3', 'value': 3}).apply(objects) == [objects[3]]
+
+
+def test_none_values():
+    objs = [Custom('a', None), Custom('b', 1)]
+    assert Query([('value', '>', 0)]).apply(objs) == [objs[1]]
+    assert Query({'value': None}).apply(objs) == [objs[0]]
+    assert Query(order_by=['value']).apply(objs) == objs
+
+
+def test_order_limit_offset(objects):
+    query = Query([('value', '>=', 2)], order_by=['-value'], limit=3, offset=1)
+    assert [o.value for o in query.apply(objects)] == [8, 7, 6]
+
+
+def test_order_by_several_fields():
+    objs = [Custom('b', 1), Custom('a', 2), Custom('a', 1)]
+    assert Query(order_by=['name', '-value']).apply(objs) == [objs[1], objs[2], objs[0]]
+
+
+def test_filter_returns_new_query():
+    query = Query({'name': 'a'})
+    new = query.filter('value', '<', 1)
+    assert len(query.where) == 1
+    assert new.where[1] == Condition('value', '<', 1)
+    assert new.fields() == {'name', 'value'}
+
+
+@dataclass
+class Spending:
+    amount: int | None
+    category: int
+    date: str
+    pk: int = 0
+
+
+@pytest.fixture
+def spendings():
+    return [Spending(10, 1, '2023-01-05'), Spending(20, 1, '2023-02-01 10:00:00'),
+            Spending(5, 2, '2023-01-31'), Spending(None, 2, '2023-01-01'),
+            Spending(7, 1, '2023-01-20')]
+
+
+def test_aggregate_without_groups(spendings):
+    assert aggregate(spendings, [], {'total': ('sum', 'amount'), 'n': ('count', '*'),
+                                     'k': ('count', 'amount'), 'lo': ('min', 'amount'),
+                                     'hi': ('max', 'amount'), 'avg': ('avg', 'amount')}
+                     ) == [{'total': 42, 'n': 5, 'k': 4, 'lo': 5, 'hi': 20, 'avg': 10.5}]
+
+
+def test_aggregate_empty():
+    assert aggregate([], [], {'total': ('sum', 'amount'), 'n': ('count', '*')}) \
+        == [{'total': None, 'n': 0}]
+    assert aggregate([], ['category'], {'n': ('count', '*')}) == []
+
+
+def test_aggregate_group_by_month(spendings):
+    assert aggregate(spendings, ['category', 'date:month'],
+                     {'total': ('sum', 'amount')}) == [
+        {'category': 1, 'date:month': '2023-01', 'total': 17},
+        {'category': 1, 'date:month': '2023-02', 'total': 20},
+        {'category': 2, 'date:month': '2023-01', 'total': 5},
+    ]
+
+
+@pytest.mark.parametrize('group_by, aggregates', [
+    (['date:week'], {'n': ('count', '*')}),
+    ([], {'n': ('median', 'amount')}),
+    ([], {'n': ('sum', '*')}),
+])
+def test_aggregate_errors(spendings, group_by, aggregates):
+    with pytest.raises(ValueError):
+        aggregate(spendings, group_by, aggregates)
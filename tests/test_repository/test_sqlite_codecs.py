@@ -0,0 +1,47 @@
+from datetime import date, datetime, timedelta, timezone
+
+from bookkeeper.repository.sqlite_codecs import (
+    decode_date, decode_datetime, encode_date, encode_datetime, field_codecs
+)
+
+import pytest
+
+
+@pytest.mark.parametrize('value, expected', [
+    (datetime(1970, 1, 1), 0),
+    (datetime(1970, 1, 2, 0, 0, 1, 999999), 86401),
+    (date(1970, 1, 2), 86400),
+    ('1970-01-02', 86400),
+    (datetime(1970, 1, 1, 3, tzinfo=timezone(timedelta(hours=3))), 0),
+    (None, None),
+    (5, 5),
+])
+def test_encode_datetime(value, expected):
+    assert encode_datetime(value) == expected
+
+
+def test_datetime_round_trip():
+    moment = datetime(2023, 5, 17, 13, 45, 10)
+    assert decode_datetime(encode_datetime(moment)) == moment
+    assert decode_datetime('2023-05-17 13:45:10') == moment
+    assert decode_datetime(None) is None
+
+
+def test_date_round_trip():
+    day = date(2023, 5, 17)
+    assert encode_date(date(1970, 1, 11)) == 10
+    assert encode_date(datetime(1970, 1, 11, 23, 59)) == 10
+    assert decode_date(encode_date(day)) == day
+    assert decode_date('2023-05-17') == day
+
+
+def test_encode_error():
+    with pytest.raises(TypeError):
+        encode_datetime(1.5)
+
+
+def test_field_codecs():
+    codecs = field_codecs({'a': int, 'b': datetime, 'c': date | None, 'd': str})
+    assert set(codecs) == {'b', 'c'}
+    assert codecs['b'].encode is encode_datetime
+    assert codecs['c'].decode is decode_date
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import threading
+
+from bookkeeper.repository.sqlite_connection import ConnectionManager
+
+import pytest
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'test_db.db'))
+    yield manager
+    manager.close()
+
+
+def test_for_file_returns_shared_manager(tmp_path):
+    db_file = str(tmp_path / 'shared.db')
+    assert ConnectionManager.for_file(db_file) is ConnectionManager.for_file(db_file)
+
+
+def test_connection_is_reused(manager):
+    assert manager.connection() is manager.connection()
+
+
+def test_connection_per_thread(manager):
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not manager.connection()
+
+
+def test_pragmas_applied(manager):
+    con = manager.connection()
+    assert con.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert con.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+
+
+def test_transaction_commit(manager):
+    with manager.transaction() as con:
+        con.execute('CREATE TABLE t (x)')
+        con.execute('INSERT INTO t VALUES (1)')
+    assert not manager.in_transaction()
+    assert manager.connection().execute('SELECT x FROM t').fetchall() == [(1,)]
+
+
+def test_transaction_rollback(manager):
+    with manager.transaction() as con:
+        con.execute('CREATE TABLE t (x)')
+    with pytest.raises(RuntimeError):
+        with manager.transaction() as con:
+            con.execute('INSERT INTO t VALUES (1)')
+            raise RuntimeError
+    assert manager.connection().execute('SELECT x FROM t').fetchall() == []
+
+
+def test_nested_transaction_rollback(manager):
+    with manager.transaction() as con:
+        con.execute('CREATE TABLE t (x)')
+        con.execute('INSERT INTO t VALUES (1)')
+        with pytest.raises(RuntimeError):
+            with manager.transaction():
+                con.execute('INSERT INTO t VALUES (2)')
+                raise RuntimeError
+        assert manager.in_transaction()
+    assert manager.connection().execute('SELECT x FROM t').fetchall() == [(1,)]
+
+
+def test_close(manager):
+    con = manager.connection()
+    manager.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        con.execute('SELECT 1')
+    assert manager.connection().execute('SELECT 1').fetchone() == (1,)
+
+
+def test_close_resets_wal(manager):
+    manager.connection()
+    manager.close()
+    os.remove(manager.db_file)
+    con = manager.connection()
+    assert con.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_memory_database_rejected():
+    with pytest.raises(ValueError):
+        ConnectionManager(':memory:')
+    with pytest.raises(ValueError):
+        ConnectionManager.for_file(':memory:')
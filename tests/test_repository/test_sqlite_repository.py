@@ -1,7 +1,13 @@
-import os
+from datetime import datetime
 
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.instrumentation import Metrics
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Query
 from bookkeeper.repository.sqlite_repository import SQLiteRepository
 from dataclasses import dataclass
+from inspect import isgenerator
 import pytest
 
 
@@ -16,8 +22,8 @@ def custom_class():
 
 
 @pytest.fixture
-def repo(custom_class):
-    return SQLiteRepository('test_db.db', custom_class)
+def repo(custom_class, tmp_path):
+    return SQLiteRepository(str(tmp_path / 'test_db.db'), custom_class)
 
 
 def test_crud(repo, custom_class):
@@ -85,4 +91,212 @@ def test_get_all_with_condition(repo, custom_class):
         o.name = str(i)
         repo.add(o)
         objects.append(o)
-    assert repo.get_all({'name': '0'}) == [objects[0]]
\ No newline at end of file
+    assert repo.get_all({'name': '0'}) == [objects[0]]
+
+
+def test_add_many(repo, custom_class):
+    objects = [custom_class(name=str(i)) for i in range(5)]
+    pks = repo.add_many(objects)
+    assert pks == [o.pk for o in objects]
+    assert repo.get_all() == objects
+
+
+def test_cannot_add_many_with_pk(repo, custom_class):
+    objects = [custom_class(), custom_class(pk=1)]
+    with pytest.raises(ValueError):
+        repo.add_many(objects)
+    assert repo.get_all() == []
+
+
+def test_update_many(repo, custom_class):
+    pks = repo.add_many([custom_class() for _ in range(3)])
+    new_objects = [custom_class(name='new', pk=pk) for pk in pks]
+    repo.update_many(new_objects)
+    assert repo.get_all() == new_objects
+
+
+def test_delete_many(repo, custom_class):
+    pks = repo.add_many([custom_class() for _ in range(3)])
+    repo.delete_many(pks[:2])
+    assert [o.pk for o in repo.get_all()] == pks[2:]
+    with pytest.raises(KeyError):
+        repo.delete_many([pks[2], pks[2] + 10])
+    assert [o.pk for o in repo.get_all()] == pks[2:]
+    repo.delete_many([pks[2], pks[2]])
+    assert repo.get_all() == []
+
+
+def test_get_all_exact_match(repo, custom_class):
+    repo.add_many([custom_class(name='Food'), custom_class(name='f_od')])
+    assert repo.get_all({'name': 'food'}) == []
+    assert repo.get_all({'name': 'f%'}) == []
+    assert [o.name for o in repo.get_all({'name': 'f_od'})] == ['f_od']
+
+
+@pytest.mark.parametrize('query, expected', [
+    (Query([('name', '<', '2')]), ['0', '1']),
+    (Query([('name', 'between', ('2', '3'))]), ['2', '3']),
+    (Query([('name', 'in', ['1', '4', '9'])]), ['1', '4']),
+    (Query([('name', 'in', [])]), []),
+    (Query([('pk', '>', 3)]), ['3', '4']),
+    (Query(order_by=['-name'], limit=2), ['4', '3']),
+    (Query(order_by=['name'], offset=3), ['3', '4']),
+    (Query([('name', '>=', '1')], order_by=['-name'], limit=2, offset=1), ['3', '2']),
+])
+def test_find(repo, custom_class, query, expected):
+    repo.add_many([custom_class(name=str(i)) for i in range(5)])
+    assert [o.name for o in repo.find(query)] == expected
+
+
+def test_find_unknown_field(repo):
+    with pytest.raises(ValueError):
+        repo.find(Query({'missing; DROP TABLE custom': 1}))
+
+
+def test_aggregate(tmp_path):
+    @dataclass
+    class Spending:
+        amount: int | None = None
+        category: int = 0
+        date: str = ''
+        pk: int = 0
+
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Spending)
+    repo.add_many([Spending(10, 1, '2023-01-05'), Spending(20, 1, '2023-02-01 10:00:00'),
+                   Spending(5, 2, '2023-01-31'), Spending(None, 2, '2023-01-01'),
+                   Spending(7, 1, '2023-01-20')])
+    assert repo.aggregate([], {'total': ('sum', 'amount'), 'n': ('count', '*'),
+                               'avg': ('avg', 'amount')}) \
+        == [{'total': 42, 'n': 5, 'avg': 10.5}]
+    assert repo.aggregate(['category', 'date:month'], {'total': ('sum', 'amount')},
+                          Query([('date', '<', '2023-02')])) == [
+        {'category': 1, 'date:month': '2023-01', 'total': 17},
+        {'category': 2, 'date:month': '2023-01', 'total': 5},
+    ]
+    assert repo.aggregate(['category'], {'n': ('count', 'amount')}, {'category': 2}) \
+        == [{'category': 2, 'n': 1}]
+
+
+def test_iter_all(repo, custom_class):
+    objects = [custom_class(name=str(i % 3)) for i in range(10)]
+    repo.add_many(objects)
+    gen = repo.iter_all(batch_size=3)
+    assert isgenerator(gen)
+    assert list(gen) == objects
+    assert list(repo.iter_all({'name': '1'}, batch_size=2)) == objects[1::3]
+    assert list(repo.iter_all(Query([('pk', '>', objects[7].pk)]))) == objects[8:]
+
+
+def test_iter_all_does_not_hold_cursor(repo, custom_class):
+    repo.add_many([custom_class() for _ in range(4)])
+    seen = []
+    for obj in repo.iter_all(batch_size=2):
+        seen.append(obj.pk)
+        if len(seen) == 1:
+            repo.delete(seen[0] + 2)
+    assert seen == [1, 2, 4]
+
+
+def test_expense_dates_round_trip(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Expense)
+    exp = Expense(100, 1, expense_date=datetime(2023, 1, 5),
+                  added_date=datetime(2023, 1, 6, 10, 20, 30))
+    repo.add(exp)
+    assert repo.get(exp.pk) == exp
+    assert repo.get_all() == [exp]
+
+
+def test_date_range_query(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Expense)
+    days = [datetime(2023, 1, d) for d in (1, 10, 20, 31)]
+    repo.add_many([Expense(d.day, 1, expense_date=d, added_date=d) for d in days])
+    found = repo.find(Query([('expense_date', 'between', (days[1], days[2]))]))
+    assert [e.expense_date for e in found] == days[1:3]
+    assert len(repo.find(Query([('expense_date', '>=', '2023-01-20')]))) == 2
+    stored = repo.manager.connection().execute(
+        'SELECT expense_date FROM expense').fetchall()
+    assert all(isinstance(row[0], int) for row in stored)
+    assert repo.aggregate(['expense_date:month'], {'n': ('count', '*')}) \
+        == [{'expense_date:month': '2023-01', 'n': 4}]
+
+
+def test_date_aggregate_matches_memory(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Expense)
+    memory = MemoryRepository[Expense]()
+    days = [datetime(2024, 1, 5), datetime(2024, 1, 5), datetime(2024, 2, 1, 12)]
+    for repository in (repo, memory):
+        repository.add_many([Expense(i + 1, i % 2, expense_date=d, added_date=d)
+                             for i, d in enumerate(days)])
+    spec = {'total': ('sum', 'amount'), 'first': ('min', 'added_date'),
+            'last': ('max', 'expense_date')}
+    for group_by in ([], ['expense_date'], ['category', 'expense_date:month']):
+        result = repo.aggregate(group_by, spec)
+        assert result == memory.aggregate(group_by, spec)
+        assert all(isinstance(row['last'], datetime) for row in result)
+
+
+@pytest.fixture
+def cat_repo(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Category)
+    root = repo.add(Category('root'))
+    a = repo.add(Category('a', root))
+    repo.add(Category('b', root))
+    repo.add(Category('a1', a))
+    repo.add(Category('other'))
+    return repo
+
+
+def test_get_descendants(cat_repo):
+    root = cat_repo.get_all({'name': 'root'})[0]
+    assert [c.name for c in cat_repo.get_descendants(root.pk)] == ['a', 'a1', 'b']
+    leaf = cat_repo.get_all({'name': 'a1'})[0]
+    assert cat_repo.get_descendants(leaf.pk) == []
+    assert cat_repo.get_descendants(100) == []
+
+
+def test_get_ancestors(cat_repo):
+    leaf = cat_repo.get_all({'name': 'a1'})[0]
+    assert [c.name for c in cat_repo.get_ancestors(leaf.pk)] == ['a', 'root']
+    root = cat_repo.get_all({'name': 'root'})[0]
+    assert cat_repo.get_ancestors(root.pk) == []
+    assert cat_repo.get_ancestors(100) == []
+
+
+def test_hierarchy_single_query(cat_repo):
+    metrics = Metrics()
+    cat_repo.manager.instrument(metrics)
+    leaf = cat_repo.get_all({'name': 'a1'})[0]
+    metrics.reset()
+    cat_repo.get_ancestors(leaf.pk)
+    cat_repo.get_descendants(1)
+    assert metrics.snapshot()['sqlite']['execute']['calls'] == 2
+    cat_repo.manager.instrument(None)
+
+
+def test_hierarchy_with_cycle(tmp_path):
+    @dataclass
+    class Node:
+        name: str
+        parent: int | None = None
+        pk: int = 0
+
+    repo = SQLiteRepository(str(tmp_path / 'test_db.db'), Node)
+    a = Node('a')
+    repo.add(a)
+    a1 = Node('a1', a.pk)
+    repo.add(a1)
+    a.parent = a1.pk
+    repo.update(a)
+    assert [c.name for c in repo.get_descendants(a.pk)] == ['a1']
+    assert [c.name for c in repo.get_ancestors(a.pk)] == ['a1']
+
+
+def test_hierarchy_unknown_field(cat_repo):
+    with pytest.raises(ValueError):
+        cat_repo.get_descendants(1, 'owner')
+
+
+def test_category_parent_index(cat_repo):
+    con = cat_repo.manager.connection()
+    names = {row[1] for row in con.execute('PRAGMA index_list(category)')}
+    assert 'idx_category_parent' in names
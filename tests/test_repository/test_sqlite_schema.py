@@ -0,0 +1,99 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+
+from bookkeeper.repository import sqlite_schema
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+import pytest
+
+
+@dataclass
+class Custom:
+    name: str = 'food'
+    amount: int = 0
+    parent: int | None = None
+    date: datetime | None = None
+    pk: int = 0
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'test_db.db')
+
+
+def columns(con, table):
+    return {row[1]: row[2] for row in con.execute(f'PRAGMA table_info({table})')}
+
+
+@pytest.mark.parametrize('annotation, expected', [
+    (int, 'INTEGER'), (str, 'TEXT'), (float, 'REAL'), (bool, 'INTEGER'),
+    (int | None, 'INTEGER'), (datetime, 'INTEGER'),
+    (list[int], ''), (int | str, ''),
+])
+def test_sql_type(annotation, expected):
+    assert sqlite_schema.sql_type(annotation) == expected
+
+
+def test_typed_columns(db_file):
+    repo = SQLiteRepository(db_file, Custom)
+    cols = columns(repo.manager.connection(), 'custom')
+    assert cols['name'] == 'TEXT'
+    assert cols['amount'] == 'INTEGER'
+    assert cols['parent'] == 'INTEGER'
+
+
+def test_indexes(db_file):
+    repo = SQLiteRepository(db_file, Custom, indexes=[('amount',), ('name', 'parent')])
+    con = repo.manager.connection()
+    names = {row[1] for row in con.execute('PRAGMA index_list(custom)')}
+    assert {'idx_custom_amount', 'idx_custom_name_parent'} <= names
+    plan = con.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM custom WHERE amount = 1').fetchall()
+    assert 'idx_custom_amount' in plan[0][-1]
+
+
+def test_new_table_version(db_file):
+    repo = SQLiteRepository(db_file, Custom)
+    con = repo.manager.connection()
+    assert sqlite_schema.get_version(con, 'custom') == sqlite_schema.SCHEMA_VERSION
+
+
+def test_migrate_legacy_table(db_file):
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute('CREATE TABLE custom ("pk" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'name, amount, parent, date)')
+        con.executemany('INSERT INTO custom (name, amount, parent, date) '
+                        'VALUES (?, ?, ?, ?)', [('a', '10', None, None),
+                                                ('b', 20, 1, None),
+                                                ('c', 30, 1, None)])
+        con.execute('DELETE FROM custom WHERE pk = 3')
+    con.close()
+
+    repo = SQLiteRepository(db_file, Custom)
+    con = repo.manager.connection()
+    assert sqlite_schema.get_version(con, 'custom') == sqlite_schema.SCHEMA_VERSION
+    assert columns(con, 'custom')['amount'] == 'INTEGER'
+    assert repo.get_all() == [Custom('a', 10, None, pk=1), Custom('b', 20, 1, pk=2)]
+    assert repo.add(Custom('d')) == 4
+
+
+def test_migrate_text_dates(db_file):
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute('CREATE TABLE custom ("pk" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'name, amount, parent, date)')
+        con.executemany('INSERT INTO custom (name, amount, parent, date) '
+                        'VALUES (?, ?, ?, ?)', [('a', 1, None, '2023-01-05'),
+                                                ('b', 2, None, '2023-01-06 10:20:30.5'),
+                                                ('c', 3, None, None)])
+    con.close()
+
+    repo = SQLiteRepository(db_file, Custom)
+    con = repo.manager.connection()
+    assert columns(con, 'custom')['date'] == 'INTEGER'
+    assert [row[0] for row in con.execute('SELECT typeof(date) FROM custom')] \
+        == ['integer', 'integer', 'null']
+    assert [o.date for o in repo.get_all()] == [
+        datetime(2023, 1, 5), datetime(2023, 1, 6, 10, 20, 30), None]
@@ -0,0 +1,137 @@
+import sqlite3
+import time
+from datetime import datetime
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.query import Query
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.sqlite_write_behind import WriteBehindSQLiteRepository
+
+import pytest
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'test.db')
+
+
+@pytest.fixture
+def repo(db_file):
+    with WriteBehindSQLiteRepository(db_file, Expense, batch_size=100,
+                                     flush_interval=3600) as repo:
+        yield repo
+
+
+def count_rows(db_file):
+    return len(SQLiteRepository(db_file, Expense).manager.connection().execute(
+        'SELECT * FROM expense').fetchall())
+
+
+def test_add_is_buffered(repo, db_file):
+    obj = Expense(100, 1, datetime(2023, 1, 1), datetime(2023, 1, 2), 'x')
+    pk = repo.add(obj)
+    assert obj.pk == pk == 1
+    assert count_rows(db_file) == 0
+    assert repo.get(pk) == obj
+    assert repo.get(pk) is not obj
+    repo.flush()
+    assert count_rows(db_file) == 1
+    assert SQLiteRepository(db_file, Expense).get(pk) == obj
+
+
+def test_reads_see_pending_writes(repo):
+    pks = repo.add_many([Expense(i, i % 2) for i in range(5)])
+    assert pks == [1, 2, 3, 4, 5]
+    repo.update(Expense(50, 1, pk=2))
+    repo.delete(3)
+    assert repo.get(3) is None
+    assert [e.amount for e in repo.get_all()] == [0, 50, 3, 4]
+    assert repo.aggregate([], {'n': ('count', '*')}) == [{'n': 4}]
+    assert [e.pk for e in repo.find(Query({'category': 1}))] == [2, 4]
+
+
+def test_add_then_delete_is_not_written(repo, db_file):
+    pk = repo.add(Expense(1, 1))
+    repo.delete(pk)
+    repo.flush()
+    assert count_rows(db_file) == 0
+    with pytest.raises(KeyError):
+        repo.delete(pk)
+
+
+def test_batch_size_triggers_flush(repo, db_file):
+    repo.add_many([Expense(i, 1) for i in range(150)])
+    assert count_rows(db_file) == 100
+
+
+def test_close_flushes_and_pks_continue(db_file):
+    repo = WriteBehindSQLiteRepository(db_file, Expense)
+    repo.add_many([Expense(i, 1) for i in range(3)])
+    repo.delete(2)
+    repo.close()
+    assert count_rows(db_file) == 2
+    with WriteBehindSQLiteRepository(db_file, Expense) as repo:
+        assert repo.add(Expense(1, 1)) == 4
+        with repo.transaction():
+            assert repo.add(Expense(1, 1)) == 5
+        assert repo.add(Expense(1, 1)) == 6
+    assert count_rows(db_file) == 5
+
+
+def test_background_flush(db_file):
+    with WriteBehindSQLiteRepository(db_file, Expense, flush_interval=0.05,
+                                     background=True) as repo:
+        repo.add(Expense(1, 1))
+        deadline = time.monotonic() + 5
+        while count_rows(db_file) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count_rows(db_file) == 1
+
+
+def test_failing_operation_is_dropped(db_file):
+    with WriteBehindSQLiteRepository(db_file, Category, batch_size=100,
+                                     flush_interval=3600) as repo:
+        root = Category('root')
+        repo.add(root)
+        child = Category('child', root.pk)
+        repo.add(child)
+        repo.flush()
+        root.parent = child.pk
+        repo.update(root)
+        other = Category('other')
+        repo.add(other)
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.flush()
+        assert [pk for pk, _ in repo.rejected] == [root.pk]
+        repo.flush()
+        repo.add(Category('later'))
+    names = {c.name: c.parent for c in SQLiteRepository(db_file, Category).get_all()}
+    assert names == {'root': None, 'child': root.pk, 'other': None, 'later': None}
+
+
+def test_update_unknown_raises(repo):
+    obj = Expense(100, 1)
+    repo.add(obj)
+    with pytest.raises(KeyError):
+        repo.update(Expense(100, 1, pk=obj.pk + 1))
+    repo.flush()
+    repo.delete(obj.pk)
+    with pytest.raises(KeyError):
+        repo.update(obj)
+    with pytest.raises(KeyError):
+        repo.update_many([obj])
+    repo.flush()
+    assert repo.get_all() == []
+
+
+def test_write_after_close_raises(db_file):
+    repo = WriteBehindSQLiteRepository(db_file, Expense, flush_interval=3600)
+    obj = Expense(100, 1)
+    repo.add(obj)
+    repo.close()
+    for write in (lambda: repo.add(Expense(200, 1)), lambda: repo.update(obj),
+                  lambda: repo.delete(obj.pk), lambda: repo.delete_many([obj.pk])):
+        with pytest.raises(ValueError):
+            write()
+    assert [e.pk for e in repo.get_all()] == [obj.pk]
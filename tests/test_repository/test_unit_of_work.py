@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.unit_of_work import UnitOfWork
+
+import pytest
+
+
+@dataclass
+class Parent:
+    name: str = 'parent'
+    pk: int = 0
+
+
+@dataclass
+class Child:
+    parent: int = 0
+    pk: int = 0
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repos(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRepository(), MemoryRepository()
+    db_file = str(tmp_path / 'test_db.db')
+    return SQLiteRepository(db_file, Parent), SQLiteRepository(db_file, Child)
+
+
+def test_commit(repos):
+    parents, children = repos
+    with UnitOfWork(parents, children):
+        pk = parents.add(Parent())
+        children.add(Child(parent=pk))
+    assert len(parents.get_all()) == 1
+    assert children.get_all()[0].parent == pk
+
+
+def test_rollback(repos):
+    parents, children = repos
+    pk = parents.add(Parent())
+    child_pk = children.add(Child(parent=pk))
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(parents, children):
+            children.delete(child_pk)
+            parents.delete(pk)
+            parents.add(Parent('other'))
+            raise RuntimeError
+    assert parents.get_all() == [Parent(pk=pk)]
+    assert children.get_all() == [Child(parent=pk, pk=child_pk)]
+
+
+def test_nested(repos):
+    parents, children = repos
+    with UnitOfWork(parents, children):
+        parents.add(Parent('outer'))
+        with pytest.raises(RuntimeError):
+            with UnitOfWork(parents):
+                parents.add(Parent('inner'))
+                raise RuntimeError
+    assert [p.name for p in parents.get_all()] == ['outer']
+
+
+def test_sqlite_commits_once(tmp_path):
+    db_file = str(tmp_path / 'test_db.db')
+    parents = SQLiteRepository(db_file, Parent)
+    children = SQLiteRepository(db_file, Child)
+    with UnitOfWork(parents, children):
+        assert parents.manager.in_transaction()
+        parents.add(Parent())
+        children.add(Child())
+        assert parents.manager.in_transaction()
+    assert not parents.manager.in_transaction()
+
+
+def test_cannot_reenter():
+    uow = UnitOfWork(MemoryRepository())
+    with uow:
+        with pytest.raises(RuntimeError):
+            uow.__enter__()
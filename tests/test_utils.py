@@ -3,7 +3,7 @@ from textwrap import dedent
 
 import pytest
 
-from bookkeeper.utils import read_tree
+from bookkeeper.utils import iter_tree, read_tree
 
 
 def test_create_tree():
@@ -71,3 +71,37 @@ def test_with_file():
             ('child2', 'parent1'),
             ('parent2', None)
         ]
+
+
+def test_iter_tree():
+    text = dedent('''
+        parent1
+            child1
+                grandchild
+
+            child2
+        parent2
+    ''')
+    assert list(iter_tree(text.splitlines())) == [
+        (0, 'parent1'), (1, 'child1'), (2, 'grandchild'), (1, 'child2'),
+        (0, 'parent2')
+    ]
+
+
+def test_iter_tree_is_lazy():
+    def lines():
+        yield 'parent'
+        yield '    child'
+        raise AssertionError('read too far')
+
+    tree = iter_tree(lines())
+    assert next(tree) == (0, 'parent')
+    assert next(tree) == (1, 'child')
+
+
+def test_iter_tree_indentation_error():
+    tree = iter_tree(['parent', '    child', '  child2'])
+    assert next(tree) == (0, 'parent')
+    assert next(tree) == (1, 'child')
+    with pytest.raises(IndentationError):
+        next(tree)